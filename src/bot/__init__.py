@@ -18,7 +18,7 @@ async def create_bot_from_config(config: Dict, monitor_bot=None) -> Optional[Tel
             logger.error("❌ Не указан токен бота или chat_id")
             return None
         
-        bot = TelegramBot(token, admin_chat_id, group_chat_id, monitor_bot)
+        bot = TelegramBot(token, admin_chat_id, group_chat_id, monitor_bot, bot_config.get('updates'))
         
         if await bot.test_connection():
             return bot
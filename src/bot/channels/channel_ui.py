@@ -6,6 +6,8 @@
 from typing import Dict, List, Optional, Any
 from loguru import logger
 
+from ...region_index import RegionIndex
+
 
 class ChannelUI:
     """Интерфейс управления каналами"""
@@ -433,17 +435,11 @@ class ChannelUI:
     def _detect_channel_region(self, channel_title: str, username: str, regions: Dict) -> Optional[str]:
         """Автоопределение региона канала по ключевым словам"""
         try:
-            title_lower = channel_title.lower()
-            username_lower = username.lower()
-            combined_text = f"{title_lower} {username_lower}"
-            
-            # Поиск по ключевым словам каждого региона
-            for region_key, region_data in regions.items():
-                keywords = region_data.get('keywords', [])
-                for keyword in keywords:
-                    if str(keyword).lower() in combined_text:
-                        logger.info(f"🎯 Автоопределение: @{username} → {region_key} (по '{keyword}')")
-                        return region_key
+            # Ключевые слова регионов: основы слов названия и подстроки username
+            region_key = RegionIndex(regions).detect_channel(username, channel_title)
+            if region_key:
+                logger.info(f"🎯 Автоопределение: @{username} → {region_key}")
+                return region_key
             
             logger.info(f"❓ Регион для @{username} не определен автоматически")
             return None
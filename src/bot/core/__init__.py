@@ -1,5 +1,5 @@
 from .bot_client import TelegramBot
 from .update_processor import UpdateProcessor
+from .background_tasks import BackgroundTasks
 
-__all__ = ["TelegramBot", "UpdateProcessor"]
-
+__all__ = ["TelegramBot", "UpdateProcessor", "BackgroundTasks"]
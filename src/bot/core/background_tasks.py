@@ -0,0 +1,142 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Dict, Optional, TYPE_CHECKING
+from loguru import logger
+
+if TYPE_CHECKING:
+    from .bot_client import TelegramBot
+
+
+CANCEL_CALLBACK = "cancel_task"
+
+
+class BackgroundJob:
+
+    __slots__ = ("chat_id", "title", "task", "watcher", "status_message_id", "started_at",
+                 "progress", "progress_sent_at")
+
+    def __init__(self, chat_id: int, title: str):
+        self.chat_id = chat_id
+        self.title = title
+        self.task: Optional[asyncio.Task] = None
+        self.watcher: Optional[asyncio.Task] = None
+        self.status_message_id: Optional[int] = None
+        self.started_at = time.monotonic()
+        self.progress = ""
+        self.progress_sent_at = 0.0
+
+    @property
+    def elapsed(self) -> int:
+        return int(time.monotonic() - self.started_at)
+
+
+class BackgroundTasks:
+    """Долгие команды (дайджест, подписка) вне очереди обновлений чата
+
+    Пока команда работает, остальные кнопки и команды чата обрабатываются;
+    в чате висит сообщение о прогрессе с кнопкой отмены (или /cancel).
+    """
+
+    def __init__(self, bot: "TelegramBot", progress_interval: int = 20, min_progress_interval: float = 3):
+        self.bot = bot
+        self.progress_interval = progress_interval
+        # Чаще правка одного сообщения упирается в лимиты Bot API
+        self.min_progress_interval = min_progress_interval
+        self.jobs: Dict[int, BackgroundJob] = {}
+
+    def is_running(self, chat_id: int) -> bool:
+        job = self.jobs.get(chat_id)
+        return bool(job and job.task and not job.task.done())
+
+    async def start(self, chat_id: int, title: str, coro: Awaitable[Any]) -> bool:
+        if self.is_running(chat_id):
+            coro.close()
+            running = self.jobs[chat_id]
+            await self.bot._send_to_single_user(
+                f"⏳ Уже выполняется: <b>{running.title}</b> ({running.elapsed} с)\n"
+                "Дождитесь завершения или отмените: /cancel",
+                chat_id
+            )
+            return False
+
+        job = BackgroundJob(chat_id, title)
+        self.jobs[chat_id] = job
+
+        result = await self.bot.call_api("sendMessage", {
+            "chat_id": chat_id,
+            "text": f"⏳ <b>{title}</b>...\n\nОтменить: /cancel",
+            "parse_mode": "HTML",
+            "reply_markup": {"inline_keyboard": [[{"text": "🛑 Отменить", "callback_data": CANCEL_CALLBACK}]]},
+        })
+        if result:
+            job.status_message_id = result.get("message_id")
+
+        job.task = asyncio.create_task(coro)
+        job.watcher = asyncio.create_task(self._watch(job))
+        logger.info(f"🧵 Фоновая задача '{title}' запущена для чата {chat_id}")
+        return True
+
+    async def report_progress(self, chat_id: int, text: str):
+        """Показать ход работы в сообщении задачи (не чаще min_progress_interval)"""
+        job = self.jobs.get(chat_id)
+        if not job or not job.task or job.task.done():
+            return
+        job.progress = text
+        now = time.monotonic()
+        if now - job.progress_sent_at < self.min_progress_interval:
+            return
+        job.progress_sent_at = now
+        await self._update_status(job, self._running_text(job), True)
+
+    def _running_text(self, job: BackgroundJob) -> str:
+        text = f"⏳ <b>{job.title}</b>... {job.elapsed} с"
+        if job.progress:
+            text += f"\n{job.progress}"
+        return text + "\n\nОтменить: /cancel"
+
+    async def cancel(self, chat_id: int) -> bool:
+        job = self.jobs.get(chat_id)
+        if not job or not job.task or job.task.done():
+            return False
+        job.task.cancel()
+        logger.info(f"🛑 Фоновая задача '{job.title}' отменена пользователем")
+        return True
+
+    def cancel_all(self):
+        for job in self.jobs.values():
+            if job.task and not job.task.done():
+                job.task.cancel()
+
+    async def _watch(self, job: BackgroundJob):
+        try:
+            while True:
+                done, _ = await asyncio.wait({job.task}, timeout=self.progress_interval)
+                if done:
+                    break
+                job.progress_sent_at = time.monotonic()
+                await self._update_status(job, self._running_text(job), True)
+
+            if job.task.cancelled():
+                await self._update_status(job, f"🛑 <b>{job.title}</b> - отменено через {job.elapsed} с")
+            elif job.task.exception():
+                error = job.task.exception()
+                logger.error(f"❌ Фоновая задача '{job.title}' завершилась с ошибкой: {error}")
+                await self._update_status(job, f"❌ <b>{job.title}</b> - ошибка: {error}")
+            else:
+                await self._update_status(job, f"✅ <b>{job.title}</b> - готово за {job.elapsed} с")
+        finally:
+            if self.jobs.get(job.chat_id) is job:
+                del self.jobs[job.chat_id]
+
+    async def _update_status(self, job: BackgroundJob, text: str, with_cancel: bool = False):
+        if not job.status_message_id:
+            return
+        payload = {
+            "chat_id": job.chat_id,
+            "message_id": job.status_message_id,
+            "text": text,
+            "parse_mode": "HTML",
+        }
+        if with_cancel:
+            payload["reply_markup"] = {"inline_keyboard": [[{"text": "🛑 Отменить", "callback_data": CANCEL_CALLBACK}]]}
+        await self.bot.call_api("editMessageText", payload)
@@ -1,6 +1,8 @@
 import asyncio
 import httpx
 import json
+from contextlib import ExitStack
+from contextvars import ContextVar
 from typing import Dict, Optional, Any
 from loguru import logger
 from datetime import datetime
@@ -9,10 +11,17 @@ from src.handlers.commands.basic import BasicCommands
 from src.handlers.commands import ChannelCommands, RegionCommands, ManagementCommands
 from src.handlers.callbacks import ChannelCallbacks, RegionCallbacks
 
+# Обновления разных чатов обрабатываются параллельно - чат текущего
+# callback хранится в контексте задачи, а не в общем атрибуте
+_current_callback_chat_id: ContextVar[Optional[int]] = ContextVar("current_callback_chat_id", default=None)
+
 
 class TelegramBot:
+    # Загрузка альбома из нескольких видео идет дольше обычного запроса
+    UPLOAD_TIMEOUT = 120
     
-    def __init__(self, bot_token: str, admin_chat_id: int, group_chat_id: int = None, monitor_bot=None):
+    def __init__(self, bot_token: str, admin_chat_id: int, group_chat_id: int = None, monitor_bot=None,
+                 updates_settings: Optional[Dict[str, Any]] = None):
         self.bot_token = bot_token
         self.admin_chat_id = admin_chat_id
         self.group_chat_id = group_chat_id
@@ -27,6 +36,9 @@ class TelegramBot:
         
         self.update_offset = 0
         self.is_listening = False
+        # Способ получения обновлений: long-poll (polling) или webhook
+        self.updates_settings = updates_settings or {}
+        self.webhook_server = None
         self.command_handlers = {}
         
         self.edit_messages = True
@@ -39,7 +51,6 @@ class TelegramBot:
         self.waiting_for_emoji = False
         self.pending_region_data = None
         self.pending_topic_data = None
-        self.current_callback_chat_id = None
         self.processed_forwards = set()
         self.active_inline_messages = []
         self.waiting_for_digest_channel = False
@@ -52,6 +63,8 @@ class TelegramBot:
         self._region_manager = None
         self._callback_processor = None
         self._digest_interface = None
+        self._background_tasks = None
+        self._http_client: Optional[httpx.AsyncClient] = None
         
         self.basic_commands = BasicCommands(self)
         self.channel_commands = ChannelCommands(self)
@@ -74,11 +87,13 @@ class TelegramBot:
             "kill_switch": self.basic_commands.kill_switch,
             "unlock": self.basic_commands.unlock,
             "digest": self.basic_commands.digest,
+            "trends": self.basic_commands.trends,
             "topic_id": self.basic_commands.topic_id,
             "add_channel": self.channel_commands.add_channel,
             "manage_channels": self.management_commands.manage_channels,
             "stats": self.management_commands.stats,
             "force_subscribe": self.channel_commands.force_subscribe,
+            "cancel": self.cancel_background_task,
         }
         
         for command, handler in commands.items():
@@ -119,6 +134,60 @@ class TelegramBot:
             self._callback_processor = CallbackProcessor(self)
         return self._callback_processor
     
+    @property
+    def background_tasks(self):
+        if self._background_tasks is None:
+            from .background_tasks import BackgroundTasks
+            self._background_tasks = BackgroundTasks(self)
+        return self._background_tasks
+    
+    @property
+    def current_callback_chat_id(self) -> Optional[int]:
+        return _current_callback_chat_id.get()
+    
+    @current_callback_chat_id.setter
+    def current_callback_chat_id(self, value: Optional[int]):
+        _current_callback_chat_id.set(value)
+    
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """Общий пул соединений с Bot API вместо клиента на каждый запрос"""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                timeout=30,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+            )
+        return self._http_client
+    
+    async def call_api(self, method: str, payload: Dict[str, Any], timeout: float = None) -> Optional[Any]:
+        """Вызов метода Bot API, возвращает result или None при ошибке"""
+        try:
+            kwargs = {"timeout": timeout} if timeout else {}
+            response = await self.http_client.post(f"{self.base_url}/{method}", json=payload, **kwargs)
+            body = response.json()
+            if body.get("ok"):
+                return body.get("result")
+            logger.warning(f"⚠️ {method}: {body.get('description', response.text)}")
+        except Exception as e:
+            logger.error(f"❌ Ошибка вызова {method}: {e}")
+        return None
+    
+    async def close(self):
+        if self._background_tasks:
+            self._background_tasks.cancel_all()
+        if self._http_client and not self._http_client.is_closed:
+            await self._http_client.aclose()
+    
+    async def run_in_background(self, chat_id: Optional[int], title: str, coro) -> bool:
+        """Запустить долгую операцию фоном с прогрессом и отменой"""
+        return await self.background_tasks.start(chat_id or self.chat_id, title, coro)
+    
+    async def cancel_background_task(self, message: Optional[Dict[str, Any]]) -> None:
+        chat = (message or {}).get("chat") or (message or {}).get("message", {}).get("chat", {})
+        chat_id = chat.get("id") or self.chat_id
+        if not await self.background_tasks.cancel(chat_id):
+            await self._send_to_single_user("ℹ️ Нет выполняющихся задач для отмены", chat_id)
+    
     def is_admin_user(self, user_id: int) -> bool:
         return user_id == self.admin_chat_id
     
@@ -148,17 +217,18 @@ class TelegramBot:
                 {"command": "status", "description": "📊 Статус системы"},
                 {"command": "help", "description": "🆘 Справка"},
                 {"command": "digest", "description": "📰 Дайджест новостей"},
+                {"command": "trends", "description": "📈 Что сейчас обсуждают"},
+                {"command": "cancel", "description": "🛑 Отменить долгую операцию"},
             ]
             
             data = {"commands": commands}
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(f"{self.base_url}/setMyCommands", json=data)
-                
-                if response.status_code == 200:
-                    logger.info("✅ Команды бота настроены в Telegram API")
-                else:
-                    logger.warning(f"⚠️ Ошибка настройки команд: {response.text}")
+            response = await self.http_client.post(f"{self.base_url}/setMyCommands", json=data)
+            
+            if response.status_code == 200:
+                logger.info("✅ Команды бота настроены в Telegram API")
+            else:
+                logger.warning(f"⚠️ Ошибка настройки команд: {response.text}")
                     
         except Exception as e:
             logger.error(f"❌ Ошибка установки команд: {e}")
@@ -189,14 +259,13 @@ class TelegramBot:
                 "disable_web_page_preview": True
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(f"{self.base_url}/sendMessage", json=data)
-                
-                if response.status_code == 200:
-                    return True
-                else:
-                    logger.error(f"❌ Telegram API ошибка: {response.text}")
-                    return False
+            response = await self.http_client.post(f"{self.base_url}/sendMessage", json=data)
+            
+            if response.status_code == 200:
+                return True
+            else:
+                logger.error(f"❌ Telegram API ошибка: {response.text}")
+                return False
                     
         except Exception as e:
             logger.error(f"❌ Ошибка HTTP запроса: {e}")
@@ -207,16 +276,15 @@ class TelegramBot:
     
     async def test_connection(self) -> bool:
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.base_url}/getMe")
-                
-                if response.status_code == 200:
-                    bot_info = response.json()["result"]
-                    logger.info(f"✅ Бот подключен: @{bot_info.get('username')}")
-                    return True
-                else:
-                    logger.error(f"❌ Ошибка подключения: {response.text}")
-                    return False
+            response = await self.http_client.get(f"{self.base_url}/getMe")
+            
+            if response.status_code == 200:
+                bot_info = response.json()["result"]
+                logger.info(f"✅ Бот подключен: @{bot_info.get('username')}")
+                return True
+            else:
+                logger.error(f"❌ Ошибка подключения: {response.text}")
+                return False
                     
         except Exception as e:
             logger.error(f"❌ Ошибка тестирования подключения: {e}")
@@ -232,10 +300,25 @@ class TelegramBot:
         return await self.keyboard_builder.send_or_edit_message_with_keyboard(text, keyboard, should_edit, **kwargs)
     
     async def start_listening(self):
+        if self.updates_settings.get('mode') == 'webhook':
+            from .webhook_server import WebhookServer
+            self.webhook_server = WebhookServer(self, self.updates_settings.get('webhook') or {})
+            self.is_listening = True
+            
+            if await self.webhook_server.start():
+                logger.info("👂 Бот получает команды через webhook")
+                return await self.webhook_server.serve_forever()
+            
+            logger.warning("⚠️ Webhook недоступен, переключаемся на long-poll")
+            await self.webhook_server.stop()
+            self.webhook_server = None
+        
         return await self.update_processor.start_listening()
     
     def stop_listening(self):
         self.is_listening = False
+        if self.webhook_server:
+            self.webhook_server.request_stop()
         if self._update_processor:
             self._update_processor.stop_listening()
     
@@ -276,15 +359,14 @@ class TelegramBot:
                         "reply_markup": ""
                     }
                     
-                    async with httpx.AsyncClient(timeout=5.0) as client:
-                        response = await client.post(f"{self.base_url}/editMessageReplyMarkup", json=data)
-                        
-                        if response.status_code == 200:
-                            logger.debug(f"✅ Кнопки убраны с сообщения {message_id}")
-                        else:
-                            logger.debug(f"⚠️ Не удалось убрать кнопки: {response.text}")
-                        
-                        messages_to_remove.append(message_data)
+                    response = await self.http_client.post(f"{self.base_url}/editMessageReplyMarkup", json=data, timeout=5.0)
+                    
+                    if response.status_code == 200:
+                        logger.debug(f"✅ Кнопки убраны с сообщения {message_id}")
+                    else:
+                        logger.debug(f"⚠️ Не удалось убрать кнопки: {response.text}")
+                    
+                    messages_to_remove.append(message_data)
                         
                 except Exception as e:
                     logger.debug(f"❌ Ошибка деактивации сообщения {message_id}: {e}")
@@ -303,7 +385,7 @@ class TelegramBot:
     async def handle_callback(self, data: str, callback_query: dict):
         return await self.callback_processor.handle_callback(data, callback_query)
     
-    async def send_message_to_channel(self, text: str, channel_target: str, parse_mode: str = "HTML", thread_id: int = None) -> bool:
+    async def send_message_to_channel(self, text: str, channel_target: str, parse_mode: str = "HTML", thread_id: int = None) -> Optional[Dict]:
         try:
             chat_id = self._get_chat_id_from_target(channel_target)
             
@@ -319,21 +401,20 @@ class TelegramBot:
             if parse_mode:
                 data["parse_mode"] = parse_mode
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(f"{self.base_url}/sendMessage", json=data)
-                
-                if response.status_code == 200:
-                    logger.info(f"📤 Сообщение отправлено в {chat_id}")
-                    return True
-                else:
-                    logger.error(f"❌ Ошибка отправки в канал: {response.text}")
-                    return False
+            response = await self.http_client.post(f"{self.base_url}/sendMessage", json=data)
+            
+            if response.status_code == 200:
+                logger.info(f"📤 Сообщение отправлено в {chat_id}")
+                return response.json().get("result")
+            else:
+                logger.error(f"❌ Ошибка отправки в канал: {response.text}")
+                return None
                     
         except Exception as e:
             logger.error(f"❌ Ошибка send_message_to_channel: {e}")
-            return False
+            return None
     
-    async def send_media_with_caption(self, media_path: str, caption: str = "", channel_target: str = None, media_type: str = "photo", thread_id: int = None) -> bool:
+    async def send_media_with_caption(self, media_path: str, caption: str = "", channel_target: str = None, media_type: str = "photo", thread_id: int = None) -> Optional[Dict]:
         try:
             if channel_target:
                 chat_id = self._get_chat_id_from_target(channel_target)
@@ -343,14 +424,17 @@ class TelegramBot:
             if media_type == "photo":
                 url = f"{self.base_url}/sendPhoto"
                 files_key = "photo"
+                data_extra = {}
             elif media_type == "video":
                 url = f"{self.base_url}/sendVideo"
                 files_key = "video"
+                data_extra = {"supports_streaming": "true"}
             else:
                 url = f"{self.base_url}/sendDocument"
                 files_key = "document"
+                data_extra = {}
             
-            data = {"chat_id": chat_id}
+            data = {"chat_id": chat_id, **data_extra}
             
             if thread_id:
                 data["message_thread_id"] = thread_id
@@ -359,22 +443,42 @@ class TelegramBot:
                 data["caption"] = caption
                 data["parse_mode"] = "HTML"
             
-            with open(media_path, 'rb') as media_file:
-                files = {files_key: media_file}
+            with ExitStack() as stack:
+                files = {files_key: self._open_upload(media_path, stack)}
                 
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(url, data=data, files=files)
-                    
-                    if response.status_code == 200:
-                        logger.info(f"📤 Медиа отправлено в {chat_id}")
-                        return True
-                    else:
-                        logger.error(f"❌ Ошибка отправки медиа: {response.text}")
-                        return False
+                response = await self.http_client.post(url, data=data, files=files, timeout=self.UPLOAD_TIMEOUT)
+                
+                if response.status_code == 200:
+                    logger.info(f"📤 Медиа отправлено в {chat_id}")
+                    return response.json().get("result")
+                else:
+                    logger.error(f"❌ Ошибка отправки медиа: {response.text}")
+                    return None
                         
         except Exception as e:
             logger.error(f"❌ Ошибка send_media_with_caption: {e}")
-            return False
+            return None
+    
+    async def edit_channel_message(self, chat_id: Any, message_id: int, text: str,
+                                   is_caption: bool = False, parse_mode: str = None) -> bool:
+        """Изменить текст или подпись уже отправленного сообщения"""
+        payload = {"chat_id": chat_id, "message_id": message_id}
+        if is_caption:
+            payload["caption"] = text
+        else:
+            payload["text"] = text
+            payload["disable_web_page_preview"] = True
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+        
+        method = "editMessageCaption" if is_caption else "editMessageText"
+        return bool(await self.call_api(method, payload))
+    
+    def _open_upload(self, source, stack: ExitStack):
+        """Источник для multipart: (имя, байты) из MediaRelay или путь к файлу"""
+        if isinstance(source, (tuple, list)):
+            return tuple(source)
+        return stack.enter_context(open(source, 'rb'))
     
     def _get_chat_id_from_target(self, channel_target: str) -> str:
         if isinstance(channel_target, str) and channel_target.startswith("https://t.me/+"):
@@ -390,7 +494,7 @@ class TelegramBot:
         else:
             return str(channel_target)
     
-    async def send_media_group(self, media_files: list, caption: str = "", channel_target: str = None, thread_id: int = None) -> bool:
+    async def send_media_group(self, media_files: list, caption: str = "", channel_target: str = None, thread_id: int = None) -> Optional[Dict]:
         try:
             if channel_target:
                 chat_id = self._get_chat_id_from_target(channel_target)
@@ -400,46 +504,46 @@ class TelegramBot:
             url = f"{self.base_url}/sendMediaGroup"
             
             media_group = []
-            files_data = {}
             
-            for i, (file_path, media_type) in enumerate(media_files):
-                file_key = f"file_{i}"
+            with ExitStack() as stack:
+                files_data = {}
                 
-                media_item = {
-                    "type": media_type,
-                    "media": f"attach://{file_key}"
-                }
-                
-                if i == 0 and caption:
-                    media_item["caption"] = caption
-                    media_item["parse_mode"] = "HTML"
+                for i, (source, media_type) in enumerate(media_files):
+                    file_key = f"file_{i}"
+                    
+                    media_item = {
+                        "type": media_type,
+                        "media": f"attach://{file_key}"
+                    }
+                    if media_type == "video":
+                        media_item["supports_streaming"] = True
+                    
+                    if i == 0 and caption:
+                        media_item["caption"] = caption
+                        media_item["parse_mode"] = "HTML"
+                    
+                    media_group.append(media_item)
+                    files_data[file_key] = self._open_upload(source, stack)
                 
-                media_group.append(media_item)
-                files_data[file_key] = open(file_path, 'rb')
-            
-            data = {
-                "chat_id": chat_id,
-                "media": json.dumps(media_group)
-            }
-            if thread_id:
-                data["message_thread_id"] = thread_id
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, data=data, files=files_data)
+                data = {
+                    "chat_id": chat_id,
+                    "media": json.dumps(media_group)
+                }
+                if thread_id:
+                    data["message_thread_id"] = thread_id
                 
-                for file_obj in files_data.values():
-                    file_obj.close()
+                response = await self.http_client.post(url, data=data, files=files_data, timeout=self.UPLOAD_TIMEOUT)
                 
                 if response.status_code == 200:
                     logger.info(f"📤 Медиа группа отправлена в {chat_id}")
-                    return True
+                    return (response.json().get("result") or [None])[0]
                 else:
                     logger.error(f"❌ Ошибка отправки медиа группы: {response.text}")
-                    return False
+                    return None
                     
         except Exception as e:
             logger.error(f"❌ Ошибка send_media_group: {e}")
-            return False
+            return None
     
     async def send_error_alert(self, error_message: str) -> bool:
         try:
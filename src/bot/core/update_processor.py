@@ -1,31 +1,44 @@
 import asyncio
-import httpx
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Set
 from loguru import logger
 from datetime import datetime
 
 
 class UpdateProcessor:
     
+    # Long-poll: Telegram держит запрос до прихода обновлений
+    POLL_TIMEOUT = 50
+    POLL_LIMIT = 100
+    
+    # Команды, которые выполняются фоном с прогрессом и отменой
+    BACKGROUND_COMMANDS = {
+        "force_subscribe": "Подписка на каналы",
+    }
+    
     def __init__(self, bot: "TelegramBot"):
         self.bot = bot
         self.is_listening = False
         self.start_time = datetime.now()
+        
+        # Последняя задача каждого чата: новые обновления чата ждут ее,
+        # разные чаты обрабатываются параллельно
+        self._chat_tails: Dict[Any, asyncio.Task] = {}
+        self._inflight: Set[asyncio.Task] = set()
     
     async def start_listening(self):
         self.is_listening = True
         self.bot.is_listening = True
         logger.info("👂 Бот начал прослушивание команд")
         
+        # getUpdates не работает, пока зарегистрирован webhook (например, после смены режима)
+        await self.bot.call_api("deleteWebhook", {"drop_pending_updates": False})
+        
         while self.is_listening:
             try:
                 updates = await self.get_updates()
                 
-                if updates:
-                    for update in updates:
-                        await self.process_update(update)
-                        
-                await asyncio.sleep(1)
+                for update in updates:
+                    self.dispatch_update(update)
                         
             except Exception as e:
                 logger.error(f"❌ Ошибка в цикле прослушивания: {e}")
@@ -41,24 +54,25 @@ class UpdateProcessor:
             try:
                 data = {
                     "offset": self.bot.update_offset,
-                    "limit": 10,
-                    "timeout": 10
+                    "limit": self.POLL_LIMIT,
+                    "timeout": self.POLL_TIMEOUT
                 }
                 
-                async with httpx.AsyncClient(timeout=15) as client:
-                    response = await client.post(f"{self.bot.base_url}/getUpdates", json=data)
+                response = await self.bot.http_client.post(
+                    f"{self.bot.base_url}/getUpdates", json=data, timeout=self.POLL_TIMEOUT + 10
+                )
+                
+                if response.status_code == 200:
+                    result = response.json()
+                    updates = result.get("result", [])
                     
-                    if response.status_code == 200:
-                        result = response.json()
-                        updates = result.get("result", [])
-                        
-                        if updates:
-                            self.bot.update_offset = updates[-1]["update_id"] + 1
-                        
-                        return updates
-                    else:
-                        logger.warning(f"⚠️ Ошибка получения обновлений: {response.text}")
-                        return []
+                    if updates:
+                        self.bot.update_offset = updates[-1]["update_id"] + 1
+                    
+                    return updates
+                else:
+                    logger.warning(f"⚠️ Ошибка получения обновлений: {response.text}")
+                    await asyncio.sleep(2 ** attempt)
                         
             except Exception as e:
                 logger.error(f"❌ Попытка {attempt + 1}/{max_retries} получения обновлений: {e}")
@@ -67,6 +81,60 @@ class UpdateProcessor:
                     
         return []
     
+    def dispatch_update(self, update: Dict) -> asyncio.Task:
+        """Обработать обновление отдельной задачей, сохраняя порядок внутри чата"""
+        if self._is_urgent(update):
+            # /cancel и кнопка отмены не ждут очередь чата
+            task = asyncio.create_task(self.process_update(update))
+        else:
+            key = self._chat_key(update)
+            previous = self._chat_tails.get(key)
+            task = asyncio.create_task(self._process_after(previous, update))
+            self._chat_tails[key] = task
+            task.add_done_callback(lambda t, key=key: self._release_tail(key, t))
+        
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+        return task
+    
+    async def _process_after(self, previous: Optional[asyncio.Task], update: Dict):
+        if previous and not previous.done():
+            try:
+                await asyncio.shield(previous)
+            except asyncio.CancelledError:
+                # Отменили предыдущее обновление - продолжаем; отменили это - выходим
+                if not previous.cancelled():
+                    raise
+            except Exception:
+                # Ошибка предыдущего обновления уже залогирована - очередь чата не стоит
+                pass
+        await self.process_update(update)
+    
+    def _release_tail(self, key: Any, task: asyncio.Task):
+        if self._chat_tails.get(key) is task:
+            del self._chat_tails[key]
+    
+    @staticmethod
+    def _chat_key(update: Dict) -> Any:
+        if "message" in update:
+            message = update["message"]
+            return message.get("chat", {}).get("id") or message.get("from", {}).get("id")
+        if "callback_query" in update:
+            callback = update["callback_query"]
+            return callback.get("message", {}).get("chat", {}).get("id") or callback.get("from", {}).get("id")
+        if "my_chat_member" in update:
+            return update["my_chat_member"].get("chat", {}).get("id")
+        return None
+    
+    @staticmethod
+    def _is_urgent(update: Dict) -> bool:
+        from .background_tasks import CANCEL_CALLBACK
+        
+        text = update.get("message", {}).get("text", "")
+        if text.split("@")[0].split(" ")[0].lower() == "/cancel":
+            return True
+        return update.get("callback_query", {}).get("data") == CANCEL_CALLBACK
+    
     async def process_update(self, update: Dict):
         try:
             if "message" in update:
@@ -119,7 +187,8 @@ class UpdateProcessor:
                 if self.bot.delete_commands and message_id:
                     await self._delete_user_message(message_id, chat_id)
             elif self.bot.waiting_for_digest_channel and ("t.me/" in text or text.startswith("@")):
-                await self._handle_digest_channel_link(text, message)
+                self.bot.waiting_for_digest_channel = False
+                await self._start_digest_channel_job(text, chat_id)
                 if self.bot.delete_commands and message_id:
                     await self._delete_user_message(message_id, chat_id)
             elif "t.me/" in text or text.startswith("@"):
@@ -159,7 +228,14 @@ class UpdateProcessor:
             else:
                 command = command_part
             
-            if command in self.bot.command_handlers:
+            if command in self.BACKGROUND_COMMANDS:
+                logger.info(f"💬 Команда: /{command} (фоном)")
+                await self.bot.run_in_background(
+                    message.get("chat", {}).get("id"),
+                    self.BACKGROUND_COMMANDS[command],
+                    self.bot.command_handlers[command](message)
+                )
+            elif command in self.bot.command_handlers:
                 logger.info(f"💬 Команда: /{command}")
                 await self.bot.command_handlers[command](message)
             else:
@@ -220,11 +296,10 @@ class UpdateProcessor:
                 "message_id": message_id
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(f"{self.bot.base_url}/deleteMessage", json=data)
-                
-                if response.status_code != 200:
-                    logger.debug(f"⚠️ Не удалось удалить сообщение {message_id}")
+            response = await self.bot.http_client.post(f"{self.bot.base_url}/deleteMessage", json=data)
+            
+            if response.status_code != 200:
+                logger.debug(f"⚠️ Не удалось удалить сообщение {message_id}")
                     
         except Exception as e:
             logger.debug(f"⚠️ Ошибка удаления сообщения {message_id}: {e}")
@@ -276,27 +351,29 @@ class UpdateProcessor:
             logger.error(f"❌ Ошибка обработки репоста: {e}")
             await self.bot.send_message(f"❌ Ошибка обработки репоста: {e}")
     
-    async def _handle_digest_channel_link(self, text: str, message: Dict):
+    async def _start_digest_channel_job(self, text: str, chat_id: int):
+        from ..channels.channel_parser import ChannelParser
+        channel_username = ChannelParser().parse_channel_username(text)
+        if not channel_username:
+            await self.bot._send_to_single_user("❌ Некорректная ссылка на канал", chat_id)
+            return
+        
+        logger.info(f"📰 Получена ссылка на канал для дайджеста: @{channel_username}")
+        # Чтение канала идет фоном: ход чтения - в сообщении задачи, остальные обновления не ждут
+        await self.bot.run_in_background(
+            chat_id, f"Дайджест @{channel_username}", self._handle_digest_channel_link(channel_username, chat_id)
+        )
+    
+    async def _handle_digest_channel_link(self, channel_username: str, chat_id: int):
         try:
-            from ..channels.channel_parser import ChannelParser
-            parser = ChannelParser()
-            
-            channel_username = parser.parse_channel_username(text)
-            if not channel_username:
-                await self.bot.send_message("❌ Некорректная ссылка на канал")
-                return
-            
-            logger.info(f"📰 Получена ссылка на канал для дайджеста: @{channel_username}")
-            
-            await self.bot.send_message(f"📰 Читаем новости из @{channel_username}, подождите...")
-            
             if hasattr(self.bot.basic_commands, 'generate_digest_for_channel'):
                 days = getattr(self.bot, 'digest_days', 7)
-                digest_result = await self.bot.basic_commands.generate_digest_for_channel(channel_username, days)
+                digest_result = await self.bot.basic_commands.generate_digest_for_channel(channel_username, days, chat_id)
                 
                 if isinstance(digest_result, dict):
+                    # Страницы дайджеста листаются в том же чате, где он запрошен
                     await self.bot.keyboard_builder.send_message_with_keyboard(
-                        digest_result['text'], digest_result['keyboard'], use_reply_keyboard=False
+                        digest_result['text'], digest_result['keyboard'], use_reply_keyboard=False, to_user=chat_id
                     )
                 else:
                     keyboard = [
@@ -304,14 +381,11 @@ class UpdateProcessor:
                         [{"text": "🏠 Главное меню", "callback_data": "start"}]
                     ]
                     await self.bot.keyboard_builder.send_message_with_keyboard(
-                        digest_result, keyboard, use_reply_keyboard=False
+                        digest_result, keyboard, use_reply_keyboard=False, to_user=chat_id
                     )
             else:
-                await self.bot.send_message("❌ Генератор дайджестов недоступен")
-            
-            self.bot.waiting_for_digest_channel = False
+                await self.bot._send_to_single_user("❌ Генератор дайджестов недоступен", chat_id)
             
         except Exception as e:
             logger.error(f"❌ Ошибка обработки ссылки для дайджеста: {e}")
-            await self.bot.send_message(f"❌ Ошибка: {e}")
-            self.bot.waiting_for_digest_channel = False
\ No newline at end of file
+            await self.bot._send_to_single_user(f"❌ Ошибка: {e}", chat_id)
@@ -0,0 +1,115 @@
+import asyncio
+import hmac
+import secrets
+from typing import Any, Dict, Optional, TYPE_CHECKING
+from loguru import logger
+
+from aiohttp import web
+
+if TYPE_CHECKING:
+    from .bot_client import TelegramBot
+
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """Локальный приемник webhook-обновлений Telegram
+
+    Обновления уходят в тот же диспетчер, что и при long-poll
+    (UpdateProcessor.dispatch_update), ответ Telegram отдается сразу.
+    """
+
+    def __init__(self, bot: "TelegramBot", settings: Dict[str, Any]):
+        self.bot = bot
+        self.host = settings.get('listen_host', '127.0.0.1')
+        self.port = int(settings.get('listen_port', 8443))
+        self.path = settings.get('path', '/telegram/webhook')
+        self.public_url = (settings.get('public_url') or '').rstrip('/')
+        # Без секрета в конфиге генерируем свой на каждый запуск
+        self.secret_token = settings.get('secret_token') or secrets.token_urlsafe(32)
+        self.register = settings.get('register', True)
+
+        self._runner: Optional[web.AppRunner] = None
+        self._stop_event = asyncio.Event()
+        self.received = 0
+        self.rejected = 0
+
+    def build_app(self) -> web.Application:
+        app = web.Application(client_max_size=1024 * 1024)
+        app.router.add_post(self.path, self._handle_update)
+        return app
+
+    async def start(self) -> bool:
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        try:
+            await site.start()
+        except OSError as e:
+            # Порт занят или адрес недоступен - вызывающий перейдет на long-poll
+            logger.error(f"❌ Webhook-сервер не запустился на {self.host}:{self.port}: {e}")
+            await self._runner.cleanup()
+            self._runner = None
+            return False
+        logger.info(f"🌐 Webhook-сервер слушает http://{self.host}:{self.port}{self.path}")
+
+        if self.register:
+            return await self.set_webhook()
+        return True
+
+    async def stop(self, delete_webhook: bool = True):
+        if delete_webhook and self.register:
+            await self.bot.call_api("deleteWebhook", {"drop_pending_updates": False})
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        logger.info("🌐 Webhook-сервер остановлен")
+
+    async def set_webhook(self) -> bool:
+        if not self.public_url:
+            logger.error("❌ Не задан bot.updates.webhook.public_url - Telegram не сможет доставлять обновления")
+            return False
+
+        result = await self.bot.call_api("setWebhook", {
+            "url": f"{self.public_url}{self.path}",
+            "secret_token": self.secret_token,
+            "allowed_updates": ["message", "callback_query", "my_chat_member"],
+            "drop_pending_updates": False,
+        })
+        if result:
+            logger.info(f"✅ Webhook зарегистрирован: {self.public_url}{self.path}")
+            return True
+        return False
+
+    async def _handle_update(self, request: web.Request) -> web.Response:
+        token = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(token, self.secret_token):
+            self.rejected += 1
+            logger.warning(f"🚫 Webhook: неверный секрет от {request.remote}")
+            return web.Response(status=403)
+
+        try:
+            update = await request.json()
+        except Exception:
+            self.rejected += 1
+            return web.Response(status=400)
+
+        if not isinstance(update, dict) or "update_id" not in update:
+            self.rejected += 1
+            return web.Response(status=400)
+
+        self.received += 1
+        self.bot.update_offset = max(self.bot.update_offset, update["update_id"] + 1)
+        self.bot.update_processor.dispatch_update(update)
+        return web.Response(text="ok")
+
+    def request_stop(self):
+        self._stop_event.set()
+
+    async def serve_forever(self):
+        """Держать сервер до остановки прослушивания"""
+        try:
+            await self._stop_event.wait()
+        finally:
+            await self.stop()
@@ -2,6 +2,8 @@ import asyncio
 from typing import Dict, Optional, Any
 from loguru import logger
 
+from ..core.background_tasks import CANCEL_CALLBACK
+
 
 class CallbackProcessor:
     
@@ -71,7 +73,13 @@ class CallbackProcessor:
             await self._handle_add_channel_callback()
         
         elif data == "force_subscribe":
-            await self.bot.channel_commands.force_subscribe(message)
+            await self.bot.run_in_background(
+                self.bot.current_callback_chat_id, "Подписка на каналы",
+                self.bot.channel_commands.force_subscribe(message)
+            )
+        
+        elif data == CANCEL_CALLBACK:
+            await self.bot.cancel_background_task(callback_query.get("message"))
         
         elif data.startswith("manage_region_"):
             await self._handle_manage_region_callback(data)
@@ -212,13 +220,41 @@ class CallbackProcessor:
     async def _handle_digest_callbacks(self, data: str, message: Dict):
         if data.startswith("digest_period_"):
             days = int(data.split("_")[-1])
-            await self._handle_digest_period_selection(days)
+            await self.bot.run_in_background(
+                self.bot.current_callback_chat_id, f"Дайджест за {days} дн.",
+                self._handle_digest_period_selection(days)
+            )
         
         elif data == "digest_channel_link":
             await self._handle_digest_channel_link_request()
         
         elif data.startswith("digest_page_"):
             await self._handle_digest_page_callback(data, message)
+        
+        elif data.startswith("digest_all_channels_"):
+            days = int(data.split("_")[-1])
+            await self._handle_digest_region_selection(days)
+        
+        elif data.startswith("digest_refresh_"):
+            # digest_refresh_<channel|region>_<цель>_<дни>: пересчет мимо кэша
+            parts = data.split("_")
+            scope, days = parts[2], int(parts[-1])
+            target = "_".join(parts[3:-1])
+            chat_id = self.bot.current_callback_chat_id
+            await self.bot.run_in_background(
+                chat_id, f"Обновление дайджеста за {days} дн.",
+                self._handle_digest_refresh(scope, target, days, chat_id)
+            )
+        
+        elif data.startswith("digest_region_"):
+            parts = data.split("_")
+            days = int(parts[-1])
+            region_key = "_".join(parts[2:-1])
+            chat_id = self.bot.current_callback_chat_id
+            await self.bot.run_in_background(
+                chat_id, f"Дайджест региона {region_key} за {days} дн.",
+                self._handle_region_digest(region_key, days, chat_id)
+            )
     
     async def _handle_digest_period_selection(self, days: int):
         try:
@@ -234,6 +270,62 @@ class CallbackProcessor:
             logger.error(f"❌ Ошибка генерации дайджеста: {e}")
             await self.bot.send_message(f"❌ Ошибка генерации дайджеста: {e}")
     
+    async def _handle_digest_region_selection(self, days: int):
+        try:
+            regions_data = await self.bot.channel_manager.get_all_channels_grouped()
+            keyboard = []
+            for region_key, region_info in regions_data.items():
+                channels_count = len(region_info.get('channels', []))
+                if not channels_count:
+                    continue
+                region_name = region_info.get('name', f'📍 {region_key.title()}')
+                keyboard.append([{
+                    "text": f"{region_name} ({channels_count})",
+                    "callback_data": f"digest_region_{region_key}_{days}"
+                }])
+            
+            if not keyboard:
+                await self.bot.send_message("❌ Нет регионов с каналами")
+                return
+            
+            keyboard.append([{"text": "🏠 Главное меню", "callback_data": "start"}])
+            await self.bot.keyboard_builder.send_message_with_keyboard(
+                f"🌍 <b>Дайджест региона за {days} дн.</b>\n\n"
+                "Все каналы региона читаются напрямую из Telegram параллельно:",
+                keyboard, use_reply_keyboard=False
+            )
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка выбора региона для дайджеста: {e}")
+            await self.bot.send_message(f"❌ Ошибка: {e}")
+    
+    async def _handle_region_digest(self, region_key: str, days: int, chat_id: int, use_cache: bool = True):
+        digest_result = await self.bot.basic_commands.generate_digest_for_region(region_key, days, chat_id, use_cache)
+        await self._send_digest_result(digest_result, chat_id)
+    
+    async def _handle_digest_refresh(self, scope: str, target: str, days: int, chat_id: int):
+        if scope == "region":
+            await self._handle_region_digest(target, days, chat_id, use_cache=False)
+        else:
+            digest_result = await self.bot.basic_commands.generate_digest_for_channel(
+                target, days, chat_id, use_cache=False
+            )
+            await self._send_digest_result(digest_result, chat_id)
+    
+    async def _send_digest_result(self, digest_result, chat_id: int):
+        if isinstance(digest_result, dict):
+            await self.bot.keyboard_builder.send_message_with_keyboard(
+                digest_result['text'], digest_result['keyboard'], use_reply_keyboard=False, to_user=chat_id
+            )
+        else:
+            keyboard = [
+                [{"text": "📰 Новый дайджест", "callback_data": "digest"}],
+                [{"text": "🏠 Главное меню", "callback_data": "start"}]
+            ]
+            await self.bot.keyboard_builder.send_message_with_keyboard(
+                digest_result, keyboard, use_reply_keyboard=False, to_user=chat_id
+            )
+    
     async def _handle_digest_channel_link_request(self):
         self.bot.waiting_for_digest_channel = True
         await self.bot.send_message(
@@ -252,16 +344,17 @@ class CallbackProcessor:
                 return
             
             page = int(parts[-1])
-            channel_username = "_".join(parts[2:-1])
+            digest_id = "_".join(parts[2:-1])
+            chat_id = self.bot.current_callback_chat_id
             
-            logger.info(f"📄 Запрос страницы {page} дайджеста для @{channel_username}")
+            logger.info(f"📄 Запрос страницы {page} дайджеста {digest_id}")
             
             if hasattr(self.bot.basic_commands, 'digest_generator') and self.bot.basic_commands.digest_generator:
-                page_result = await self.bot.basic_commands.digest_generator.get_digest_page(channel_username, page)
+                page_result = await self.bot.basic_commands.digest_generator.get_digest_page(chat_id, digest_id, page)
                 
                 if isinstance(page_result, dict):
                     await self.bot.keyboard_builder.send_message_with_keyboard(
-                        page_result['text'], page_result['keyboard'], use_reply_keyboard=False
+                        page_result['text'], page_result['keyboard'], use_reply_keyboard=False, to_user=chat_id
                     )
                 else:
                     await self.bot.send_message("❌ Ошибка получения страницы дайджеста")
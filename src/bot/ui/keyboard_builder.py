@@ -1,5 +1,4 @@
 import asyncio
-import httpx
 import json
 from typing import Dict, List, Optional, Any, TYPE_CHECKING
 from loguru import logger
@@ -74,20 +73,19 @@ class KeyboardBuilder:
                 else:
                     data["reply_markup"] = {"inline_keyboard": keyboard}
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(f"{self.bot.base_url}/editMessageText", json=data)
-                
-                if response.status_code == 200:
-                    logger.debug(f"✏️ Сообщение {target_message_id} отредактировано")
+            response = await self.bot.http_client.post(f"{self.bot.base_url}/editMessageText", json=data)
+            
+            if response.status_code == 200:
+                logger.debug(f"✏️ Сообщение {target_message_id} отредактировано")
+                return True
+            else:
+                error_text = response.text
+                if "message is not modified" in error_text:
+                    logger.debug("⚠️ Сообщение не изменилось")
                     return True
-                else:
-                    error_text = response.text
-                    if "message is not modified" in error_text:
-                        logger.debug("⚠️ Сообщение не изменилось")
-                        return True
-                    
-                    logger.warning(f"⚠️ Не удалось отредактировать сообщение: {error_text}")
-                    return False
+                
+                logger.warning(f"⚠️ Не удалось отредактировать сообщение: {error_text}")
+                return False
                     
         except Exception as e:
             logger.error(f"❌ Ошибка редактирования сообщения: {e}")
@@ -119,27 +117,26 @@ class KeyboardBuilder:
                 else:
                     data["reply_markup"] = {"inline_keyboard": keyboard}
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(f"{self.bot.base_url}/sendMessage", json=data)
+            response = await self.bot.http_client.post(f"{self.bot.base_url}/sendMessage", json=data)
+            
+            if response.status_code == 200:
+                response_data = response.json()
+                message_id = response_data["result"]["message_id"]
                 
-                if response.status_code == 200:
-                    response_data = response.json()
-                    message_id = response_data["result"]["message_id"]
+                if keyboard and not use_reply_keyboard:
+                    self.bot.active_inline_messages.append({
+                        'chat_id': chat_id,
+                        'message_id': message_id
+                    })
                     
-                    if keyboard and not use_reply_keyboard:
-                        self.bot.active_inline_messages.append({
-                            'chat_id': chat_id,
-                            'message_id': message_id
-                        })
-                        
-                    if chat_id == self.bot.group_chat_id or chat_id == self.bot.admin_chat_id:
-                        self.bot.last_message_id = message_id
-                    
-                    logger.debug(f"📤 Сообщение отправлено с ID: {message_id}")
-                    return True
-                else:
-                    logger.error(f"❌ Ошибка отправки: {response.text}")
-                    return False
+                if chat_id == self.bot.group_chat_id or chat_id == self.bot.admin_chat_id:
+                    self.bot.last_message_id = message_id
+                
+                logger.debug(f"📤 Сообщение отправлено с ID: {message_id}")
+                return True
+            else:
+                logger.error(f"❌ Ошибка отправки: {response.text}")
+                return False
                     
         except Exception as e:
             logger.error(f"❌ Ошибка отправки нового сообщения: {e}")
@@ -167,10 +164,9 @@ class KeyboardBuilder:
                 "reply_markup": {"remove_keyboard": True}
             }
             
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(f"{self.bot.base_url}/sendMessage", json=data)
-                if response.status_code == 200:
-                    logger.debug("🧹 Клавиатура снизу экрана удалена")
+            response = await self.bot.http_client.post(f"{self.bot.base_url}/sendMessage", json=data, timeout=10.0)
+            if response.status_code == 200:
+                logger.debug("🧹 Клавиатура снизу экрана удалена")
                         
         except Exception as e:
             logger.debug(f"⚠️ Не удалось удалить старую клавиатуру: {e}")
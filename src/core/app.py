@@ -1,5 +1,4 @@
 import asyncio
-import re
 import os
 import sys
 import pytz
@@ -9,7 +8,12 @@ from loguru import logger
 
 from .config_loader import ConfigLoader
 from .lifecycle import LifecycleManager
-from ..monitoring import SubscriptionCacheManager, ChannelMonitor, MessageProcessor
+from ..monitoring import SubscriptionCacheManager, ChannelMonitor, MessageProcessor, NearDuplicateDetector, ConnectionSupervisor, PollScheduler, TrendDetector, IncidentClusterer
+from ..delivery import MediaRelay, MediaCache, MessageRenderer, PostCoalescer, DeliveryLanes
+from ..engagement_refresher import EngagementRefresher
+from ..digest_generator import DigestGenerator
+from ..digest_warmer import DigestWarmer
+from ..delivery.renderer import strip_markdown, utf16_len, MESSAGE_LIMIT, CAPTION_LIMIT
 
 
 class NewsMonitorWithBot:
@@ -33,6 +37,17 @@ class NewsMonitorWithBot:
         # Мониторинг
         self.message_processor = None
         self.channel_monitor = None
+        self.connection_supervisor = None
+        self.poll_scheduler = None
+        self.engagement_refresher = None
+        self.digest_warmer = None
+        self.media_relay = None
+        self.renderer = MessageRenderer()
+        self.coalescer = None
+        self.delivery_lanes = None
+        self.dedup = None
+        self.trends = None
+        self.incidents = None
         
         # Кэш медиа групп
         self.processed_media_groups: Set[int] = set()
@@ -79,19 +94,8 @@ class NewsMonitorWithBot:
 
 
     def clean_text_formatting(self, text: str) -> str:
-        """Простая очистка текста от markdown символов"""
-        if not text:
-            return ""
-        
-        # Убираем markdown символы, оставляем только текст
-        text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)  # **text** -> text
-        text = re.sub(r'\*(.*?)\*', r'\1', text)      # *text* -> text  
-        text = re.sub(r'__(.*?)__', r'\1', text)      # __text__ -> text
-        text = re.sub(r'~~(.*?)~~', r'\1', text)      # ~~text~~ -> text
-        text = re.sub(r'`(.*?)`', r'\1', text)        # `text` -> text
-        text = re.sub(r'```(.*?)```', r'\1', text, flags=re.DOTALL)  # ```text``` -> text
-        
-        return text
+        """Простая очистка текста от markdown символов (один проход, см. delivery.renderer)"""
+        return strip_markdown(text)
 
 
 
@@ -146,14 +150,9 @@ class NewsMonitorWithBot:
             logger.warning(f"⚠️ Ошибка чтения channels_config.yaml: {e}")
         
         # ПРИОРИТЕТ 2: Если не найден в явных настройках, ищем по ключевым словам
-        regions_config = self.config_loader.get_regions_config()
-        for region_key, region_data in regions_config.items():
-            keywords = region_data.get('keywords', [])
-            for keyword in keywords:
-                if keyword.lower() in channel_username.lower():
-                    found_regions.append(region_key)
-                    logger.debug(f"📍 Канал @{channel_username} найден по ключевому слову '{keyword}' → {region_key}")
-                    break
+        for region_key in self.config_loader.get_region_index().match_channel(channel_username):
+            found_regions.append(region_key)
+            logger.debug(f"📍 Канал @{channel_username} найден по ключевым словам → {region_key}")
         
         # FALLBACK: Если нигде не найден
         if not found_regions:
@@ -174,6 +173,13 @@ class NewsMonitorWithBot:
             
             await self.channel_monitor.setup_realtime_handlers()
             
+            if self.connection_supervisor:
+                self.connection_supervisor.start()
+            
+            await self.start_poll_scheduler()
+            self.start_engagement_refresher()
+            self.start_digest_warmer()
+            
             if self.telegram_bot:
                 bot_listener_task = asyncio.create_task(self.telegram_bot.start_listening())
                 logger.info("👂 Запущен прослушиватель команд бота")
@@ -192,17 +198,6 @@ class NewsMonitorWithBot:
                         await self.send_status_update()
                         last_status_update = current_time
                     
-                    # Периодическая проверка статуса подключения Telethon-клиента
-                    if self.telegram_monitor and self.telegram_monitor.client:
-                        if not self.telegram_monitor.client.is_connected():
-                            logger.warning("🔌 Обнаружен разрыв соединения Telethon-клиента! Попытка переподключения...")
-                            try:
-                                await self.telegram_monitor.client.connect()
-                                if self.telegram_monitor.client.is_connected():
-                                    logger.success("🔌 Подключение к Telethon-клиенту успешно восстановлено!")
-                            except Exception as reconnect_err:
-                                logger.error(f"❌ Не удалось восстановить подключение Telethon-клиента: {reconnect_err}")
-                                
                     await asyncio.sleep(30)
                     
                 except Exception as e:
@@ -214,6 +209,48 @@ class NewsMonitorWithBot:
             if self.telegram_bot:
                 await self.telegram_bot.send_error_alert(f"Ошибка мониторинга: {e}")
 
+    async def start_poll_scheduler(self):
+        """Опрос каналов, для которых нет обработчика реального времени"""
+        polled_channels = self.channel_monitor.polled_channels if self.channel_monitor else []
+        polling_settings = self.config_loader.get_polling_settings()
+        if not polled_channels or not polling_settings.get('enabled'):
+            return
+        
+        self.poll_scheduler = PollScheduler(self.channel_monitor.poll_channel, polling_settings)
+        
+        # Начальная оценка активности - по истории постов в базе
+        history_days = polling_settings['history_days']
+        history = await self.database.get_channels_with_news(days=history_days)
+        posts_per_hour = {
+            item['username'].lstrip('@').lower(): item['messages_count'] / (history_days * 24)
+            for item in history
+        }
+        for channel in polled_channels:
+            username = channel['username'].lstrip('@')
+            self.poll_scheduler.add_channel(username, posts_per_hour.get(username.lower(), 0.0))
+        self.poll_scheduler.start()
+
+    def start_engagement_refresher(self):
+        """Фоновое обновление просмотров и реакций сохраненных постов"""
+        engagement_settings = self.config_loader.get_engagement_settings()
+        if not engagement_settings.get('enabled') or not self.telegram_monitor or not self.database:
+            return
+        
+        self.engagement_refresher = EngagementRefresher(self.telegram_monitor, self.database, engagement_settings)
+        self.engagement_refresher.start()
+
+    def start_digest_warmer(self):
+        """Заранее рассчитанные дайджесты стандартных периодов"""
+        warmer_settings = self.config_loader.get_digest_warmer_settings()
+        if not warmer_settings.get('enabled') or not self.telegram_monitor or not self.database:
+            return
+        
+        digest_generator = DigestGenerator(
+            self.database, self.telegram_monitor, self.config_loader.get_digest_settings()
+        )
+        self.digest_warmer = DigestWarmer(digest_generator, self.database, warmer_settings)
+        self.digest_warmer.start()
+
     async def send_status_update(self):
         try:
             if not self.telegram_bot:
@@ -232,6 +269,66 @@ class NewsMonitorWithBot:
                 stats = self.subscription_cache.get_cache_stats()
                 status_text += f"📡 Подписок: {stats['total_subscribed']}\n"
             
+            if self.connection_supervisor and self.connection_supervisor.reconnects:
+                supervisor_stats = self.connection_supervisor.get_stats()
+                status_text += (
+                    f"🔌 Переподключений: {supervisor_stats['reconnects']}, "
+                    f"догружено постов: {supervisor_stats['caught_up']}\n"
+                )
+            
+            if self.poll_scheduler:
+                poll_stats = self.poll_scheduler.get_stats()
+                status_text += (
+                    f"📡 Опрос без push: {poll_stats['channels']} каналов, {poll_stats['polls']} опросов, "
+                    f"интервал {poll_stats['min_interval']}-{poll_stats['max_interval']} с\n"
+                )
+            
+            if self.engagement_refresher:
+                engagement_stats = self.engagement_refresher.get_stats()
+                status_text += (
+                    f"📈 Статистика постов: обновлено {engagement_stats['refreshed']} "
+                    f"за {engagement_stats['requests']} запросов\n"
+                )
+            
+            if self.delivery_lanes:
+                lanes_stats = self.delivery_lanes.get_stats()
+                status_text += "🚦 Доставка: " + ", ".join(
+                    f"{lane} {stats['done']} (ожидание до {stats['max_wait']} с)"
+                    for lane, stats in lanes_stats.items()
+                ) + "\n"
+            
+            if self.coalescer:
+                coalescer_stats = self.coalescer.get_stats()
+                status_text += (
+                    f"📦 Склейка: {coalescer_stats['posts_received']} постов → "
+                    f"{coalescer_stats['messages_sent']} сообщений\n"
+                )
+            
+            if self.dedup:
+                dedup_stats = self.dedup.get_stats()
+                status_text += f"🧬 Перепостов склеено: {dedup_stats['duplicates']} из {dedup_stats['checked']}\n"
+            
+            if self.trends:
+                trends_stats = self.trends.get_stats()
+                status_text += (
+                    f"📈 Тренды: {trends_stats['posts']} постов, {trends_stats['terms']} слов в окне, "
+                    f"оповещений {trends_stats['alerts']}\n"
+                )
+            
+            if self.incidents:
+                incident_stats = self.incidents.get_stats()
+                status_text += (
+                    f"🚨 Происшествия: склеено {incident_stats['merged']} алертов из {incident_stats['checked']}, "
+                    f"правок {incident_stats['edits']}\n"
+                )
+            
+            if self.media_relay and self.media_relay.cache:
+                cache_stats = self.media_relay.cache.get_stats()
+                status_text += (
+                    f"💾 Кэш медиа: {cache_stats['size_mb']}/{cache_stats['max_mb']} MB, "
+                    f"попаданий {cache_stats['hit_rate']}%\n"
+                )
+            
             await self.telegram_bot.send_system_notification(status_text)
             
         except Exception as e:
@@ -254,8 +351,42 @@ class NewsMonitorWithBot:
             self.telegram_bot.monitor_bot = self
             logger.info("✅ Monitor bot установлен в Telegram бота")
         
+        config = self.config_loader.get_config() or {}
+        self.renderer.update_config(
+            self.config_loader.get_regions_config(),
+            (config.get('output') or {}).get('topics') or {}
+        )
+        
+        coalescing_settings = self.config_loader.get_coalescing_settings()
+        if coalescing_settings.get('enabled') and self.telegram_bot:
+            self.coalescer = PostCoalescer(self.renderer, self._send_to_target_thread, coalescing_settings)
+            logger.info(f"📦 Склейка постов включена: окно {coalescing_settings['window_seconds']} с")
+        
+        if self.telegram_bot:
+            self.delivery_lanes = DeliveryLanes(self.config_loader.get_delivery_lanes_settings())
+            self.delivery_lanes.start()
+        
+        dedup_settings = self.config_loader.get_dedup_settings()
+        if dedup_settings.get('enabled'):
+            self.dedup = NearDuplicateDetector(self.database, dedup_settings, self.append_duplicate_sources)
+            await self.dedup.load()
+        
+        trends_settings = self.config_loader.get_trends_settings()
+        if trends_settings.get('enabled'):
+            on_alert = self.send_trend_alert if trends_settings.get('alert_enabled') and self.telegram_bot else None
+            self.trends = TrendDetector(trends_settings, self.get_channel_region, on_alert)
+        
+        incident_settings = self.config_loader.get_incident_settings()
+        if incident_settings.get('enabled'):
+            self.incidents = IncidentClusterer(incident_settings, self.get_channel_region, self.append_incident_sources)
+        
         # Инициализируем мониторинг компоненты
         if self.telegram_monitor:
+            media_settings = self.config_loader.get_media_relay_settings()
+            media_cache = None
+            if media_settings.get('cache_enabled'):
+                media_cache = MediaCache(media_settings['cache_dir'], media_settings['cache_max_mb'])
+            self.media_relay = MediaRelay(self.telegram_monitor, media_settings, media_cache)
             self.message_processor = MessageProcessor(self.database, self)
             self.channel_monitor = ChannelMonitor(
                 self.telegram_monitor,
@@ -263,6 +394,12 @@ class NewsMonitorWithBot:
                 self.message_processor,
                 self.config_loader  # Передаем config_loader для загрузки настроек таймаутов
             )
+            self.connection_supervisor = ConnectionSupervisor(
+                self.telegram_monitor,
+                self.channel_monitor,
+                self.message_processor,
+                self.config_loader.get_reconnect_settings()
+            )
         
         return True
 
@@ -305,12 +442,27 @@ class NewsMonitorWithBot:
                 await self.telegram_bot.send_error_alert(f"Критическая ошибка: {e}")
             return False
         finally:
+            if self.connection_supervisor:
+                await self.connection_supervisor.stop()
+            if self.poll_scheduler:
+                await self.poll_scheduler.stop()
+            if self.engagement_refresher:
+                await self.engagement_refresher.stop()
+            if self.digest_warmer:
+                await self.digest_warmer.stop()
+            if self.delivery_lanes:
+                await self.delivery_lanes.drain()
+            if self.coalescer:
+                await self.coalescer.flush_all()
             await self.lifecycle_manager.shutdown()
         
         return True
 
-    async def send_message_to_target(self, news: Dict, is_media: bool = False):
-        """Универсальная отправка сообщения в канал или чат с сортировкой по темам"""
+    async def send_message_to_target(self, news: Dict, is_media: bool = False) -> bool:
+        """Универсальная отправка сообщения в канал или чат с сортировкой по темам
+
+        Возвращает True, если сообщение ушло хотя бы в один регион.
+        """
         try:
             is_alert = news.get('is_alert', False)
             alert_priority = news.get('alert_priority', False)
@@ -345,73 +497,38 @@ class NewsMonitorWithBot:
             
             if not target or target in ["@your_news_channel", "your_news_channel"]:
                 if is_media:
-                    await self.send_media_via_bot(news)
-                else:
-                    await self.send_text_with_link(news)
-                return
+                    return await self.send_media_via_bot(news)
+                return await self.send_text_with_link(news)
             
             logger.info(f"📤 Отправляем сообщение в канал: {target}")
             
-            text = news.get('text', '')
-            url = news.get('url', '')
-            channel_username = news.get('channel_username', '')
-            date = news.get('date')
-            
-            text = self.clean_text_formatting(text)
-            
-            date_str = ""
-            if date:
-                try:
-                    if hasattr(date, 'strftime'):
-                        date_str = f"\n📅 {date.strftime('%d.%m.%Y %H:%M')} (Владивосток)"
-                    else:
-                        date_str = f"\n📅 {date}"
-                except:
-                    pass
-            
-            if is_media:
-                message = f"@{channel_username}"
-                if text:
-                    message += f"\n\n{text}"
-                if date_str:
-                    message += f"\n{date_str}"
-                
-                video_count = news.get('video_count', 0)
-                photo_count = news.get('photo_count', 0)
-                
-                if video_count > 0 or photo_count > 0:
-                    media_info = []
-                    if photo_count > 0:
-                        photo_text = f"{photo_count} фото" if photo_count > 1 else "фото"
-                        media_info.append(f"📸 {photo_text}")
-                    if video_count > 0:
-                        video_text = f"{video_count} видео" if video_count > 1 else "видео"
-                        media_info.append(f"🎬 {video_text}")
-                    
-                    if media_info:
-                        message += f"\n\n{' + '.join(media_info)}"
-                
-                if url:
-                    message += f"\n\n🔗 {url}"
+            media_files = news.get('media_files') if is_media else None
+            if media_files:
+                kind = 'caption'
+            elif is_media:
+                kind = 'media_notice'
             else:
-                message = f"@{channel_username}"
-                if text:
-                    message += f"\n\n{text}"
-                if date_str:
-                    message += f"\n{date_str}"
-                if url:
-                    message += f"\n\n{url}"
+                kind = 'text'
             
             all_success = True
             sent_count = 0
+            sent_refs = []
             
             for region, thread_id in region_threads:
                 try:
                     logger.info(f"📤 Отправляем в регион '{region}' (тема: {thread_id or 'общая'})")
                     
-                    if is_media and news.get('media_files'):
-                        media_files = news.get('media_files', [])
-                        caption = news.get('caption', message)
+                    # Обычные посты без файлов можно склеить в сводку, алерты - никогда
+                    if self.coalescer and not is_alert and not media_files:
+                        success = await self.coalescer.submit(region, thread_id, news, kind)
+                        if success:
+                            sent_count += 1
+                        continue
+                    
+                    message = self.renderer.render(news, kind, region, news.get('caption_note', ''))
+                    
+                    if media_files:
+                        caption = message
                         
                         if len(media_files) == 1:
                             success = await self.telegram_bot.send_media_with_caption(
@@ -427,6 +544,13 @@ class NewsMonitorWithBot:
                     if success:
                         logger.info(f"✅ Сообщение отправлено в регион '{region}'")
                         sent_count += 1
+                        # Запоминаем, что править, если пост потом выйдет в других каналах
+                        sent_refs.append({
+                            'chat_id': target,
+                            'message_id': success.get('message_id'),
+                            'caption': bool(media_files),
+                            'text': message,
+                        })
                     else:
                         logger.error(f"❌ Ошибка отправки в регион '{region}'")
                         all_success = False
@@ -435,13 +559,68 @@ class NewsMonitorWithBot:
                     logger.error(f"❌ Ошибка отправки в регион '{region}': {e}")
                     all_success = False
             
+            news['sent_refs'] = sent_refs
+            
             if sent_count > 0:
                 logger.info(f"✅ Сообщение отправлено в {sent_count}/{len(region_threads)} регионов")
             else:
                 logger.error("❌ Ошибка отправки во все регионы")
+            return sent_count > 0
                 
         except Exception as e:
             logger.error(f"❌ Ошибка отправки в канал: {e}")
+            return False
+
+    async def send_trend_alert(self, region: str, trends: list):
+        """Сводное оповещение о всплеске слов в регионе"""
+        region_data = self.config_loader.get_regions_config().get(region) or {}
+        lines = [f"📈 <b>Всплеск в регионе {region_data.get('name', region)}</b>"]
+        for trend in trends:
+            lines.append(
+                f"• <b>{trend.term}</b> - {trend.posts} постов в {trend.channels} каналах "
+                f"(обычно ~{trend.expected:g})"
+            )
+        await self.telegram_bot.send_system_notification("\n".join(lines))
+
+    async def append_duplicate_sources(self, cluster):
+        """Дописать к отправленному посту каналы, где вышел тот же текст"""
+        note = "\n\n🔁 Также в: " + ", ".join(f"@{channel}" for channel in cluster.also_in)
+        await self._edit_sent_note(cluster.sent_refs, 'duplicates', note)
+
+    async def append_incident_sources(self, incident):
+        """Дописать к первому алерту о происшествии каналы, сообщившие о нем следом"""
+        note = f"\n\n📡 Также сообщают ({len(incident.sources)}): " + ", ".join(
+            f"@{channel}" for channel in incident.sources
+        )
+        await self._edit_sent_note(incident.sent_refs, 'incident', note)
+
+    async def _edit_sent_note(self, refs: List[Dict], key: str, note: str):
+        """Обновить пометку key под отправленными сообщениями (пометки разных видов не затирают друг друга)"""
+        if not self.telegram_bot:
+            return
+        
+        for ref in refs:
+            if not ref.get('message_id'):
+                continue
+            notes = dict(ref.get('notes') or {})
+            notes[key] = note
+            text = ref['text'] + "".join(notes.values())
+            limit = CAPTION_LIMIT if ref.get('caption') else MESSAGE_LIMIT
+            if utf16_len(text) > limit:
+                logger.debug(f"🔁 Пометка не влезает в сообщение {ref['message_id']}")
+                continue
+            ref['notes'] = notes
+            await self.telegram_bot.edit_channel_message(
+                ref['chat_id'], ref['message_id'], text,
+                is_caption=ref.get('caption', False),
+                parse_mode="HTML" if ref.get('caption') else None
+            )
+
+    async def _send_to_target_thread(self, text: str, thread_id: Optional[int], region: str) -> bool:
+        config = self.config_loader.get_config() or {}
+        output_config = config.get('output', {})
+        target = output_config.get('target_group') or output_config.get('target_channel')
+        return await self.telegram_bot.send_message_to_channel(text, target, None, thread_id)
 
     async def forward_original_message(self, news: Dict) -> bool:
         """Пересылка оригинального сообщения"""
@@ -526,16 +705,18 @@ class NewsMonitorWithBot:
         return False
 
     async def download_and_send_media(self, news: Dict) -> bool:
-        """Скачать медиа файлы через Telethon и отправить через Bot API"""
+        """Скачать медиа файлы через Telethon в память и отправить через Bot API"""
         try:
-            import os
-            import tempfile
             from telethon.tl.types import MessageMediaPhoto, MessageMediaDocument
             
             channel_username = news.get('channel_username')
             message_id = news.get('message_id')
             text = news.get('text', '')
             
+            if not self.media_relay:
+                logger.warning("⚠️ Ретрансляция медиа недоступна")
+                return False
+            
             logger.info(f"📥 Скачиваем медиа из @{channel_username}, message_id: {message_id}")
             logger.info(f"📝 Текст сообщения (длина {len(text)}): {text[:100]}{'...' if len(text) > 100 else ''}")
             
@@ -564,8 +745,7 @@ class NewsMonitorWithBot:
                         logger.info(f"📝 Найден текст в медиа-группе (длина {len(text)}): {text[:100]}{'...' if len(text) > 100 else ''}")
                         break
             
-            media_files = []
-            temp_files = []
+            relayed = []
             video_count = 0
             photo_count = 0
             
@@ -585,215 +765,109 @@ class NewsMonitorWithBot:
             
             logger.info(f"📊 В группе: {photo_count} фото, {video_count} видео")
             
-            for i, msg in enumerate(messages_to_process):
-                if not msg.media:
-                    continue
-                    
-                media_type = "document"
-                file_extension = ".bin"
-                should_download = False
-                
-                if isinstance(msg.media, MessageMediaPhoto):
-                    media_type = "photo"
-                    file_extension = ".jpg"
-                    should_download = True
-                elif isinstance(msg.media, MessageMediaDocument):
-                    document = msg.media.document
-                    if document.mime_type:
-                        if document.mime_type.startswith('image/'):
-                            media_type = "photo"
-                            file_extension = ".jpg"
-                            should_download = True
-                        elif document.mime_type.startswith('video/'):
-                            logger.info(f"🎬 Пропускаем видео {i+1} (слишком долго скачивается)")
+            # Резервы бюджета скачанных файлов возвращаются при любом выходе из блока
+            async with self.media_relay.hold() as held:
+                try:
+                    parts = []
+                    large_videos = []
+                    for i, msg in enumerate(messages_to_process):
+                        if not msg.media:
                             continue
-                        elif document.mime_type.startswith('audio/'):
-                            media_type = "document"
-                            file_extension = ".mp3"
-                            should_download = True
+                        
+                        media_type, file_extension = self.media_relay.classify(msg)
+                        if not media_type:
+                            continue
+                        
+                        if media_type == "video" and not self.media_relay.fits(msg, media_type):
+                            size_mb = (self.media_relay.estimate_size(msg) or 0) / 1024 / 1024
+                            logger.info(f"🎬 Видео {i+1} слишком большое ({size_mb:.1f} MB), отправим превью")
+                            large_videos.append((msg, i))
+                            continue
+                        
+                        parts.append((msg, i, media_type, file_extension))
                     
-                    for attr in document.attributes:
-                        if hasattr(attr, 'file_name') and attr.file_name:
-                            file_extension = os.path.splitext(attr.file_name)[1] or file_extension
-                            break
-                
-                if should_download:
-                    with tempfile.NamedTemporaryFile(suffix=f"_{i}{file_extension}", delete=False) as temp_file:
-                        temp_path = temp_file.name
-                        temp_files.append(temp_path)
+                    # Большие видео заменяем превью - в том же альбоме и том же резерве бюджета
+                    thumbnails = large_videos[:max(0, 10 - len(parts))]
+                    if parts or thumbnails:
+                        logger.info(f"💾 Скачиваем {len(parts) + len(thumbnails)} медиа параллельно")
+                        relayed = await self.media_relay.fetch_album(parts, thumbnails, held=held)
+                    
+                    # Видео, которые не скачались целиком, заменены превью или пропущены
+                    relayed_videos = sum(1 for item in relayed if item.media_type == "video")
+                    skipped_videos = video_count - relayed_videos
+                    
+                    media_files = [(item.as_upload(), item.media_type) for item in relayed]
+                    
+                    if not media_files:
+                        if video_count > 0:
+                            logger.info(f"🎬 Видео ({video_count} шт.) не удалось переслать, отправляем текстовое уведомление")
+                            news['video_count'] = video_count
+                            news['photo_count'] = photo_count
+                            return await self.send_message_to_target(news, is_media=True)
+                        else:
+                            logger.warning("❌ Не удалось скачать медиа файлы")
+                            return False
+                    
+                    if not text:
+                        logger.warning("⚠️ Текст сообщения пустой!")
+                    
+                    caption_note = ""
+                    if skipped_videos > 0:
+                        video_text = f"{skipped_videos} видео" if skipped_videos > 1 else "видео"
+                        caption_note = f"🎬 В посте также есть {video_text} - смотрите по ссылке"
                     
-                    logger.info(f"💾 Скачиваем {media_type} {len(media_files)+1}")
-                    await self.telegram_monitor.client.download_media(msg, temp_path)
-                    media_files.append((temp_path, media_type))
-            
-            if not media_files:
-                if video_count > 0:
-                    logger.info(f"🎬 Пост содержит только видео ({video_count} шт.), отправляем текстовое уведомление")
                     news['video_count'] = video_count
                     news['photo_count'] = photo_count
-                    await self.send_message_to_target(news, is_media=True)
-                    return True
-                else:
-                    logger.warning("❌ Не удалось скачать медиа файлы")
-                    return False
-            
-            try:
-                vladivostok_tz = pytz.timezone('Asia/Vladivostok')
-                date = news.get('date')
-                if date:
-                    try:
-                        if isinstance(date, str):
-                            date = datetime.fromisoformat(date.replace('Z', '+00:00'))
-                        if date.tzinfo is None:
-                            date = date.replace(tzinfo=pytz.UTC)
-                        date_vlk = date.astimezone(vladivostok_tz)
-                        date_str = f"\n📅 {date_vlk.strftime('%d.%m.%Y %H:%M')} (Владивосток)"
-                    except:
-                        date_str = ""
-                else:
-                    date_str = ""
-                
-                caption = f"@{channel_username}"
-                if text:
-                    clean_text = self.clean_text_formatting(text.strip())
-                    if len(clean_text) > 800:
-                        clean_text = clean_text[:800] + "..."
-                    caption += f"\n\n{clean_text}"
-                    logger.info(f"📝 Добавлен текст в caption: {clean_text[:50]}...")
-                else:
-                    logger.warning("⚠️ Текст сообщения пустой!")
-                
-                if date_str:
-                    caption += f"\n{date_str}"
-                
-                if video_count > 0:
-                    video_text = f"{video_count} видео" if video_count > 1 else "видео"
-                    caption += f"\n\n🎬 В посте также есть {video_text}"
-                
-                url = news.get('url')
-                if url:
-                    caption += f"\n\n🔗 {url}"
-                
-                logger.info(f"📋 Итоговый caption (длина {len(caption)}): {caption[:150]}{'...' if len(caption) > 150 else ''}")
-                
-                news['video_count'] = video_count
-                news['photo_count'] = photo_count
-                news['media_files'] = media_files
-                news['caption'] = caption
-                news['text'] = caption
-                
-                await self.send_message_to_target(news, is_media=True)
-                success = True
-                
-                if success:
+                    news['media_files'] = media_files
+                    news['caption_note'] = caption_note
+                    
+                    if not await self.send_message_to_target(news, is_media=True):
+                        logger.warning(f"⚠️ Медиа ({len(media_files)} файл(ов)) не отправлено")
+                        return False
                     logger.info(f"✅ Медиа успешно отправлено: {len(media_files)} файл(ов)")
                     return True
-                else:
-                    logger.error("❌ Не удалось отправить медиа")
-                    return False
-                
-            finally:
-                for temp_path in temp_files:
-                    try:
-                        os.unlink(temp_path)
-                    except:
-                        pass
-                logger.info(f"🗑️ Удалено {len(temp_files)} временных файлов")
+                    
+                finally:
+                    # Байты больше не нужны - их резерв вернет hold()
+                    news.pop('media_files', None)
             
         except Exception as e:
             logger.error(f"❌ Ошибка скачивания и отправки медиа: {e}")
             return False
 
-    async def send_media_via_bot(self, news: Dict):
+    async def send_media_via_bot(self, news: Dict) -> bool:
         """Отправка сообщения с файлами через бота"""
         try:
-            text = news.get('text', '')
-            url = news.get('url', '')
             channel_username = news.get('channel_username', '')
-            date = news.get('date')
-            
-            date_str = ""
-            if date:
-                try:
-                    if hasattr(date, 'strftime'):
-                        date_str = f"\n📅 {date.strftime('%d.%m.%Y %H:%M')} (Владивосток)"
-                    else:
-                        date_str = f"\n📅 {date}"
-                except:
-                    pass
-            
-            media_notification = f"@{channel_username}"
-            
-            if text:
-                clean_text = self.clean_text_formatting(text)
-                media_notification += f"\n\n{clean_text}"
-            
-            if date_str:
-                media_notification += f"\n{date_str}"
-            
-            video_count = news.get('video_count', 0)
-            photo_count = news.get('photo_count', 0)
-            
-            if video_count > 0 or photo_count > 0:
-                media_info = []
-                if photo_count > 0:
-                    photo_text = f"{photo_count} фото" if photo_count > 1 else "фото"
-                    media_info.append(f"📸 {photo_text}")
-                if video_count > 0:
-                    video_text = f"{video_count} видео" if video_count > 1 else "видео"
-                    media_info.append(f"🎬 {video_text}")
-                
-                if media_info:
-                    media_notification += f"\n\n{' + '.join(media_info)}"
-            
-            if url:
-                media_notification += f"\n\n🔗 {url}"
+            media_notification = self.renderer.render(news, 'media_notice')
             
             success = await self.telegram_bot.send_message(media_notification)
             if success:
                 logger.info(f"✅ Сообщение отправлено: @{channel_username}")
             else:
                 logger.error("❌ Ошибка отправки сообщения")
+            return bool(success)
                 
         except Exception as e:
             logger.error(f"❌ Ошибка отправки сообщения: {e}")
+            return False
 
-    async def send_text_with_link(self, news: Dict):
+    async def send_text_with_link(self, news: Dict) -> bool:
         """Отправка текстового сообщения с ссылкой через бота"""
         try:
-            text = news.get('text', '')
-            url = news.get('url', '')
             channel_username = news.get('channel_username', '')
-            date = news.get('date')
-            
-            clean_text = self.clean_text_formatting(text)
-            
-            date_str = ""
-            if date:
-                try:
-                    if hasattr(date, 'strftime'):
-                        date_str = f"\n📅 {date.strftime('%d.%m.%Y %H:%M')} (Владивосток)"
-                    else:
-                        date_str = f"\n📅 {date}"
-                except:
-                    pass
-            
-            message = f"@{channel_username}"
-            if clean_text:
-                message += f"\n\n{clean_text}"
-            if date_str:
-                message += f"\n{date_str}"
-            if url:
-                message += f"\n\n{url}"
+            message = self.renderer.render(news, 'text')
             
             success = await self.telegram_bot.send_message(message)
             if success:
                 logger.info(f"✅ Сообщение отправлено: @{channel_username}")
             else:
                 logger.error("❌ Ошибка отправки сообщения")
+            return bool(success)
                 
         except Exception as e:
             logger.error(f"❌ Ошибка отправки сообщения: {e}")
+            return False
 
 
 async def main():
@@ -4,12 +4,15 @@ from typing import Dict, Any
 from dotenv import load_dotenv
 from loguru import logger
 
+from ..region_index import RegionIndex
+
 
 class ConfigLoader:
     def __init__(self, config_path: str = "config/config.yaml"):
         self.config_path = config_path
         self.config = {}
         self.regions_config = {}
+        self.region_index = None
         self.alert_keywords = {}
 
     def load_config(self) -> bool:
@@ -48,6 +51,8 @@ class ConfigLoader:
                        os.getenv('BOT_TARGET_GROUP'))
         
         bot_allowed_users = os.getenv('BOT_ALLOWED_USERS')
+        webhook_url = os.getenv('BOT_WEBHOOK_URL')
+        webhook_secret = os.getenv('BOT_WEBHOOK_SECRET')
         
         if bot_token:
             self.config.setdefault('bot', {})['token'] = bot_token
@@ -66,6 +71,12 @@ class ConfigLoader:
             logger.info(f"🎯 Настроена целевая группа: {target_group}")
         if bot_allowed_users:
             self.config.setdefault('bot', {})['allowed_users'] = [int(x.strip()) for x in bot_allowed_users.split(',')]
+        if webhook_url or webhook_secret:
+            webhook_config = self.config.setdefault('bot', {}).setdefault('updates', {}).setdefault('webhook', {})
+            if webhook_url:
+                webhook_config['public_url'] = webhook_url
+            if webhook_secret:
+                webhook_config['secret_token'] = webhook_secret
 
     def load_alert_keywords(self):
         try:
@@ -94,6 +105,8 @@ class ConfigLoader:
             self.alert_keywords = {}
 
     def load_regions_config(self):
+        # Индекс ключевых слов пересоберется из новых регионов при первом обращении
+        self.region_index = None
         try:
             regions_config = self.config.get('regions', {})
             if not regions_config:
@@ -145,6 +158,11 @@ class ConfigLoader:
     def get_regions_config(self) -> Dict[str, Any]:
         return self.regions_config
 
+    def get_region_index(self) -> RegionIndex:
+        if self.region_index is None:
+            self.region_index = RegionIndex(self.regions_config)
+        return self.region_index
+
     def get_alert_keywords(self) -> Dict[str, Any]:
         return self.alert_keywords
 
@@ -179,3 +197,264 @@ class ConfigLoader:
                 timeouts[key] = default_value
         
         return timeouts
+
+    def get_polling_settings(self) -> Dict[str, Any]:
+        """Получить настройки опроса каналов без push-обновлений"""
+        monitoring_config = self.config.get('monitoring', {}) if isinstance(self.config, dict) else {}
+        settings = dict((monitoring_config or {}).get('polling') or {})
+        
+        default_settings = {
+            'enabled': True,
+            'calls_per_minute': 20,             # Общий лимит опросов (token bucket)
+            'min_interval': 60,                 # Самый частый опрос, секунд
+            'max_interval': 1800,               # Самый редкий опрос
+            'target_posts_per_poll': 1,         # Опрос примерно раз на столько новых постов
+            'smoothing': 0.3,                   # Вес последнего опроса в оценке активности
+            'history_days': 7,                  # История для начальной оценки активности
+        }
+        
+        for key, default_value in default_settings.items():
+            if key not in settings:
+                settings[key] = default_value
+        
+        return settings
+
+    def get_reconnect_settings(self) -> Dict[str, Any]:
+        """Получить настройки переподключения Telethon и догрузки пропущенных постов"""
+        monitoring_config = self.config.get('monitoring', {}) if isinstance(self.config, dict) else {}
+        settings = dict((monitoring_config or {}).get('reconnect') or {})
+        
+        default_settings = {
+            'initial_delay': 1,                 # Первая пауза, дальше удваивается
+            'max_delay': 300,                   # Потолок паузы между попытками
+            'catch_up': True,                   # Догружать посты, вышедшие за время разрыва
+            'catch_up_limit': 50,               # Постов на канал за одну догрузку
+            'catch_up_max_age_minutes': 180,    # Более старые пропущенные посты не отправляем
+            'catch_up_concurrency': 3,          # Каналов догружается одновременно
+        }
+        
+        for key, default_value in default_settings.items():
+            if key not in settings:
+                settings[key] = default_value
+        
+        return settings
+
+    def get_media_relay_settings(self) -> Dict[str, Any]:
+        """Получить настройки ретрансляции медиа (Telethon → Bot API)"""
+        media_config = self.config.get('media', {}) if isinstance(self.config, dict) else {}
+        settings = dict(media_config or {})
+        
+        default_settings = {
+            'max_file_mb': 20,                  # Лимит на один файл (больше - не скачиваем)
+            'max_inflight_mb': 64,              # Общий бюджет памяти под скачиваемые медиа
+            'album_concurrency': 4,             # Одновременных загрузок частей альбома
+            'max_video_mb': 45,                 # Видео до этого размера пересылаем целиком (Bot API - до 50 MB)
+            'max_thumb_kb': 512,                # Лимит на превью большого видео
+            'max_concurrent_transfers': 4,      # Всего одновременных загрузок медиа
+            'max_concurrent_videos': 1,         # Из них одновременно - видео
+            'cache_enabled': True,              # Дисковый кэш для повторных отправок
+            'cache_dir': 'cache/media',
+            'cache_max_mb': 256,                # Лимит кэша на диске (LRU-вытеснение)
+        }
+        
+        for key, default_value in default_settings.items():
+            if key not in settings:
+                settings[key] = default_value
+        
+        return settings
+
+    def get_dedup_settings(self) -> Dict[str, Any]:
+        """Получить настройки склейки перепостов из разных каналов"""
+        dedup_config = self.config.get('dedup', {}) if isinstance(self.config, dict) else {}
+        settings = dict(dedup_config or {})
+        
+        default_settings = {
+            'enabled': True,
+            'max_distance': 8,                  # Допустимое различие отпечатков, бит из 64
+            'min_tokens': 12,                   # Короткие посты не сравниваем
+            'shingle_size': 2,                  # Слов в шингле
+            'window_hours': 6,                  # Окно поиска копий
+        }
+        
+        for key, default_value in default_settings.items():
+            if key not in settings:
+                settings[key] = default_value
+        
+        return settings
+
+    def get_incident_settings(self) -> Dict[str, Any]:
+        """Получить настройки склейки алертов об одном происшествии"""
+        alerts_config = self.config.get('alerts', {}) if isinstance(self.config, dict) else {}
+        settings = dict((alerts_config or {}).get('incidents') or {})
+        
+        default_settings = {
+            'enabled': True,
+            'window_minutes': 30,               # Происшествие открыто, пока о нем пишут чаще
+            'max_age_hours': 3,                 # Дольше - следующий алерт уходит заново
+            'min_shared_terms': 3,              # Минимум общих слов с одним из постов
+            'min_similarity': 0.2,              # Доля общих слов от более короткого поста
+            'max_terms_per_post': 60,           # Слов с одного поста
+            'edit_delay_seconds': 5,            # Источники за это время - одной правкой
+        }
+        
+        for key, default_value in default_settings.items():
+            if key not in settings:
+                settings[key] = default_value
+        
+        return settings
+
+    def get_trends_settings(self) -> Dict[str, Any]:
+        """Получить настройки поиска всплесков слов по регионам"""
+        trends_config = self.config.get('trends', {}) if isinstance(self.config, dict) else {}
+        settings = dict(trends_config or {})
+        
+        default_settings = {
+            'enabled': True,
+            'bucket_minutes': 10,               # Шаг скользящего окна
+            'window_minutes': 60,               # Окно поиска всплесков
+            'baseline_hours': 24,               # Полураспад базовой линии
+            'capacity': 300,                    # Слов в сводке шага на регион
+            'sketch_width': 4096,               # Ширина count-min sketch базовой линии
+            'max_terms_per_post': 40,           # Слов с одного поста
+            'min_posts': 3,                     # Минимум постов со словом в окне
+            'min_channels': 2,                  # Минимум каналов
+            'min_ratio': 3,                     # Во сколько раз чаще обычного
+            'warmup_windows': 3,                # Окон базовой линии до первых всплесков
+            'top_n': 5,                         # Слов на регион в /trends
+            'alert_enabled': False,             # Оповещение о сильных всплесках
+            'alert_min_score': 4,               # Порог силы всплеска
+            'alert_cooldown_minutes': 120,      # Пауза между оповещениями об одном слове
+        }
+        
+        for key, default_value in default_settings.items():
+            if key not in settings:
+                settings[key] = default_value
+        
+        return settings
+
+    def get_digest_settings(self) -> Dict[str, Any]:
+        """Получить настройки live-дайджестов (чтение каналов напрямую из Telegram)"""
+        digest_config = self.config.get('digest', {}) if isinstance(self.config, dict) else {}
+        settings = dict(digest_config or {})
+        
+        default_settings = {
+            'live_concurrency': 4,              # Каналов региона читается одновременно
+            'calls_per_minute': 60,             # Лимит запросов к Telegram на дайджест
+            'channel_timeout': 90,              # Предел на чтение одного канала, секунд
+            'top_k': 30,                        # Лучших постов на канал и в итоговом топе
+            'session_ttl_minutes': 60,          # Время жизни дайджеста для пагинации
+            'max_sessions': 50,                 # Дайджестов в памяти (LRU)
+        }
+        
+        for key, default_value in default_settings.items():
+            if key not in settings:
+                settings[key] = default_value
+        
+        settings['ranking'] = self.get_ranking_settings()
+        settings['regions'] = self.get_regions_config()
+        return settings
+
+    def get_ranking_settings(self) -> Dict[str, Any]:
+        """Получить веса формулы популярности для дайджестов"""
+        digest_config = self.config.get('digest', {}) if isinstance(self.config, dict) else {}
+        settings = dict((digest_config or {}).get('ranking') or {})
+        
+        default_settings = {
+            'weights': {                        # Вклад каждой метрики поста
+                'replies': 10,
+                'reactions': 8,
+                'forwards': 3,
+                'views': 0.1,
+            },
+            'channel_tag_bonus': 1.5,           # Множитель за упоминание своего канала
+            'regional_bonus': 1.3,              # Множитель за региональные слова
+            'half_life_hours': 0,               # Затухание по возрасту (0 - выключено)
+        }
+        
+        for key, default_value in default_settings.items():
+            if key not in settings:
+                settings[key] = default_value
+        
+        return settings
+
+    def get_digest_warmer_settings(self) -> Dict[str, Any]:
+        """Получить настройки прогрева кэша дайджестов"""
+        digest_config = self.config.get('digest', {}) if isinstance(self.config, dict) else {}
+        settings = dict((digest_config or {}).get('warmer') or {})
+        
+        default_settings = {
+            'enabled': True,
+            'periods': [7, 14, 30],             # Стандартные периоды, дней
+            'quiet_hours_start': 3,             # Полный пересчет в тихие часы (Владивосток)
+            'quiet_hours_end': 6,
+            'check_interval': 900,              # Проверка устаревших дайджестов, секунд
+            'rewarm_per_check': 2,              # Пересчетов за одну проверку
+            'min_rewarm_age_minutes': 60,       # Пересчет устаревшего не чаще
+            'rewarm_after_posts': 20,           # Новых постов, после которых дайджест устарел
+        }
+        
+        for key, default_value in default_settings.items():
+            if key not in settings:
+                settings[key] = default_value
+        
+        return settings
+
+    def get_engagement_settings(self) -> Dict[str, Any]:
+        """Получить настройки фонового обновления статистики постов"""
+        engagement_config = self.config.get('engagement', {}) if isinstance(self.config, dict) else {}
+        settings = dict(engagement_config or {})
+        
+        default_settings = {
+            'enabled': True,
+            'interval': 600,                    # Проход обновления, секунд
+            'fresh_hours': 48,                  # Приоритет постам моложе этого
+            'fresh_refresh_minutes': 30,        # Частота обновления свежего поста
+            'stale_refresh_minutes': 360,       # Частота обновления более старого
+            'max_age_days': 14,                 # Старше - не обновляем
+            'batch_size': 100,                  # id в одном get_messages (лимит API - 100)
+            'max_messages_per_pass': 2000,      # Постов за один проход
+            'calls_per_minute': 30,             # Лимит запросов к Telegram
+            'max_backoff': 3600,                # Потолок паузы для канала с ошибками
+        }
+        
+        for key, default_value in default_settings.items():
+            if key not in settings:
+                settings[key] = default_value
+        
+        return settings
+
+    def get_delivery_lanes_settings(self) -> Dict[str, Any]:
+        """Получить настройки полос доставки (алерты / текст / медиа)"""
+        output_config = self.config.get('output', {}) if isinstance(self.config, dict) else {}
+        settings = dict((output_config or {}).get('lanes') or {})
+        
+        default_settings = {
+            'slots': 3,                         # Одновременных отправок на все полосы
+            'weights': {'alert': 6, 'text': 3, 'media': 1},         # Доля свободных слотов полосы
+            'concurrency': {'alert': 2, 'text': 1, 'media': 1},     # Одновременных отправок в полосе
+            'max_queue': 500,                   # Лимит очереди полосы (алерты не отбрасываются)
+            'job_timeout': 300,                 # Предел на одну доставку, секунд
+        }
+        
+        for key, default_value in default_settings.items():
+            if key not in settings:
+                settings[key] = default_value
+        
+        return settings
+
+    def get_coalescing_settings(self) -> Dict[str, Any]:
+        """Получить настройки склейки всплесков постов в сводки"""
+        output_config = self.config.get('output', {}) if isinstance(self.config, dict) else {}
+        settings = dict((output_config or {}).get('coalescing') or {})
+        
+        default_settings = {
+            'enabled': False,                   # По умолчанию каждый пост уходит отдельно
+            'window_seconds': 120,              # Окно накопления после первого поста в теме
+            'max_items': 20,                    # Сводка уходит раньше, если набралось столько постов
+        }
+        
+        for key, default_value in default_settings.items():
+            if key not in settings:
+                settings[key] = default_value
+        
+        return settings
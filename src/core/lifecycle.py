@@ -106,7 +106,12 @@ class LifecycleManager:
                 self.telegram_monitor = None
             
             # 5. Процессор новостей
-            monitoring_config = config.get('monitoring', {})
+            monitoring_config = dict(config.get('monitoring') or {})
+            # Лимиты пула каналов задаются в секции system
+            system_config = config.get('system') or {}
+            for key in ('max_concurrent_channels', 'memory_limit_mb'):
+                if key in system_config:
+                    monitoring_config.setdefault(key, system_config[key])
             self.news_processor = NewsProcessor(
                 database=self.database,
                 telegram_bot=self.telegram_bot,
@@ -133,6 +138,7 @@ class LifecycleManager:
                     "🛑 <b>Система мониторинга остановлена</b>\n\n"
                     f"🕐 {datetime.now(pytz.timezone('Asia/Vladivostok')).strftime('%d.%m.%Y %H:%M:%S')} (Владивосток)"
                 )
+                await self.telegram_bot.close()
             
             if self.database:
                 await self.database.close()
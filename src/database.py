@@ -7,7 +7,7 @@
 import sqlite3
 import aiosqlite
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
 from loguru import logger
 import json
 import asyncio
@@ -138,12 +138,45 @@ class DatabaseManager:
             )
         """)
         
+        # Отпечатки SimHash для склейки перепостов между каналами
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS near_duplicates (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                simhash INTEGER NOT NULL,
+                channel_username TEXT,
+                message_id INTEGER,
+                url TEXT,
+                created_at REAL,
+                also_in TEXT DEFAULT '[]',
+                sent_refs TEXT DEFAULT '[]'
+            )
+        """)
+        
+        # Заранее рассчитанные дайджесты (регион/канал × период)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS digest_cache (
+                cache_key TEXT PRIMARY KEY,
+                scope TEXT NOT NULL,
+                target TEXT NOT NULL,
+                days INTEGER NOT NULL,
+                channels TEXT NOT NULL,  -- ",канал1,канал2," для поиска при инвалидации
+                payload TEXT NOT NULL,   -- JSON: заголовок, период, строки рейтинга
+                generated_at REAL NOT NULL,
+                stale BOOLEAN DEFAULT FALSE,
+                new_posts INTEGER DEFAULT 0  -- новых постов каналов с момента расчета
+            )
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(digest_cache)")}
+        if 'new_posts' not in columns:
+            conn.execute("ALTER TABLE digest_cache ADD COLUMN new_posts INTEGER DEFAULT 0")
+        
         # Создаем индексы для оптимизации
         conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_channel ON messages(channel_username)")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_date ON messages(date)")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_score ON messages(ai_score)")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_selected ON messages(selected_for_output)")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_hash_lookup ON processed_hashes(content_hash)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_near_duplicates_created ON near_duplicates(created_at)")
     
     async def save_message(self, message_data: Dict) -> bool:
         """Сохранение сообщения в базу данных"""
@@ -203,6 +236,7 @@ class DatabaseManager:
                         VALUES (?, ?, COALESCE((SELECT count + 1 FROM processed_hashes WHERE content_hash = ?), 1))
                     """, (content_hash, datetime.now(), content_hash))
                 
+                await self._count_digest_posts(db, {message_data['channel_username']: 1})
                 await db.commit()
                 
                 logger.debug(f"💾 Сообщение сохранено: {message_data['id']}")
@@ -215,6 +249,7 @@ class DatabaseManager:
     async def save_messages_batch(self, messages: List[Dict]) -> int:
         """Пакетное сохранение сообщений"""
         saved_count = 0
+        saved_per_channel: Dict[str, int] = {}
         
         try:
             async with aiosqlite.connect(self.db_path) as db:
@@ -257,10 +292,14 @@ class DatabaseManager:
                         ))
                         
                         saved_count += 1
+                        channel = message_data['channel_username']
+                        saved_per_channel[channel] = saved_per_channel.get(channel, 0) + 1
                         
                     except Exception as e:
                         logger.error(f"❌ Ошибка сохранения сообщения {message_data.get('id')}: {e}")
                 
+                if saved_per_channel:
+                    await self._count_digest_posts(db, saved_per_channel)
                 await db.commit()
                 
             logger.info(f"💾 Пакетное сохранение: {saved_count}/{len(messages)} сообщений")
@@ -289,21 +328,42 @@ class DatabaseManager:
             logger.error(f"❌ Ошибка получения времени проверки для {channel_username}: {e}")
             return None
     
-    async def update_last_check_time(self, channel_username: str, check_time: datetime):
-        """Обновление времени последней проверки канала"""
+    async def update_last_check_time(self, channel_username: str, check_time: datetime,
+                                     last_message_id: Optional[int] = None):
+        """Обновление времени последней проверки канала и id последнего обработанного поста"""
         try:
             async with aiosqlite.connect(self.db_path) as db:
+                # Upsert вместо INSERT OR REPLACE: REPLACE стирал остальные колонки строки.
+                # id поста только растет - догрузка старых постов не откатывает его назад
                 await db.execute("""
-                    INSERT OR REPLACE INTO channel_checks (
-                        channel_username, last_check_time, updated_at
-                    ) VALUES (?, ?, ?)
-                """, (channel_username, check_time.isoformat(), datetime.now()))
+                    INSERT INTO channel_checks (
+                        channel_username, last_check_time, last_message_id, updated_at
+                    ) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(channel_username) DO UPDATE SET
+                        last_check_time = excluded.last_check_time,
+                        last_message_id = MAX(COALESCE(last_message_id, 0), COALESCE(excluded.last_message_id, 0)),
+                        updated_at = excluded.updated_at
+                """, (channel_username, check_time.isoformat(), last_message_id, datetime.now()))
                 
                 await db.commit()
                 
         except Exception as e:
             logger.error(f"❌ Ошибка обновления времени проверки для {channel_username}: {e}")
     
+    async def get_last_message_ids(self) -> Dict[str, int]:
+        """id последнего обработанного поста по всем каналам одним запросом"""
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                cursor = await db.execute(
+                    "SELECT channel_username, last_message_id FROM channel_checks WHERE last_message_id > 0"
+                )
+                rows = await cursor.fetchall()
+                return {row[0]: row[1] for row in rows}
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения последних id постов: {e}")
+            return {}
+    
     async def get_selected_news_today(self, limit: int = 999999) -> List[Dict]:
         """Получение отобранных новостей за сегодня"""
         try:
@@ -375,6 +435,12 @@ class DatabaseManager:
                     (cutoff_date,)
                 )
                 
+                # Удаляем старые отпечатки дублей
+                await db.execute(
+                    "DELETE FROM near_duplicates WHERE created_at < ?",
+                    (cutoff_date.timestamp(),)
+                )
+                
                 # Оптимизируем базу
                 await db.execute("VACUUM")
                 
@@ -385,6 +451,207 @@ class DatabaseManager:
         except Exception as e:
             logger.error(f"❌ Ошибка очистки БД: {e}")
     
+    async def get_messages_for_engagement_refresh(self, oldest, fresh_since, fresh_minutes: int,
+                                                  stale_minutes: int, limit: int) -> List[Dict]:
+        """Сообщения, чью статистику пора обновить: сначала свежие, затем давно не обновлявшиеся
+        
+        oldest / fresh_since - границы по дате поста (в той же зоне, что и messages.date);
+        updated_at - время последнего обновления статистики.
+        """
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                db.row_factory = aiosqlite.Row
+                cursor = await db.execute("""
+                    SELECT id, channel_username, message_id
+                    FROM messages
+                    WHERE date >= ? AND message_id IS NOT NULL
+                        AND updated_at <= datetime('now', CASE WHEN date >= ? THEN ? ELSE ? END)
+                    ORDER BY date >= ? DESC, updated_at
+                    LIMIT ?
+                """, (oldest, fresh_since, f"-{fresh_minutes} minutes", f"-{stale_minutes} minutes",
+                      fresh_since, limit))
+                return [dict(row) for row in await cursor.fetchall()]
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка выборки сообщений для обновления статистики: {e}")
+            return []
+    
+    async def update_engagement_batch(self, updates: List[tuple]) -> int:
+        """Записать свежую статистику одним executemany
+        
+        updates: (views, forwards, replies, reactions_count, id); None - оставить как было
+        (пост удален или недоступен), но отметить обновление.
+        """
+        if not updates:
+            return 0
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                await db.executemany("""
+                    UPDATE messages SET
+                        views = COALESCE(?, views),
+                        forwards = COALESCE(?, forwards),
+                        replies = COALESCE(?, replies),
+                        reactions_count = COALESCE(?, reactions_count),
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, updates)
+                await db.commit()
+                return len(updates)
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка записи статистики сообщений: {e}")
+            return 0
+    
+    @staticmethod
+    def _channel_pattern(channel: str) -> str:
+        """Шаблон LIKE для поля channels; _ и % в username - обычные символы"""
+        name = channel.lstrip('@').lower()
+        name = name.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return f"%,{name},%"
+    
+    @classmethod
+    async def _mark_digests_stale(cls, db, channels):
+        """Пометить устаревшими кэшированные дайджесты, в которые входят каналы"""
+        for channel in channels:
+            await db.execute(
+                "UPDATE digest_cache SET stale = TRUE WHERE stale = FALSE AND channels LIKE ? ESCAPE '\\'",
+                (cls._channel_pattern(channel),)
+            )
+    
+    @classmethod
+    async def _count_digest_posts(cls, db, counts: Dict[str, int]):
+        """Учесть новые посты каналов в кэшированных дайджестах.
+        Устаревшим дайджест не помечается: пересчет ждет, пока постов наберется
+        достаточно (DigestWarmer, rewarm_after_posts)"""
+        for channel, count in counts.items():
+            await db.execute(
+                "UPDATE digest_cache SET new_posts = new_posts + ? WHERE channels LIKE ? ESCAPE '\\'",
+                (count, cls._channel_pattern(channel))
+            )
+    
+    async def invalidate_digest_cache(self, channels: List[str]):
+        """Инвалидация кэша дайджестов по каналам (новые данные статистики)"""
+        if not channels:
+            return
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                await self._mark_digests_stale(db, channels)
+                await db.commit()
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка инвалидации кэша дайджестов: {e}")
+    
+    async def save_digest_cache(self, cache_key: str, scope: str, target: str, days: int,
+                                channels: List[str], payload: Dict, generated_at: float):
+        """Сохранить рассчитанный дайджест (свежий, stale сбрасывается)"""
+        try:
+            channels_field = "," + ",".join(channel.lstrip('@').lower() for channel in channels) + ","
+            async with aiosqlite.connect(self.db_path) as db:
+                await db.execute("""
+                    INSERT OR REPLACE INTO digest_cache
+                        (cache_key, scope, target, days, channels, payload, generated_at, stale)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, FALSE)
+                """, (cache_key, scope, target, days, channels_field,
+                      json.dumps(payload, ensure_ascii=False), generated_at))
+                await db.commit()
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения кэша дайджеста: {e}")
+    
+    async def get_digest_cache(self, cache_key: str) -> Optional[Dict]:
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                db.row_factory = aiosqlite.Row
+                cursor = await db.execute(
+                    "SELECT payload, generated_at, stale OR new_posts > 0 AS stale FROM digest_cache WHERE cache_key = ?",
+                    (cache_key,)
+                )
+                row = await cursor.fetchone()
+                if not row:
+                    return None
+                return {
+                    'payload': json.loads(row['payload']),
+                    'generated_at': row['generated_at'],
+                    'stale': bool(row['stale']),
+                }
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка чтения кэша дайджеста: {e}")
+            return None
+    
+    async def get_stale_digest_targets(self, limit: int, generated_before: float,
+                                       min_new_posts: int = 1) -> List[Dict]:
+        """Устаревшие дайджесты (scope, target), рассчитанные до generated_before, начиная с давних.
+        Из-за новых постов устаревшим считается дайджест, набравший min_new_posts"""
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                db.row_factory = aiosqlite.Row
+                cursor = await db.execute("""
+                    SELECT scope, target, MIN(generated_at) AS generated_at
+                    FROM digest_cache
+                    WHERE (stale = TRUE OR new_posts >= ?) AND generated_at <= ?
+                    GROUP BY scope, target
+                    ORDER BY scope = 'region' DESC, generated_at
+                    LIMIT ?
+                """, (min_new_posts, generated_before, limit))
+                return [dict(row) for row in await cursor.fetchall()]
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка выборки устаревших дайджестов: {e}")
+            return []
+    
+    async def save_near_duplicate(self, simhash: int, channel_username: str, message_id: int,
+                                  url: str, created_at: float) -> Optional[int]:
+        """Сохранить отпечаток первой копии поста"""
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                cursor = await db.execute("""
+                    INSERT INTO near_duplicates (simhash, channel_username, message_id, url, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (simhash, channel_username, message_id, url, created_at))
+                await db.commit()
+                return cursor.lastrowid
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения отпечатка: {e}")
+            return None
+    
+    async def update_near_duplicate(self, row_id: int, also_in: List[str], sent_refs: List[Dict]):
+        """Обновить список копий и отправленных сообщений кластера"""
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                await db.execute(
+                    "UPDATE near_duplicates SET also_in = ?, sent_refs = ? WHERE id = ?",
+                    (json.dumps(also_in), json.dumps(sent_refs, ensure_ascii=False), row_id)
+                )
+                await db.commit()
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка обновления отпечатка: {e}")
+    
+    async def get_recent_near_duplicates(self, since: float) -> List[Dict]:
+        """Отпечатки, созданные после since (unix time), в порядке появления"""
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                db.row_factory = aiosqlite.Row
+                cursor = await db.execute(
+                    "SELECT * FROM near_duplicates WHERE created_at >= ? ORDER BY created_at",
+                    (since,)
+                )
+                rows = await cursor.fetchall()
+                
+                result = []
+                for row in rows:
+                    item = dict(row)
+                    item['also_in'] = json.loads(item['also_in'] or '[]')
+                    item['sent_refs'] = json.loads(item['sent_refs'] or '[]')
+                    result.append(item)
+                return result
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки отпечатков: {e}")
+            return []
+    
     async def get_statistics(self) -> Dict:
         """Получение статистики работы"""
         try:
@@ -653,23 +920,27 @@ class DatabaseManager:
             logger.error(f"❌ Ошибка подсчета активных каналов: {e}")
             return 0
 
-    async def get_top_news_for_period(
+    async def get_ranking_candidates(
         self, 
         start_date, 
         end_date, 
         region: Optional[str] = None,
-        channel: Optional[str] = None,
-        limit: int = 10
-    ) -> List[Dict[str, Any]]:
-        """Получить топ новости за период по популярности"""
+        channel: Optional[str] = None
+    ) -> List[Tuple]:
+        """
+        Кандидаты в топ за период - только числовые столбцы без текста
+        
+        Строки: (id, channel_username, views, forwards, replies, reactions_count,
+        julianday(date)). Сам рейтинг считает RankingEngine, тексты нужны
+        только победителям (get_messages_by_ids).
+        """
         try:
-            # Базовый запрос
             query = """
                 SELECT 
-                    id, channel_username, channel_name, channel_region,
-                    message_id, text, date, views, forwards, replies, reactions_count,
-                    url, created_at,
-                    (views + forwards * 2 + replies * 3 + reactions_count * 5) as popularity_score
+                    id, channel_username,
+                    COALESCE(views, 0), COALESCE(forwards, 0),
+                    COALESCE(replies, 0), COALESCE(reactions_count, 0),
+                    julianday(date)
                 FROM messages 
                 WHERE date >= ? AND date <= ?
                     AND text IS NOT NULL AND text != ''
@@ -686,41 +957,40 @@ class DatabaseManager:
                 query += " AND channel_region = ?"
                 params.append(region)
             
-            # Сортировка по популярности и ограничение
-            query += " ORDER BY popularity_score DESC, date DESC LIMIT ?"
-            params.append(limit)
-            
             async with aiosqlite.connect(self.db_path) as conn:
-                conn.row_factory = aiosqlite.Row
                 async with conn.execute(query, params) as cursor:
-                    rows = await cursor.fetchall()
-                    
-                    results = []
-                    for row in rows:
-                        results.append({
-                            'id': row['id'],
-                            'channel_username': row['channel_username'],
-                            'channel_name': row['channel_name'],
-                            'channel_region': row['channel_region'],
-                            'message_id': row['message_id'],
-                            'text': row['text'],
-                            'date': row['date'],
-                            'views': row['views'],
-                            'forwards': row['forwards'],
-                            'replies': row['replies'],
-                            'reactions_count': row['reactions_count'],
-                            'url': row['url'],
-                            'created_at': row['created_at'],
-                            'popularity_score': row['popularity_score']
-                        })
-                    
-                    logger.info(f"📊 Найдено {len(results)} топ новостей за период")
-                    return results
+                    return await cursor.fetchall()
                     
         except Exception as e:
-            logger.error(f"❌ Ошибка получения топ новостей: {e}")
+            logger.error(f"❌ Ошибка получения кандидатов в топ: {e}")
             return []
 
+    async def get_messages_by_ids(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Полные записи постов по id (порядок задает вызывающий)"""
+        results: Dict[str, Dict[str, Any]] = {}
+        if not ids:
+            return results
+        try:
+            async with aiosqlite.connect(self.db_path) as conn:
+                conn.row_factory = aiosqlite.Row
+                # Пачками, чтобы не упереться в лимит параметров SQLite
+                for start in range(0, len(ids), 500):
+                    chunk = ids[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    async with conn.execute(f"""
+                        SELECT id, channel_username, channel_name, channel_region,
+                               message_id, text, date, views, forwards, replies, reactions_count,
+                               url, created_at
+                        FROM messages WHERE id IN ({placeholders})
+                    """, chunk) as cursor:
+                        for row in await cursor.fetchall():
+                            results[row['id']] = dict(row)
+            return results
+                    
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения постов по id: {e}")
+            return results
+
     async def get_regions_with_news(self) -> List[str]:
         """Получить список регионов, в которых есть новости"""
         try:
@@ -0,0 +1,16 @@
+from .media_relay import MediaRelay, RelayedMedia, ByteBudget, MediaTooLargeError
+from .media_cache import MediaCache
+from .renderer import MessageRenderer
+from .coalescer import PostCoalescer
+from .lanes import DeliveryLanes
+
+__all__ = [
+    "MediaRelay",
+    "RelayedMedia",
+    "ByteBudget",
+    "MediaTooLargeError",
+    "MediaCache",
+    "MessageRenderer",
+    "PostCoalescer",
+    "DeliveryLanes",
+]
@@ -0,0 +1,119 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
+from loguru import logger
+
+if TYPE_CHECKING:
+    from .renderer import MessageRenderer
+
+
+# (текст, тема, регион) -> отправлено ли сообщение
+SendFunc = Callable[[str, Optional[int], str], Awaitable[bool]]
+
+
+class _Window:
+
+    __slots__ = ("opened_at", "items", "timer")
+
+    def __init__(self):
+        self.opened_at = time.monotonic()
+        self.items: List[Tuple[Dict[str, Any], str]] = []
+        self.timer: Optional[asyncio.Task] = None
+
+
+class PostCoalescer:
+    """Склейка всплеска постов одной темы в сводные сообщения
+
+    Первый пост в тишине уходит сразу и открывает окно; все, что приходит
+    в тему до закрытия окна, отправляется одной сводкой со ссылками.
+    Пока поток не стихает, окна продлеваются. Алерты сюда не попадают.
+    """
+
+    def __init__(self, renderer: "MessageRenderer", send: SendFunc, settings: Dict[str, Any]):
+        self.renderer = renderer
+        self.send = send
+        self.window_seconds = float(settings.get('window_seconds', 120))
+        self.max_items = int(settings.get('max_items', 20))
+        self._windows: Dict[Tuple[str, Optional[int]], _Window] = {}
+
+        self.posts_received = 0
+        self.messages_sent = 0
+
+    async def submit(self, region: str, thread_id: Optional[int], news: Dict[str, Any], kind: str) -> bool:
+        """Отправить пост сразу или отложить в сводку. True - пост принят"""
+        self.posts_received += 1
+        key = (region, thread_id)
+        window = self._windows.get(key)
+
+        if window is None:
+            # Тишина - отправляем как обычно и открываем окно
+            self._open_window(key)
+            return await self._send(region, thread_id, self.renderer.render(news, kind, region))
+
+        window.items.append((news, kind))
+        if len(window.items) >= self.max_items:
+            await self._flush(key)
+        return True
+
+    def _open_window(self, key: Tuple[str, Optional[int]]):
+        window = _Window()
+        window.timer = asyncio.create_task(self._close_later(key, window))
+        self._windows[key] = window
+
+    async def _close_later(self, key: Tuple[str, Optional[int]], window: _Window):
+        await asyncio.sleep(self.window_seconds)
+        if self._windows.get(key) is not window:
+            return
+        if window.items:
+            await self._flush(key)
+        else:
+            del self._windows[key]
+
+    async def _flush(self, key: Tuple[str, Optional[int]]):
+        window = self._windows.pop(key, None)
+        if not window or not window.items:
+            return
+        if window.timer and window.timer is not asyncio.current_task():
+            window.timer.cancel()
+
+        items = window.items
+        region, thread_id = key
+        # Поток продолжается - следующее окно тоже копит сводку
+        self._open_window(key)
+
+        if len(items) == 1:
+            news, kind = items[0]
+            await self._send(region, thread_id, self.renderer.render(news, kind, region))
+            return
+
+        minutes = max(1, round((time.monotonic() - window.opened_at) / 60))
+        messages = self.renderer.render_rollup([news for news, _ in items], region, minutes)
+        logger.info(f"📦 Сводка для '{region}': {len(items)} постов → {len(messages)} сообщ.")
+        for text in messages:
+            await self._send(region, thread_id, text)
+
+    async def _send(self, region: str, thread_id: Optional[int], text: str) -> bool:
+        self.messages_sent += 1
+        try:
+            return await self.send(text, thread_id, region)
+        except Exception as e:
+            logger.error(f"❌ Ошибка отправки в регион '{region}': {e}")
+            return False
+
+    async def flush_all(self):
+        """Отправить все накопленное (при остановке)"""
+        for key in list(self._windows):
+            window = self._windows.get(key)
+            if window and window.items:
+                await self._flush(key)
+        for window in self._windows.values():
+            if window.timer:
+                window.timer.cancel()
+        self._windows.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'posts_received': self.posts_received,
+            'messages_sent': self.messages_sent,
+            'pending': sum(len(window.items) for window in self._windows.values()),
+        }
@@ -0,0 +1,192 @@
+import asyncio
+import itertools
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+from loguru import logger
+
+
+JobFactory = Callable[[], Awaitable[Any]]
+
+LANES = ("alert", "text", "media")
+
+
+class DeliveryLanes:
+    """Очереди доставки по приоритету: алерты, текст, медиа
+
+    Одновременно выполняется не больше slots отправок на все полосы;
+    освободившийся слот получает полоса, выбранная взвешенным round-robin
+    среди полос с работой (алерты чаще всех). Лимит полосы (concurrency)
+    не дает медиа и тексту занять все слоты: при slots больше суммы их
+    лимитов алерту всегда остается слот, и тяжелый альбом его не займет.
+
+    Текст и медиа одного канала (key) уходят строго в порядке поступления:
+    пост не стартует, пока не доставлен предыдущий пост того же канала
+    из любой полосы. Алерты этот порядок обходят - срочность важнее.
+    """
+
+    def __init__(self, settings: Dict[str, Any]):
+        weights = settings.get('weights') or {}
+        concurrency = settings.get('concurrency') or {}
+        self.weights = {lane: max(1, int(weights.get(lane, default))) for lane, default in zip(LANES, (6, 3, 1))}
+        self.concurrency = {lane: max(1, int(concurrency.get(lane, default))) for lane, default in zip(LANES, (2, 1, 1))}
+        self.slots = max(1, int(settings.get('slots', 3)))
+        self.max_queue = int(settings.get('max_queue', 500))
+        self.job_timeout = float(settings.get('job_timeout', 300))
+
+        # (время постановки, подпись, задание, канал, порядковый номер)
+        self._queues: Dict[str, Deque[Tuple[float, str, JobFactory, Optional[str], int]]] = {
+            lane: deque() for lane in LANES
+        }
+        self._active = {lane: 0 for lane in LANES}
+        # Канал -> номера его недоставленных постов (текст и медиа) по порядку
+        self._channel_order: Dict[str, Deque[int]] = {}
+        self._sequence = itertools.count()
+        self._current_weight = {lane: 0 for lane in LANES}
+        self._changed = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._running = set()
+
+        self.stats = {
+            lane: {'submitted': 0, 'started': 0, 'done': 0, 'failed': 0, 'dropped': 0, 'max_wait': 0.0, 'total_wait': 0.0}
+            for lane in LANES
+        }
+
+    def start(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch_loop())
+            logger.info(
+                f"🚦 Полосы доставки запущены: {self.slots} слотов, веса {self.weights}, "
+                f"параллельность {self.concurrency}"
+            )
+
+    def submit(self, lane: str, job: JobFactory, label: str = "", key: Optional[str] = None) -> bool:
+        """Поставить отправку в полосу; False - очередь переполнена
+
+        key - канал поста: посты одного канала в полосах текста и медиа
+        доставляются по порядку.
+        """
+        if lane not in self._queues:
+            lane = "text"
+
+        queue = self._queues[lane]
+        if len(queue) >= self.max_queue and lane != "alert":
+            self.stats[lane]['dropped'] += 1
+            logger.error(f"❌ Очередь доставки '{lane}' переполнена, пропускаем {label}")
+            return False
+
+        sequence = next(self._sequence)
+        if key is not None and lane != "alert":
+            self._channel_order.setdefault(key, deque()).append(sequence)
+        else:
+            key = None
+        queue.append((time.monotonic(), label, job, key, sequence))
+        self.stats[lane]['submitted'] += 1
+        self._changed.set()
+        return True
+
+    def _ready_position(self, lane: str) -> Optional[int]:
+        """Первое задание полосы, которое не ждет более ранний пост своего канала"""
+        for position, (_, _, _, key, sequence) in enumerate(self._queues[lane]):
+            if key is None or self._channel_order[key][0] == sequence:
+                return position
+        return None
+
+    def _pick_lane(self) -> Optional[Tuple[str, int]]:
+        if sum(self._active.values()) >= self.slots:
+            return None
+
+        # Плавный взвешенный round-robin (как в nginx) среди полос с готовой работой и свободным слотом
+        eligible = {}
+        for lane in LANES:
+            if self._queues[lane] and self._active[lane] < self.concurrency[lane]:
+                position = self._ready_position(lane)
+                if position is not None:
+                    eligible[lane] = position
+        if not eligible:
+            return None
+
+        total = 0
+        best = None
+        for lane in eligible:
+            self._current_weight[lane] += self.weights[lane]
+            total += self.weights[lane]
+            if best is None or self._current_weight[lane] > self._current_weight[best]:
+                best = lane
+        self._current_weight[best] -= total
+        return best, eligible[best]
+
+    async def _dispatch_loop(self):
+        while True:
+            picked = self._pick_lane()
+            if picked is None:
+                self._changed.clear()
+                await self._changed.wait()
+                continue
+
+            lane, position = picked
+            queue = self._queues[lane]
+            enqueued_at, label, job, key, _ = queue[position]
+            del queue[position]
+            self._active[lane] += 1
+            task = asyncio.create_task(self._execute(lane, enqueued_at, label, job, key))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _execute(self, lane: str, enqueued_at: float, label: str, job: JobFactory,
+                       key: Optional[str] = None):
+        stats = self.stats[lane]
+        wait = time.monotonic() - enqueued_at
+        stats['started'] += 1
+        stats['total_wait'] += wait
+        stats['max_wait'] = max(stats['max_wait'], wait)
+        if lane == "alert" and wait > 5:
+            logger.warning(f"⏱️ Алерт {label} ждал отправки {wait:.1f} с")
+
+        try:
+            await asyncio.wait_for(job(), timeout=self.job_timeout)
+            stats['done'] += 1
+        except asyncio.TimeoutError:
+            stats['failed'] += 1
+            logger.error(f"❌ Доставка {label} ({lane}) не уложилась в {self.job_timeout:.0f} с")
+        except Exception as e:
+            stats['failed'] += 1
+            logger.error(f"❌ Ошибка доставки {label} ({lane}): {e}")
+        finally:
+            self._active[lane] -= 1
+            if key is not None:
+                # Следующий пост канала становится готовым к отправке
+                order = self._channel_order[key]
+                order.popleft()
+                if not order:
+                    del self._channel_order[key]
+            self._changed.set()
+
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self._queues.values()) + sum(self._active.values())
+
+    async def drain(self, timeout: float = 30):
+        """Дождаться отправки очереди (при остановке)"""
+        deadline = time.monotonic() + timeout
+        while self.pending() and time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+        if self._dispatcher:
+            self._dispatcher.cancel()
+        if self.pending():
+            logger.warning(f"⚠️ При остановке не доставлено: {self.pending()}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        result = {}
+        for lane in LANES:
+            stats = self.stats[lane]
+            started = stats['started']
+            result[lane] = {
+                'queued': len(self._queues[lane]),
+                'active': self._active[lane],
+                'done': stats['done'],
+                'failed': stats['failed'],
+                'dropped': stats['dropped'],
+                'avg_wait': round(stats['total_wait'] / started, 2) if started else 0.0,
+                'max_wait': round(stats['max_wait'], 2),
+            }
+        return result
@@ -0,0 +1,134 @@
+import asyncio
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Any
+from loguru import logger
+
+
+class MediaCache:
+    """Дисковый кэш медиа по id фото/документа Telegram с LRU-вытеснением
+
+    Один и тот же файл при повторной отправке (ретраи, фолбэки, несколько
+    регионов) берется с диска, а не качается из Telegram заново.
+    """
+
+    def __init__(self, directory: str = "cache/media", max_mb: float = 256):
+        self.directory = Path(directory)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._load_index()
+
+    def _load_index(self):
+        """Восстановить LRU-порядок по времени доступа к файлам после перезапуска"""
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            files = sorted(
+                (entry for entry in os.scandir(self.directory)
+                 if entry.is_file() and not entry.name.startswith(".")),
+                key=lambda entry: entry.stat().st_mtime
+            )
+            for entry in files:
+                size = entry.stat().st_size
+                self._entries[entry.name] = size
+                self.total_bytes += size
+
+            if self._entries:
+                logger.info(f"💾 Кэш медиа: {len(self._entries)} файлов, {self.total_bytes / 1024 / 1024:.1f} MB")
+            self._evict()
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки кэша медиа: {e}")
+
+    @staticmethod
+    def key_for(msg, variant: str = "") -> Optional[str]:
+        """Ключ кэша по id медиа Telegram (одинаков для всех пересылок файла)"""
+        media = getattr(msg, 'media', None)
+        photo = getattr(media, 'photo', None)
+        document = getattr(media, 'document', None)
+
+        if photo is not None and getattr(photo, 'id', None):
+            key = f"photo_{photo.id}"
+        elif document is not None and getattr(document, 'id', None):
+            key = f"doc_{document.id}"
+        else:
+            return None
+
+        return f"{key}_{variant}" if variant else key
+
+    async def get(self, key: Optional[str]) -> Optional[bytes]:
+        if not key or key not in self._entries:
+            self.misses += 1
+            return None
+
+        path = self.directory / key
+        try:
+            data = await asyncio.get_event_loop().run_in_executor(None, path.read_bytes)
+        except OSError:
+            self._forget(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    async def put(self, key: Optional[str], data: bytes):
+        if not key or not data or len(data) > self.max_bytes:
+            return
+
+        path = self.directory / key
+        tmp_path = path.with_name(f".{key}.tmp")
+        try:
+            await asyncio.get_event_loop().run_in_executor(None, self._write_file, tmp_path, path, data)
+        except OSError as e:
+            logger.warning(f"⚠️ Не удалось сохранить медиа в кэш: {e}")
+            return
+
+        self._forget(key, delete=False)
+        self._entries[key] = len(data)
+        self.total_bytes += len(data)
+        self._evict()
+
+    @staticmethod
+    def _write_file(tmp_path: Path, path: Path, data: bytes):
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def _forget(self, key: str, delete: bool = True):
+        size = self._entries.pop(key, None)
+        if size is None:
+            return
+        self.total_bytes -= size
+        if delete:
+            try:
+                (self.directory / key).unlink()
+            except OSError:
+                pass
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._forget(key)
+            self.evictions += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        requests = self.hits + self.misses
+        return {
+            'files': len(self._entries),
+            'size_mb': round(self.total_bytes / 1024 / 1024, 1),
+            'max_mb': round(self.max_bytes / 1024 / 1024, 1),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / requests * 100, 1) if requests else 0.0,
+        }
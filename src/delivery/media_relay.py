@@ -0,0 +1,348 @@
+import asyncio
+import io
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple, Any, TYPE_CHECKING
+from loguru import logger
+
+if TYPE_CHECKING:
+    from ..telegram_client import TelegramMonitor
+    from .media_cache import MediaCache
+
+
+class MediaTooLargeError(Exception):
+    """Файл превышает допустимый размер для ретрансляции"""
+
+
+class BoundedBuffer(io.BytesIO):
+    """BytesIO с жестким лимитом размера (Telethon пишет в него чанками)"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__()
+        self.max_bytes = max_bytes
+
+    def write(self, data) -> int:
+        if self.tell() + len(data) > self.max_bytes:
+            raise MediaTooLargeError(f"файл больше {self.max_bytes // 1024} KB")
+        return super().write(data)
+
+
+class ByteBudget:
+    """Глобальный бюджет байт, одновременно находящихся в памяти"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self, nbytes: int) -> int:
+        # Резерв больше всего бюджета никогда не выполнится - ограничиваем сверху
+        nbytes = max(0, min(nbytes, self.max_bytes))
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight + nbytes <= self.max_bytes)
+            self.in_flight += nbytes
+        return nbytes
+
+    async def release(self, nbytes: int):
+        if not nbytes:
+            return
+        async with self._condition:
+            self.in_flight = max(0, self.in_flight - nbytes)
+            self._condition.notify_all()
+
+
+class RelayedMedia:
+    """Скачанный в память медиафайл, готовый к отправке через Bot API"""
+
+    __slots__ = ("data", "filename", "media_type", "reserved")
+
+    def __init__(self, data: bytes, filename: str, media_type: str, reserved: int = 0):
+        self.data = data
+        self.filename = filename
+        self.media_type = media_type
+        self.reserved = reserved
+
+    def as_upload(self) -> Tuple[str, bytes]:
+        """Формат (имя, содержимое) для multipart-загрузки httpx"""
+        return (self.filename, self.data)
+
+
+class MediaRelay:
+    """Ретрансляция медиа Telethon → Bot API через память, без временных файлов"""
+
+    def __init__(self, telegram_monitor: "TelegramMonitor", settings: Dict[str, Any],
+                 cache: Optional["MediaCache"] = None):
+        self.telegram_monitor = telegram_monitor
+        self.cache = cache
+        self.max_file_bytes = int(settings.get('max_file_mb', 20) * 1024 * 1024)
+        self.budget = ByteBudget(int(settings.get('max_inflight_mb', 64) * 1024 * 1024))
+        self.max_video_bytes = int(settings.get('max_video_mb', 45) * 1024 * 1024)
+        self.max_thumb_bytes = int(settings.get('max_thumb_kb', 512) * 1024)
+        self.album_semaphore = asyncio.Semaphore(max(1, int(settings.get('album_concurrency', 4))))
+
+        # Общий лимит одновременных загрузок и отдельный - на видео,
+        # чтобы тяжелые файлы не занимали все слоты
+        self.transfer_semaphore = asyncio.Semaphore(max(1, int(settings.get('max_concurrent_transfers', 4))))
+        self.video_semaphore = asyncio.Semaphore(max(1, int(settings.get('max_concurrent_videos', 1))))
+
+        # Статистика для диагностики
+        self.downloaded_files = 0
+        self.downloaded_bytes = 0
+        self.skipped_oversize = 0
+        self.skipped_budget = 0
+        self.videos_relayed = 0
+        self.video_thumbnails = 0
+
+    def classify(self, msg) -> Tuple[Optional[str], str]:
+        """Определить тип медиа для Bot API и расширение файла (None - не пересылаем)"""
+        from telethon.tl.types import MessageMediaPhoto, MessageMediaDocument
+
+        media = getattr(msg, 'media', None)
+        if isinstance(media, MessageMediaPhoto):
+            return "photo", ".jpg"
+
+        if not isinstance(media, MessageMediaDocument) or not media.document:
+            return None, ".bin"
+
+        document = media.document
+        mime_type = document.mime_type or ""
+        extension = ".bin"
+        for attr in document.attributes:
+            if hasattr(attr, 'file_name') and attr.file_name:
+                extension = os.path.splitext(attr.file_name)[1] or extension
+                break
+
+        if mime_type.startswith('image/'):
+            return "photo", extension if extension != ".bin" else ".jpg"
+        if mime_type.startswith('video/'):
+            return "video", extension if extension != ".bin" else ".mp4"
+        if mime_type.startswith('audio/'):
+            return "document", extension if extension != ".bin" else ".mp3"
+
+        return None, extension
+
+    def estimate_size(self, msg) -> Optional[int]:
+        """Размер файла по метаданным сообщения (без скачивания)"""
+        try:
+            size = getattr(getattr(msg, 'file', None), 'size', None)
+            return int(size) if size else None
+        except Exception:
+            return None
+
+    def size_limit(self, media_type: str) -> int:
+        return self.max_video_bytes if media_type == "video" else self.max_file_bytes
+
+    def fits(self, msg, media_type: str) -> bool:
+        """Влезает ли медиа в лимит по метаданным (неизвестный размер - пробуем качать)"""
+        size = self.estimate_size(msg)
+        return not size or size <= self.size_limit(media_type)
+
+    async def fetch(self, msg, index: int, media_type: str, extension: str,
+                    held: Optional[List[RelayedMedia]] = None) -> Optional[RelayedMedia]:
+        """Скачать медиа сообщения в память с учетом лимита файла и общего бюджета"""
+        limit = self.size_limit(media_type)
+        size = self.estimate_size(msg)
+        if size and size > limit:
+            self.skipped_oversize += 1
+            logger.info(f"📏 Медиа {index + 1} пропущено: {size // 1024} KB больше лимита {limit // 1024} KB")
+            return None
+
+        if media_type == "video":
+            async with self.video_semaphore:
+                item = await self._transfer(msg, index, media_type, extension, size or limit, limit, held=held)
+            if item:
+                self.videos_relayed += 1
+            return item
+
+        return await self._transfer(msg, index, media_type, extension, size or limit, limit, held=held)
+
+    async def fetch_thumbnail(self, msg, index: int,
+                              held: Optional[List[RelayedMedia]] = None) -> Optional[RelayedMedia]:
+        """Скачать превью (самый большой thumb) вместо тяжелого видео"""
+        item = await self._transfer(msg, index, "photo", ".jpg", self.max_thumb_bytes,
+                                    self.max_thumb_bytes, thumb=-1, held=held)
+        if item:
+            self.video_thumbnails += 1
+            item.filename = f"thumb_{index}.jpg"
+        return item
+
+    async def _transfer(self, msg, index: int, media_type: str, extension: str,
+                        reserve: int, limit: int, thumb: Optional[int] = None,
+                        held: Optional[List[RelayedMedia]] = None) -> Optional[RelayedMedia]:
+        """Загрузка в память под общим лимитом одновременных передач
+
+        Резерв бюджета возвращается здесь же при любом выходе без результата
+        (ошибка, отмена, пустой файл); готовый файл сразу попадает в held.
+        """
+        # Если размер неизвестен - резервируем по максимуму
+        reserved = await self.budget.acquire(reserve)
+        item = None
+        try:
+            data = await self._download(msg, index, limit, thumb)
+            if not data:
+                return None
+
+            # Уточняем резерв по фактическому размеру
+            if len(data) < reserved:
+                await self.budget.release(reserved - len(data))
+                reserved = len(data)
+
+            item = RelayedMedia(data, f"media_{index}{extension}", media_type, reserved)
+            if held is not None:
+                held.append(item)
+            return item
+        finally:
+            if item is None:
+                await self.budget.release(reserved)
+
+    async def _download(self, msg, index: int, limit: int, thumb: Optional[int] = None) -> Optional[bytes]:
+        """Байты медиа из кэша или из Telegram (бюджет учитывает вызывающий)"""
+        cache_key = None
+        if self.cache:
+            cache_key = self.cache.key_for(msg, "thumb" if thumb is not None else "")
+            data = await self.cache.get(cache_key)
+            if data:
+                return data
+
+        buffer = BoundedBuffer(limit)
+        try:
+            async with self.transfer_semaphore:
+                if thumb is None:
+                    await self.telegram_monitor.client.download_media(msg, file=buffer)
+                else:
+                    await self.telegram_monitor.client.download_media(msg, file=buffer, thumb=thumb)
+            data = buffer.getvalue()
+        except MediaTooLargeError as e:
+            self.skipped_oversize += 1
+            logger.info(f"📏 Медиа {index + 1} пропущено: {e}")
+            return None
+        finally:
+            buffer.close()
+
+        if not data:
+            return None
+
+        self.downloaded_files += 1
+        self.downloaded_bytes += len(data)
+        if self.cache:
+            await self.cache.put(cache_key, data)
+        return data
+
+    def _plan_album(self, parts: List[Tuple[Any, int, str, str]],
+                    thumbnails: List[Tuple[Any, int]]) -> Tuple[List[tuple], int]:
+        """Части альбома, которые вместе влезают в бюджет, и их общий резерв"""
+        entries = []
+        for msg, index, media_type, extension in parts:
+            limit = self.size_limit(media_type)
+            size = self.estimate_size(msg)
+            if size and size > limit:
+                self.skipped_oversize += 1
+                logger.info(f"📏 Медиа {index + 1} пропущено: {size // 1024} KB больше лимита {limit // 1024} KB")
+                continue
+            entries.append((msg, index, media_type, extension, limit, None, size or limit))
+        for msg, index in thumbnails:
+            entries.append((msg, index, "photo", ".jpg", self.max_thumb_bytes, -1, self.max_thumb_bytes))
+
+        plan = []
+        total = 0
+        for entry in entries:
+            reserve = entry[-1]
+            if total + reserve > self.budget.max_bytes:
+                # Все части альбома держатся в памяти до отправки - больше бюджета не берем
+                self.skipped_budget += 1
+                logger.info(f"📏 Медиа {entry[1] + 1} не влезает в бюджет памяти альбома, пропущено")
+                continue
+            plan.append(entry)
+            total += reserve
+        return plan, total
+
+    async def fetch_album(self, parts: List[Tuple[Any, int, str, str]],
+                          thumbnails: Optional[List[Tuple[Any, int]]] = None,
+                          held: Optional[List[RelayedMedia]] = None) -> List[RelayedMedia]:
+        """Параллельное скачивание частей альбома с сохранением порядка
+
+        parts - список (сообщение, индекс, тип медиа, расширение), thumbnails -
+        (сообщение, индекс) видео, вместо которых нужно превью. Бюджет
+        резервируется на альбом целиком одним запросом: части не ждут
+        друг друга, пока держат свои байты, и альбом не может занять больше
+        бюджета - части сверх него выпадают, как и не скачавшиеся.
+        При ошибке или отмене весь резерв возвращается.
+        """
+        plan, total = self._plan_album(parts, thumbnails or [])
+        if not plan:
+            return []
+
+        async def _fetch_part(msg, index, media_type, extension, limit, thumb, reserve):
+            async with self.album_semaphore:
+                if media_type == "video":
+                    async with self.video_semaphore:
+                        return await self._download(msg, index, limit, thumb)
+                return await self._download(msg, index, limit, thumb)
+
+        reserved = await self.budget.acquire(total)
+        relayed = []
+        try:
+            results = await asyncio.gather(
+                *(_fetch_part(*entry) for entry in plan),
+                return_exceptions=True
+            )
+
+            for entry, result in zip(plan, results):
+                msg, index, media_type, extension, _, thumb, reserve = entry
+                if isinstance(result, BaseException):
+                    logger.warning(f"⚠️ Часть альбома {index + 1} не скачана: {result}")
+                    continue
+                if not result:
+                    continue
+                # Резерв части - по фактическому размеру, но не больше выделенного ей
+                if thumb is None:
+                    item = RelayedMedia(result, f"media_{index}{extension}", media_type, min(len(result), reserve))
+                    if media_type == "video":
+                        self.videos_relayed += 1
+                else:
+                    item = RelayedMedia(result, f"thumb_{index}.jpg", media_type, min(len(result), reserve))
+                    self.video_thumbnails += 1
+                relayed.append(item)
+
+            # Резерв частей переходит к held, остаток вернется ниже
+            if held is not None:
+                held.extend(relayed)
+        except BaseException:
+            relayed = []
+            raise
+        finally:
+            await self.budget.release(max(0, reserved - sum(item.reserved for item in relayed)))
+
+        expected = len(parts) + len(thumbnails or [])
+        if len(relayed) < expected:
+            logger.info(f"📦 Альбом: скачано {len(relayed)}/{expected} частей")
+        return relayed
+
+    async def release(self, items: List[RelayedMedia]):
+        """Вернуть байты в бюджет после отправки"""
+        for item in items:
+            await self.budget.release(item.reserved)
+            item.reserved = 0
+            item.data = b""
+
+    @asynccontextmanager
+    async def hold(self):
+        """Список для скачанных файлов: при выходе из блока (в том числе по
+        ошибке или отмене) их резерв возвращается в бюджет"""
+        held: List[RelayedMedia] = []
+        try:
+            yield held
+        finally:
+            await self.release(held)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'downloaded_files': self.downloaded_files,
+            'downloaded_mb': round(self.downloaded_bytes / 1024 / 1024, 1),
+            'skipped_oversize': self.skipped_oversize,
+            'skipped_budget': self.skipped_budget,
+            'videos_relayed': self.videos_relayed,
+            'video_thumbnails': self.video_thumbnails,
+            'in_flight_mb': round(self.budget.in_flight / 1024 / 1024, 1),
+            'cache': self.cache.get_stats() if self.cache else None,
+        }
@@ -0,0 +1,233 @@
+import html
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Any
+
+import pytz
+
+
+# Вся inline-разметка (**, __, ~~, `, *) снимается одним проходом через
+# обратную ссылку на открывающий маркер; как и раньше - в пределах строки
+_INLINE_MARKDOWN_RE = re.compile(r'(\*\*|__|~~|`|\*)(.*?)\1')
+_CODE_BLOCK_RE = re.compile(r'```(.*?)```', re.DOTALL)
+_MARKDOWN_MARKERS = ('*', '_', '~', '`')
+
+VLADIVOSTOK_TZ = pytz.timezone('Asia/Vladivostok')
+
+# Лимиты Telegram (в UTF-16 единицах, после разбора разметки)
+MESSAGE_LIMIT = 4096
+CAPTION_LIMIT = 1024
+
+# Порядок секций сообщения для каждого вида; секции разделяются пустой строкой
+_LAYOUTS: Dict[str, Tuple[str, ...]] = {
+    'text': ('header', 'text', 'date', 'url'),
+    'media_notice': ('header', 'text', 'date', 'media_info', 'url'),
+    'caption': ('header', 'text', 'date', 'note', 'url'),
+}
+_URL_FORMATS = {
+    'text': '{url}',
+    'media_notice': '🔗 {url}',
+    'caption': '🔗 {url}',
+}
+
+
+def _has_markdown(text: str) -> bool:
+    return any(marker in text for marker in _MARKDOWN_MARKERS)
+
+
+def strip_markdown(text: str) -> str:
+    """Очистка текста от markdown символов за один проход"""
+    if not text or not _has_markdown(text):
+        return text or ""
+    if '```' in text:
+        text = _CODE_BLOCK_RE.sub(r'\1', text)
+
+    stripped = _INLINE_MARKDOWN_RE.sub(r'\2', text)
+    # Вложенная разметка (**жирный *курсив***) - редкий случай, дочищаем еще раз
+    if stripped != text and _has_markdown(stripped):
+        stripped = _INLINE_MARKDOWN_RE.sub(r'\2', stripped)
+    return stripped
+
+
+def utf16_len(text: str) -> int:
+    """Длина в единицах UTF-16 - так считает лимиты Telegram"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def truncate_utf16(text: str, limit: int, suffix: str = "...") -> str:
+    """Обрезать текст по границе слова, чтобы он влез в limit единиц UTF-16"""
+    if utf16_len(text) <= limit:
+        return text
+    if limit <= len(suffix):
+        return suffix[:max(limit, 0)]
+
+    budget = limit - len(suffix)
+    # Эмодзи занимают 2 единицы - сначала режем по символам, потом уточняем
+    cut = text[:budget]
+    excess = utf16_len(cut) - budget
+    while excess > 0:
+        cut = cut[:-max(1, excess // 2)]
+        excess = utf16_len(cut) - budget
+
+    space = cut.rfind(' ')
+    if space > budget * 0.7:
+        cut = cut[:space]
+    return cut.rstrip() + suffix
+
+
+def split_text(text: str, max_length: int = 4000) -> List[str]:
+    """Разбить текст на части по строкам за линейное время"""
+    if len(text) <= max_length:
+        return [text]
+
+    parts = []
+    current: List[str] = []
+    current_len = 0
+
+    def flush():
+        if current:
+            part = '\n'.join(current).strip()
+            if part:
+                parts.append(part)
+
+    for line in text.split('\n'):
+        added = len(line) + (1 if current else 0)
+        if current_len + added <= max_length:
+            current.append(line)
+            current_len += added
+            continue
+
+        flush()
+        current, current_len = [], 0
+
+        while len(line) > max_length:
+            parts.append(line[:max_length])
+            line = line[max_length:]
+        current.append(line)
+        current_len = len(line)
+
+    flush()
+    return parts
+
+
+def format_date(date: Any) -> str:
+    """Дата публикации по Владивостоку"""
+    if not date:
+        return ""
+    try:
+        if isinstance(date, str):
+            try:
+                date = datetime.fromisoformat(date.replace('Z', '+00:00'))
+            except ValueError:
+                return f"📅 {date}"
+        if date.tzinfo is not None:
+            date = date.astimezone(VLADIVOSTOK_TZ)
+        return f"📅 {date.strftime('%d.%m.%Y %H:%M')} (Владивосток)"
+    except Exception:
+        return ""
+
+
+def format_media_info(photo_count: int, video_count: int) -> str:
+    media_info = []
+    if photo_count > 0:
+        media_info.append(f"📸 {photo_count} фото" if photo_count > 1 else "📸 фото")
+    if video_count > 0:
+        media_info.append(f"🎬 {video_count} видео" if video_count > 1 else "🎬 видео")
+    return ' + '.join(media_info)
+
+
+class MessageRenderer:
+    """Сборка текстов и подписей для отправки в целевую группу
+
+    Шаблоны кэшируются по (регион, вид сообщения). Регион влияет на заголовок:
+    если у региона нет своей темы, в общей ленте пост помечается эмодзи региона.
+    """
+
+    def __init__(self, regions_config: Optional[Dict[str, Any]] = None,
+                 topics: Optional[Dict[str, Any]] = None):
+        self.regions_config = regions_config or {}
+        self.topics = topics or {}
+        self._template = lru_cache(maxsize=128)(self._build_template)
+
+    def update_config(self, regions_config: Dict[str, Any], topics: Dict[str, Any]):
+        self.regions_config = regions_config or {}
+        self.topics = topics or {}
+        self._template.cache_clear()
+
+    def _build_template(self, region: Optional[str], kind: str) -> Tuple[str, Tuple[str, ...], str]:
+        header = "@{channel}"
+        if region and region != 'general' and not self.topics.get(region):
+            emoji = (self.regions_config.get(region) or {}).get('emoji')
+            if emoji:
+                header = f"{emoji} {header}"
+        return header, _LAYOUTS[kind], _URL_FORMATS[kind]
+
+    def render(self, news: Dict[str, Any], kind: str = 'text', region: Optional[str] = None,
+               note: str = "") -> str:
+        """Собрать сообщение вида kind ('text', 'media_notice', 'caption')"""
+        header, layout, url_format = self._template(region, kind)
+        is_caption = kind == 'caption'
+        limit = CAPTION_LIMIT if is_caption else MESSAGE_LIMIT
+        # Подписи уходят с parse_mode=HTML - экранируем пользовательский текст
+        escape = html.escape if is_caption else (lambda value: value)
+
+        url = news.get('url') or ''
+        values = {
+            'header': header.format(channel=news.get('channel_username', '')),
+            'date': format_date(news.get('date')),
+            'media_info': format_media_info(news.get('photo_count', 0), news.get('video_count', 0)),
+            'note': note,
+            'url': url_format.format(url=url) if url else '',
+        }
+
+        text = strip_markdown((news.get('text') or '').strip())
+        sections = [values.get(slot, '') for slot in layout]
+        text_index = layout.index('text')
+
+        # Текст получает все место, что осталось от остальных секций
+        sections[text_index] = ''
+        fixed = '\n\n'.join(section for section in sections if section)
+        budget = limit - utf16_len(fixed) - 2
+        if text and budget > 0:
+            # Лимит считается после разбора HTML, поэтому режем до экранирования
+            sections[text_index] = escape(truncate_utf16(text, budget))
+        return '\n\n'.join(section for section in sections if section)
+
+    def render_rollup(self, news_items: List[Dict[str, Any]], region: Optional[str] = None,
+                      minutes: int = 0, preview_length: int = 160) -> List[str]:
+        """Сводка нескольких постов: по строке на пост со ссылкой, в пределах лимита сообщения"""
+        emoji = (self.regions_config.get(region) or {}).get('emoji', '🗞') if region else '🗞'
+        period = f" за {minutes} мин" if minutes else ""
+
+        entries = []
+        for news in news_items:
+            text = strip_markdown((news.get('text') or '').strip())
+            first_line = next((line.strip() for line in text.split('\n') if line.strip()), '')
+            media_info = format_media_info(news.get('photo_count', 0), news.get('video_count', 0))
+            preview = truncate_utf16(first_line, preview_length) if first_line else media_info
+            entry = f"• @{news.get('channel_username', '')}: {preview}"
+            if news.get('url'):
+                entry += f"\n{news['url']}"
+            entries.append(entry)
+
+        messages = []
+        current: List[str] = []
+        current_len = 0
+        for entry in entries:
+            entry_len = utf16_len(entry) + 2
+            if current and current_len + entry_len > MESSAGE_LIMIT - 100:
+                messages.append(current)
+                current, current_len = [], 0
+            current.append(entry)
+            current_len += entry_len
+        if current:
+            messages.append(current)
+
+        total = len(messages)
+        result = []
+        for index, chunk in enumerate(messages, 1):
+            part = f" ({index}/{total})" if total > 1 else ""
+            header = f"{emoji} Сводка: {len(news_items)} постов{period}{part}"
+            result.append('\n\n'.join([header] + chunk))
+        return result
@@ -4,20 +4,110 @@
 """
 
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Any
+from typing import Awaitable, Callable, List, Dict, Optional, Any, Tuple
+from itertools import islice
 from loguru import logger
+import asyncio
+import heapq
+import numpy as np
 import pytz
 import re
+import time
+import yaml
+
+from src.monitoring.poll_scheduler import TokenBucket
+from src.digest_sessions import DigestRow, DigestSession, DigestSessionStore
+from src.ranking import RankingEngine
+from src.region_index import RegionIndex
+
+
+# Сколько лучших постов канала держим для пагинации live-дайджеста
+LIVE_TOP_K = 30
+# Страховочный предел просмотра постов за один live-дайджест
+LIVE_SCAN_LIMIT = 20000
+# iter_messages запрашивает историю страницами по 100 постов
+HISTORY_PAGE_SIZE = 100
+
+# Текст о ходе чтения канала или региона -> пользователю
+ProgressFunc = Callable[[str], Awaitable[None]]
+
+
+class ScanProgress:
+    """Ход чтения каналов для сообщения о прогрессе
+    
+    Сканы отчитываются после каждой страницы истории: сколько постов
+    просмотрено, сколько прошло фильтры и какая доля периода пройдена.
+    По доле и прошедшему времени оценивается, сколько осталось. Частоту
+    правки сообщения ограничивает получатель (report).
+    """
+    
+    def __init__(self, report: ProgressFunc, channels: int = 1):
+        self.report = report
+        self.channels = channels
+        self.started = time.monotonic()
+        self.done = 0
+        self.last_status = ""
+        # username -> (просмотрено, отобрано, пройденная доля периода)
+        self._scans: Dict[str, Tuple[int, int, float]] = {}
+    
+    async def update(self, username: str, checked: int, kept: int, covered: float):
+        self._scans[username] = (checked, kept, covered)
+        await self._send()
+    
+    async def finish(self, username: str, status: str = ""):
+        checked, kept, _ = self._scans.get(username, (0, 0, 0.0))
+        self._scans[username] = (checked, kept, 1.0)
+        self.done += 1
+        self.last_status = status
+        await self._send()
+    
+    def text(self) -> str:
+        checked = sum(scan[0] for scan in self._scans.values())
+        kept = sum(scan[1] for scan in self._scans.values())
+        lines = []
+        if self.channels > 1:
+            lines.append(f"📡 Прочитано каналов: {self.done}/{self.channels}")
+        lines.append(f"📨 Просмотрено постов: {checked}, отобрано: {kept}")
+        
+        covered = sum(scan[2] for scan in self._scans.values()) / max(1, self.channels)
+        if 0.05 <= covered < 1:
+            elapsed = time.monotonic() - self.started
+            lines.append(f"⏱️ Осталось примерно {elapsed * (1 - covered) / covered:.0f} с")
+        if self.last_status:
+            lines.append(self.last_status)
+        return "\n".join(lines)
+    
+    async def _send(self):
+        try:
+            await self.report(self.text())
+        except Exception as e:
+            logger.debug(f"Не удалось отправить прогресс дайджеста: {e}")
 
 
 class DigestGenerator:
     """Генератор дайджестов новостей"""
     
-    def __init__(self, database_manager, telegram_monitor=None):
+    def __init__(self, database_manager, telegram_monitor=None, settings: Optional[Dict[str, Any]] = None):
         self.db = database_manager
         self.telegram_monitor = telegram_monitor
         self.vladivostok_tz = pytz.timezone("Asia/Vladivostok")
-        self._last_digest_data = None  # Для хранения данных пагинации
+        self.channels_config_path = "config/channels_config.yaml"
+        
+        settings = settings or {}
+        self.live_concurrency = int(settings.get('live_concurrency', 4))
+        self.calls_per_minute = float(settings.get('calls_per_minute', 60))
+        self.channel_timeout = float(settings.get('channel_timeout', 90))
+        self.top_k = int(settings.get('top_k', LIVE_TOP_K))
+        # Общая формула популярности для дайджестов из базы и live
+        self.ranking = RankingEngine(settings.get('ranking'))
+        # Региональность поста - по ключевым словам региона его канала из config.yaml
+        self.regions = RegionIndex(settings.get('regions'))
+        self._channel_regions: Dict[str, Optional[str]] = {}
+        # Готовые дайджесты для пагинации (по чату и id дайджеста)
+        self.sessions = DigestSessionStore(
+            ttl_seconds=float(settings.get('session_ttl_minutes', 60)) * 60,
+            max_sessions=int(settings.get('max_sessions', 50))
+        )
     
     async def generate_weekly_digest(
         self, 
@@ -53,7 +143,7 @@ class DigestGenerator:
             end_formatted = end_date.strftime('%d.%m.%Y')
             
             # Получаем топ новости
-            top_news = await self.db.get_top_news_for_period(
+            top_news = await self.get_top_news_for_period(
                 start_date=start_date,
                 end_date=end_date,
                 region=region,
@@ -114,9 +204,7 @@ class DigestGenerator:
                 title += "..."
             
             # Статистика
-            views = news.get('views', 0)
-            forwards = news.get('forwards', 0)
-            popularity = views + forwards * 2  # Пересылки важнее просмотров
+            popularity = int(news.get('popularity_score', 0))
             
             news_item = f"⚡️ {title}"
             if link:
@@ -133,6 +221,65 @@ class DigestGenerator:
         
         return header + "\n".join(news_items) + footer
     
+    async def get_top_news_for_period(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        region: Optional[str] = None,
+        channel: Optional[str] = None,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        Топ постов из базы за период по общей формуле популярности
+        
+        Из базы читаются только числовые столбцы кандидатов, счет и отбор
+        считаются в NumPy. Бонусы за тег канала и региональность зависят
+        от текста, поэтому полные записи читаются только для кандидатов,
+        которые с максимальным бонусом могут обойти K-й счет без бонусов.
+        """
+        rows = await self.db.get_ranking_candidates(start_date, end_date, region, channel)
+        if not rows:
+            return []
+        
+        ids, channels, *columns, day_numbers = zip(*rows)
+        counts = np.array(columns, dtype=np.float64)      # views, forwards, replies, reactions
+        day_numbers = np.array(day_numbers, dtype=np.float64)
+        age_hours = (self._julian_day(end_date) - day_numbers) * 24
+        base = self.ranking.score(*counts, age_hours=age_hours)
+        
+        threshold = self.ranking.threshold(base, limit)
+        contenders = set(self.ranking.top_k(base, limit, day_numbers).tolist())
+        contenders.update(np.flatnonzero(base * self.ranking.max_bonus > threshold).tolist())
+        
+        records = await self.db.get_messages_by_ids([ids[i] for i in contenders])
+        index = np.array([i for i in sorted(contenders) if ids[i] in records], dtype=np.intp)
+        posts = [records[ids[i]] for i in index]
+        
+        channel_tag, regional = [], []
+        for post in posts:
+            username = post['channel_username'].lstrip('@')
+            text = post['text'] or ''
+            channel_tag.append(f"@{username}" in text.lower())
+            regional.append(self.regions.is_relevant(text, region or self._channel_region(username)))
+        
+        scores = self.ranking.score(
+            *counts[:, index], age_hours=age_hours[index], channel_tag=channel_tag, regional=regional
+        )
+        top_news = []
+        for position in self.ranking.top_k(scores, limit, day_numbers[index]):
+            post = posts[position]
+            post['popularity_score'] = float(scores[position])
+            top_news.append(post)
+        
+        logger.info(f"📊 Найдено {len(top_news)} топ новостей за период из {len(rows)} кандидатов")
+        return top_news
+    
+    def _julian_day(self, moment: datetime) -> float:
+        """Момент в юлианских днях - как julianday() в SQLite"""
+        if moment.tzinfo is None:
+            moment = self.vladivostok_tz.localize(moment)
+        return moment.timestamp() / 86400 + 2440587.5
+    
     def _create_message_link(self, news: Dict[str, Any]) -> Optional[str]:
         """Создание ссылки на сообщение в Telegram"""
         try:
@@ -206,34 +353,37 @@ class DigestGenerator:
         days: int = 7,
         limit: int = 10,
         custom_start_date: Optional[str] = None,
-        custom_end_date: Optional[str] = None
+        custom_end_date: Optional[str] = None,
+        chat_id: Optional[int] = None,
+        use_cache: bool = True,
+        progress: Optional[ProgressFunc] = None
     ) -> str:
         """
         Генерировать дайджест канала, читая сообщения напрямую из Telegram
         
         Args:
             channel_username: Username канала (без @)
+            chat_id: Чат, в котором будут листать страницы дайджеста
+            progress: Корутина для отчета о ходе чтения (после каждой страницы истории)
             days: Количество дней назад (по умолчанию 7)
             limit: Максимальное количество новостей (по умолчанию 10)
             custom_start_date: Начальная дата в формате 'YYYY-MM-DD'
             custom_end_date: Конечная дата в формате 'YYYY-MM-DD'
+            use_cache: Отдать заранее рассчитанный дайджест, если он есть
         """
         try:
+            channel_username = channel_username.lstrip('@')
+            is_standard_period = not (custom_start_date and custom_end_date)
+            if use_cache and is_standard_period:
+                cached = await self.get_cached_digest('channel', channel_username, days, chat_id, limit)
+                if cached:
+                    return cached
+            
             if not self.telegram_monitor or not hasattr(self.telegram_monitor, 'client'):
                 logger.error("❌ Telegram monitor или client недоступен")
                 return "❌ Не удалось подключиться к Telegram для чтения канала"
 
-            # Определяем период (с учетом timezone)
-            if custom_start_date and custom_end_date:
-                start_date = datetime.strptime(custom_start_date, '%Y-%m-%d')
-                end_date = datetime.strptime(custom_end_date, '%Y-%m-%d')
-                # Добавляем timezone для корректного сравнения
-                start_date = self.vladivostok_tz.localize(start_date)
-                end_date = self.vladivostok_tz.localize(end_date.replace(hour=23, minute=59, second=59))
-            else:
-                # Правильная логика: полные дни
-                end_date = datetime.now(self.vladivostok_tz).replace(hour=23, minute=59, second=59, microsecond=0)
-                start_date = (end_date - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+            start_date, end_date = self._live_period(days, custom_start_date, custom_end_date)
             
             logger.info(f"📰 Читаем сообщения из @{channel_username} за период {start_date.date()} - {end_date.date()}")
 
@@ -248,155 +398,387 @@ class DigestGenerator:
                 logger.error(f"❌ Не удалось получить канал @{channel_username}: {e}")
                 return f"❌ Канал @{channel_username} не найден или недоступен"
 
-            # Читаем сообщения
-            messages = []
-            total_messages_checked = 0
-            
-            logger.info(f"🔍 Начинаем поиск сообщений. Период: {start_date} - {end_date}")
-            
-            async for message in self.telegram_monitor.client.iter_messages(
-                entity, 
-                limit=None  # Проверяем ВСЕ сообщения
-            ):
-                total_messages_checked += 1
-                
-                if total_messages_checked <= 5:  # Логируем первые 5 сообщений для отладки
-                    logger.info(f"📄 Сообщение #{total_messages_checked}: дата={message.date}, текст='{message.text[:30] if message.text else 'НЕТ ТЕКСТА'}'")
-                
-                # Конвертируем дату сообщения в нужный timezone для корректного сравнения
-                message_date = message.date
-                if message_date.tzinfo is None:
-                    # Если дата без timezone, считаем что это UTC
-                    message_date = pytz.UTC.localize(message_date)
-                
-                # Конвертируем в наш timezone для сравнения
-                message_date = message_date.astimezone(self.vladivostok_tz)
-                
-                # Фильтруем по дате
-                if message_date < start_date:
-                    logger.info(f"🛑 Достигли даты начала ({start_date}). Прекращаем поиск. Проверено сообщений: {total_messages_checked}")
-                    break
-                
-                if message_date > end_date:
-                    if total_messages_checked <= 5:  # Логируем причины фильтрации для первых сообщений
-                        logger.info(f"⏭️ Сообщение #{total_messages_checked} отфильтровано по дате: {message_date} больше даты окончания {end_date}")
-                    continue
-                
-                # Защита от бесконечного цикла / высокой нагрузки (максимум 1000 проверенных сообщений)
-                if total_messages_checked >= 1000:
-                    logger.warning(f"⚠️ Превышен лимит проверки сообщений (1000). Останавливаем поиск.")
-                    break
-                    
-                # Пропускаем сообщения без текста
-                if not message.text or len(message.text.strip()) < 10:
-                    if total_messages_checked <= 5:
-                        logger.info(f"⏭️ Сообщение #{total_messages_checked} отфильтровано: нет текста или слишком короткое")
-                    continue
-                
-                # Исключаем "ночной чат" и подобные посты
-                text_lower = message.text.lower()
-                if self._is_chat_message(text_lower):
-                    if total_messages_checked <= 10:
-                        logger.info(f"⏭️ Сообщение #{total_messages_checked} отфильтровано: ночной чат/общение")
-                    continue
-
-                # Исключаем политические посты
-                if "#политика" in text_lower or "#политик" in text_lower:
-                    if total_messages_checked <= 10:
-                        logger.info(f"⏭️ Сообщение #{total_messages_checked} отфильтровано: политика")
-                    continue
-                
-                # Подсчитываем активность (реакции + комментарии)
-                views = getattr(message, 'views', 0) or 0
-                forwards = getattr(message, 'forwards', 0) or 0
-                replies = getattr(message.replies, 'replies', 0) if message.replies else 0
-                reactions_count = 0
-                
-                if hasattr(message, 'reactions') and message.reactions:
-                    for reaction in message.reactions.results:
-                        reactions_count += reaction.count
-                
-                # Ослабленный фильтр активности: либо много просмотров, либо есть реакции/комментарии
-                engagement = replies + reactions_count
-                if engagement == 0 and views < 1000:  # Разрешаем посты с большими просмотрами
-                    if total_messages_checked <= 10:
-                        logger.info(f"⏭️ Сообщение #{total_messages_checked} отфильтровано: мало активности (views={views}, replies={replies}, reactions={reactions_count})")
-                    continue
-                
-                # Проверка тега канала (бонус к популярности, но не обязательно)
-                channel_tag = f"@{channel_username}"
-                has_channel_tag = channel_tag in text_lower
-
-                # Региональная проверка (бонус к популярности, но не обязательно)
-                regional_keywords = self._get_regional_keywords(channel_username)
-                is_regional_news = False
-                if regional_keywords:
-                    is_regional_news = any(keyword in text_lower for keyword in regional_keywords)
-                
-                logger.info(f"✅ Сообщение #{total_messages_checked} подходит! Дата: {message_date}, реакции: {reactions_count}, комментарии: {replies}, текст: '{message.text[:50]}'")
-                
-                # Собираем данные о сообщении (используем уже вычисленные значения)
-                message_data = {
-                    'id': message.id,
-                    'text': message.text,
-                    'date': message_date,  # Используем уже сконвертированную дату
-                    'views': views,
-                    'forwards': forwards,
-                    'replies': replies,
-                    'reactions_count': reactions_count,
-                    'url': f"https://t.me/{channel_username}/{message.id}"
-                }
-                
-                # Вычисляем популярность (акцент на реакции и комментарии)
-                popularity_base = (
-                    message_data['replies'] * 10 +      # Комментарии - самое важное
-                    message_data['reactions_count'] * 8 + # Реакции - очень важно
-                    message_data['forwards'] * 3 +       # Репосты - важно
-                    message_data['views'] * 0.1          # Просмотры - минимальный вес
-                )
-                
-                # Бонусы за качество контента
-                channel_tag_bonus = 1.5 if has_channel_tag else 1.0    # +50% за тег канала
-                regional_bonus = 1.3 if is_regional_news else 1.0       # +30% за региональность
-                
-                message_data['popularity_score'] = popularity_base * channel_tag_bonus * regional_bonus
-                
-                messages.append(message_data)
-
-            logger.info(f"📊 Найдено {len(messages)} сообщений в канале @{channel_username} из {total_messages_checked} проверенных")
+            # Читаем только период: от end_date назад до start_date, топ держим в куче
+            scan_progress = ScanProgress(progress) if progress else None
+            all_top_messages = await self.scan_channel_top(
+                entity, channel_username, start_date, end_date, self.top_k, progress=scan_progress
+            )
             
-            if not messages:
+            if not all_top_messages:
                 empty_digest = self._generate_empty_digest_for_channel(channel_username, start_date, end_date)
                 return empty_digest
             
-            # Сортируем по популярности и берем топ-30 для пагинации
-            all_top_messages = sorted(messages, key=lambda x: x['popularity_score'], reverse=True)[:30]
-            
-            # Сохраняем данные для пагинации (временное решение)
-            self._last_digest_data = {
-                'messages': all_top_messages,
-                'start_date': start_date.strftime('%d.%m.%Y'),
-                'end_date': end_date.strftime('%d.%m.%Y'),
-                'channel_username': channel_username
-            }
+            # Сохраняем рейтинг для пагинации
+            title = f"канала @{channel_username}"
+            if is_standard_period:
+                await self.save_cached_digest(
+                    'channel', channel_username, days, [channel_username], title, start_date, end_date, all_top_messages
+                )
+            session = self._create_session(chat_id, title, start_date, end_date, all_top_messages)
             
             # Форматируем результат с пагинацией
-            digest_result = self._format_live_digest_with_pagination(
-                all_top_messages, 
-                start_date.strftime('%d.%m.%Y'),
-                end_date.strftime('%d.%m.%Y'),
-                channel_username,
+            return self._format_live_digest_with_pagination(
+                session,
                 page=1,  # Показываем первую страницу (1-10)
                 limit=limit
             )
             
-            # Возвращаем только текст для совместимости (кнопки обработаем отдельно)
-            return digest_result
-            
         except Exception as e:
             logger.error(f"❌ Ошибка генерации live дайджеста: {e}")
             return f"❌ Ошибка чтения канала: {e}"
 
+    def _live_period(
+        self,
+        days: int,
+        custom_start_date: Optional[str] = None,
+        custom_end_date: Optional[str] = None
+    ) -> Tuple[datetime, datetime]:
+        """Период live-дайджеста: полные дни по Владивостоку"""
+        if custom_start_date and custom_end_date:
+            start_date = datetime.strptime(custom_start_date, '%Y-%m-%d')
+            end_date = datetime.strptime(custom_end_date, '%Y-%m-%d')
+            # Добавляем timezone для корректного сравнения
+            start_date = self.vladivostok_tz.localize(start_date)
+            end_date = self.vladivostok_tz.localize(end_date.replace(hour=23, minute=59, second=59))
+        else:
+            # Правильная логика: полные дни
+            end_date = datetime.now(self.vladivostok_tz).replace(hour=23, minute=59, second=59, microsecond=0)
+            start_date = (end_date - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return start_date, end_date
+
+    def load_region_channels(self, region_key: str) -> Tuple[Optional[str], List[str]]:
+        """Название региона и username его каналов из channels_config.yaml"""
+        try:
+            with open(self.channels_config_path, 'r', encoding='utf-8') as f:
+                channels_data = yaml.safe_load(f) or {}
+        except (FileNotFoundError, yaml.YAMLError) as e:
+            logger.warning(f"⚠️ Проблема с файлом каналов {self.channels_config_path}: {e}")
+            return None, []
+        
+        region_data = (channels_data.get('regions') or {}).get(region_key)
+        if not region_data or not isinstance(region_data, dict):
+            return None, []
+        
+        usernames = []
+        for channel in region_data.get('channels') or []:
+            if isinstance(channel, dict) and channel.get('username'):
+                username = channel['username'].lstrip('@')
+                if username not in usernames:
+                    usernames.append(username)
+                # Явная привязка точнее угадывания по username
+                self._channel_regions[username] = region_key
+        return region_data.get('name', region_key), usernames
+
+    async def generate_region_digest_live(
+        self,
+        region_key: str,
+        days: int = 7,
+        limit: int = 10,
+        progress: Optional[ProgressFunc] = None,
+        custom_start_date: Optional[str] = None,
+        custom_end_date: Optional[str] = None,
+        chat_id: Optional[int] = None,
+        use_cache: bool = True
+    ) -> Any:
+        """
+        Live-дайджест региона: все каналы региона читаются параллельно
+        
+        Каналы сканируются одновременно (не больше live_concurrency), все
+        запросы идут через общий лимит calls_per_minute. Топы каналов
+        сливаются в общий рейтинг по той же формуле популярности, поэтому
+        регион строится примерно за время самого медленного канала.
+        
+        Args:
+            region_key: Ключ региона из channels_config.yaml
+            progress: Корутина для отчета о ходе чтения (просмотрено постов, каналов, сколько осталось)
+            chat_id: Чат, в котором будут листать страницы дайджеста
+            use_cache: Отдать заранее рассчитанный дайджест, если он есть
+        """
+        try:
+            is_standard_period = not (custom_start_date and custom_end_date)
+            if use_cache and is_standard_period:
+                cached = await self.get_cached_digest('region', region_key, days, chat_id, limit)
+                if cached:
+                    return cached
+            
+            if not self.telegram_monitor or not getattr(self.telegram_monitor, 'client', None):
+                logger.error("❌ Telegram monitor или client недоступен")
+                return "❌ Не удалось подключиться к Telegram для чтения каналов"
+            
+            region_name, channels = self.load_region_channels(region_key)
+            if not channels:
+                return f"❌ В регионе {region_key} нет каналов"
+            
+            start_date, end_date = self._live_period(days, custom_start_date, custom_end_date)
+            logger.info(f"📰 Live-дайджест региона {region_key}: {len(channels)} каналов за {start_date.date()} - {end_date.date()}")
+            
+            started = time.monotonic()
+            tops, failed = await self.collect_channel_tops(channels, end_date, {days: start_date}, progress)
+            all_top_messages = self.merge_tops([windows[days] for windows in tops.values()], self.top_k)
+            logger.info(
+                f"📊 Регион {region_key}: {len(tops)}/{len(channels)} каналов за "
+                f"{time.monotonic() - started:.1f} с, в топе {len(all_top_messages)}"
+            )
+            
+            if not all_top_messages:
+                return self._generate_empty_digest(
+                    start_date.strftime('%d.%m.%Y'), end_date.strftime('%d.%m.%Y'), region_name
+                )
+            
+            notes = f"⚠️ Не удалось прочитать: {', '.join('@' + name for name in failed)}" if failed else ""
+            title = f"региона {region_name}"
+            if is_standard_period:
+                await self.save_cached_digest(
+                    'region', region_key, days, list(tops), title, start_date, end_date, all_top_messages, notes
+                )
+            session = self._create_session(chat_id, title, start_date, end_date, all_top_messages, notes)
+            return self._format_live_digest_with_pagination(session, page=1, limit=limit)
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка генерации live дайджеста региона: {e}")
+            return f"❌ Ошибка чтения каналов региона: {e}"
+
+    async def collect_channel_tops(
+        self,
+        channels: List[str],
+        end_date: datetime,
+        windows: Dict[Any, datetime],
+        progress: Optional[ProgressFunc] = None
+    ) -> Tuple[Dict[str, Dict[Any, List[Dict[str, Any]]]], List[str]]:
+        """
+        Параллельно прочитать каналы и собрать топы по окнам периода
+        
+        Возвращает ({username: {окно: топ}}, [каналы, которые не удалось прочитать]).
+        """
+        semaphore = asyncio.Semaphore(self.live_concurrency)
+        budget = TokenBucket(self.calls_per_minute)
+        scan_progress = ScanProgress(progress, len(channels)) if progress else None
+        
+        async def scan(username: str) -> Tuple[str, Optional[Dict[Any, List[Dict[str, Any]]]], str]:
+            try:
+                async with semaphore:
+                    await budget.acquire()
+                    entity = await self.telegram_monitor.client.get_entity(username)
+                    tops = await asyncio.wait_for(
+                        self.scan_channel_windows(
+                            entity, username, end_date, windows, self.top_k, budget, scan_progress
+                        ),
+                        timeout=self.channel_timeout
+                    )
+                return username, tops, ''
+            except asyncio.TimeoutError:
+                return username, None, 'таймаут'
+            except Exception as e:
+                return username, None, str(e)
+        
+        results: Dict[str, Dict[Any, List[Dict[str, Any]]]] = {}
+        failed: List[str] = []
+        tasks = [asyncio.ensure_future(scan(username)) for username in channels]
+        try:
+            for future in asyncio.as_completed(tasks):
+                username, tops, reason = await future
+                if tops is None:
+                    failed.append(username)
+                    logger.warning(f"⚠️ Live-дайджест: @{username} пропущен ({reason})")
+                    status = f"@{username}: пропущен ({reason})"
+                else:
+                    results[username] = tops
+                    status = f"@{username}: {max(len(top) for top in tops.values())} в топе"
+                
+                if scan_progress:
+                    await scan_progress.finish(username, status)
+        finally:
+            # Отмена фоновой задачи - не оставляем чтение остальных каналов
+            for task in tasks:
+                task.cancel()
+        
+        return results, failed
+
+    @staticmethod
+    def merge_tops(tops: List[List[Dict[str, Any]]], top_k: int) -> List[Dict[str, Any]]:
+        """Общий топ из уже отсортированных топов каналов (без общей пересортировки)"""
+        return list(islice(
+            heapq.merge(*tops, key=lambda item: item['popularity_score'], reverse=True),
+            top_k
+        ))
+
+    async def scan_channel_top(
+        self,
+        entity,
+        channel_username: str,
+        start_date: datetime,
+        end_date: datetime,
+        top_k: int = LIVE_TOP_K,
+        budget: Optional[TokenBucket] = None,
+        progress: Optional[ScanProgress] = None
+    ) -> List[Dict[str, Any]]:
+        """Топ-K популярных постов канала за период, по убыванию популярности"""
+        tops = await self.scan_channel_windows(
+            entity, channel_username, end_date, {0: start_date}, top_k, budget, progress
+        )
+        return tops[0]
+
+    async def scan_channel_windows(
+        self,
+        entity,
+        channel_username: str,
+        end_date: datetime,
+        windows: Dict[Any, datetime],
+        top_k: int = LIVE_TOP_K,
+        budget: Optional[TokenBucket] = None,
+        progress: Optional[ScanProgress] = None
+    ) -> Dict[Any, List[Dict[str, Any]]]:
+        """
+        Топ-K постов канала сразу для нескольких периодов с общим концом
+        
+        Чтение начинается сразу с конца периода (offset_date) и идет страницами
+        по 100 постов назад до самого раннего начала - число запросов
+        пропорционально длине периода, а не его удаленности от сегодняшнего дня.
+        Каждый пост попадает в кучи всех окон, в которые входит по дате,
+        так что 7/14/30 дней считаются за один проход.
+        budget - общий лимит запросов: токен берется перед каждой следующей страницей.
+        progress получает после каждой страницы число просмотренных и отобранных
+        постов и пройденную долю периода.
+        """
+        channel_region = self._channel_region(channel_username)
+        heaps: Dict[Any, List[Tuple[float, int, Dict[str, Any]]]] = {key: [] for key in windows}
+        earliest = min(windows.values())
+        checked = 0
+        kept = 0
+        skipped: Dict[str, int] = {}
+        batch: List[Dict[str, Any]] = []
+        period_seconds = max(1.0, (end_date - earliest).total_seconds())
+        
+        # wait_time=0: без искусственной паузы между страницами (FloodWait Telethon обработает сам)
+        async for message in self.telegram_monitor.client.iter_messages(
+            entity, offset_date=end_date, limit=None, wait_time=0
+        ):
+            checked += 1
+            message_date = message.date
+            if message_date.tzinfo is None:
+                # Если дата без timezone, считаем что это UTC
+                message_date = pytz.UTC.localize(message_date)
+            message_date = message_date.astimezone(self.vladivostok_tz)
+            
+            if checked % HISTORY_PAGE_SIZE == 0:
+                if budget:
+                    await budget.acquire()
+                if progress:
+                    covered = (end_date - message_date).total_seconds() / period_seconds
+                    await progress.update(channel_username, checked, kept, min(1.0, max(0.0, covered)))
+            
+            if message_date < earliest:
+                break
+            
+            if checked >= LIVE_SCAN_LIMIT:
+                logger.warning(f"⚠️ @{channel_username}: просмотрено {LIVE_SCAN_LIMIT} постов, период обрезан на {message_date}")
+                break
+            
+            message_data, reason = self._live_candidate(message, message_date, channel_username, channel_region)
+            if message_data is None:
+                skipped[reason] = skipped.get(reason, 0) + 1
+                continue
+            
+            message_data['channel_username'] = channel_username
+            kept += 1
+            batch.append(message_data)
+            if len(batch) >= HISTORY_PAGE_SIZE:
+                self._push_ranked(batch, heaps, windows, end_date, top_k)
+                batch = []
+        
+        if batch:
+            self._push_ranked(batch, heaps, windows, end_date, top_k)
+        
+        logger.info(
+            f"📊 @{channel_username}: просмотрено {checked} постов, в топ-{top_k} попало "
+            f"{max((len(heap) for heap in heaps.values()), default=0)}"
+            + (f", отсеяно: {skipped}" if skipped else "")
+        )
+        return {key: [data for _, _, data in sorted(heap, reverse=True)] for key, heap in heaps.items()}
+
+    def _push_ranked(
+        self,
+        batch: List[Dict[str, Any]],
+        heaps: Dict[Any, List[Tuple[float, int, Dict[str, Any]]]],
+        windows: Dict[Any, datetime],
+        end_date: datetime,
+        top_k: int
+    ):
+        """Посчитать популярность пачки постов разом и положить лучших в кучи окон"""
+        scores = self.ranking.score_rows(batch, now=end_date)
+        timestamps = np.array([data['date'].timestamp() for data in batch])
+        for key, window_start in windows.items():
+            heap = heaps[key]
+            mask = timestamps >= window_start.timestamp()
+            if len(heap) >= top_k:
+                # Заведомо не проходящие в заполненную кучу отсекаются без цикла
+                mask &= scores >= heap[0][0]
+            for position in np.flatnonzero(mask):
+                data = batch[position]
+                data['popularity_score'] = float(scores[position])
+                item = (data['popularity_score'], data['id'], data)
+                if len(heap) < top_k:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+
+    def _live_candidate(
+        self,
+        message,
+        message_date: datetime,
+        channel_username: str,
+        channel_region: Optional[str]
+    ) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Данные поста для ранжирования, либо (None, причина отсева)"""
+        # Пропускаем сообщения без текста
+        if not message.text or len(message.text.strip()) < 10:
+            return None, 'без текста'
+        
+        # Исключаем "ночной чат" и подобные посты
+        text_lower = message.text.lower()
+        if self._is_chat_message(text_lower):
+            return None, 'общение'
+        
+        # Исключаем политические посты
+        if "#политика" in text_lower or "#политик" in text_lower:
+            return None, 'политика'
+        
+        # Подсчитываем активность (реакции + комментарии)
+        views = getattr(message, 'views', 0) or 0
+        forwards = getattr(message, 'forwards', 0) or 0
+        replies = getattr(message.replies, 'replies', 0) if message.replies else 0
+        reactions_count = 0
+        
+        if hasattr(message, 'reactions') and message.reactions:
+            for reaction in message.reactions.results:
+                reactions_count += reaction.count
+        
+        # Ослабленный фильтр активности: либо много просмотров, либо есть реакции/комментарии
+        engagement = replies + reactions_count
+        if engagement == 0 and views < 1000:
+            return None, 'мало активности'
+        
+        # Проверка тега канала (бонус к популярности, но не обязательно)
+        has_channel_tag = f"@{channel_username}" in text_lower
+        
+        # Региональная проверка (бонус к популярности, но не обязательно)
+        is_regional_news = self.regions.is_relevant(message.text, channel_region)
+        
+        message_data = {
+            'id': message.id,
+            'text': message.text,
+            'date': message_date,
+            'views': views,
+            'forwards': forwards,
+            'replies': replies,
+            'reactions_count': reactions_count,
+            'url': f"https://t.me/{channel_username}/{message.id}",
+            # Бонусы за качество контента (веса - в настройках ранжирования)
+            'channel_tag': has_channel_tag,
+            'regional': is_regional_news
+        }
+        return message_data, ''
+
     def _format_live_digest(
         self, 
         messages: List[Dict[str, Any]], 
@@ -436,16 +818,104 @@ class DigestGenerator:
         
         return header + "\n\n".join(digest_lines) + footer
 
+    @staticmethod
+    def cache_key(scope: str, target: str, days: int) -> str:
+        return f"{scope}:{target.lower()}:{days}"
+
+    async def get_cached_digest(
+        self,
+        scope: str,
+        target: str,
+        days: int,
+        chat_id: Optional[int],
+        limit: int = 10
+    ) -> Optional[Dict[str, Any]]:
+        """Первая страница заранее рассчитанного дайджеста (или None, если его нет)"""
+        if not self.db or not hasattr(self.db, 'get_digest_cache'):
+            return None
+        entry = await self.db.get_digest_cache(self.cache_key(scope, target, days))
+        if not entry:
+            return None
+        
+        payload = entry['payload']
+        # После полуночи период сдвинулся - вчерашний расчет не подходит
+        _, end_date = self._live_period(days)
+        if payload['end_date'] != end_date.strftime('%d.%m.%Y'):
+            return None
+        
+        session = self.sessions.create(
+            chat_id, payload['title'], payload['start_date'], payload['end_date'],
+            [DigestRow(*row) for row in payload['rows']], payload.get('notes', '')
+        )
+        session.generated_at = entry['generated_at']
+        session.stale = entry['stale']
+        session.refresh_data = f"digest_refresh_{scope}_{target}_{days}"
+        logger.info(f"📦 Дайджест {scope} {target} за {days} дн. отдан из кэша")
+        return self._format_live_digest_with_pagination(session, page=1, limit=limit)
+
+    async def save_cached_digest(
+        self,
+        scope: str,
+        target: str,
+        days: int,
+        channels: List[str],
+        title: str,
+        start_date: datetime,
+        end_date: datetime,
+        messages: List[Dict[str, Any]],
+        notes: str = ""
+    ):
+        """Сохранить рассчитанный дайджест стандартного периода в кэш"""
+        if not self.db or not hasattr(self.db, 'save_digest_cache'):
+            return
+        payload = {
+            'title': title,
+            'start_date': start_date.strftime('%d.%m.%Y'),
+            'end_date': end_date.strftime('%d.%m.%Y'),
+            'rows': [list(row) for row in self._compact_rows(messages)],
+            'notes': notes,
+        }
+        await self.db.save_digest_cache(
+            self.cache_key(scope, target, days), scope, target, days, channels, payload, time.time()
+        )
+
+    def _compact_rows(self, messages: List[Dict[str, Any]]) -> List[DigestRow]:
+        """Рейтинг в компактном виде: превью текста считается один раз"""
+        return [
+            DigestRow(
+                self._smart_truncate(self._clean_message_text(msg['text']), 80),
+                msg['url'],
+                msg['reactions_count'],
+                msg['replies']
+            )
+            for msg in messages
+        ]
+
+    def _create_session(
+        self,
+        chat_id: Optional[int],
+        title: str,
+        start_date: datetime,
+        end_date: datetime,
+        messages: List[Dict[str, Any]],
+        notes: str = ""
+    ) -> DigestSession:
+        """Сохранить рейтинг для пагинации"""
+        return self.sessions.create(
+            chat_id, title, start_date.strftime('%d.%m.%Y'), end_date.strftime('%d.%m.%Y'),
+            self._compact_rows(messages), notes
+        )
+
     def _format_live_digest_with_pagination(
         self, 
-        all_messages: List[Dict[str, Any]], 
-        start_date: str, 
-        end_date: str,
-        channel_username: str,
+        session: DigestSession,
         page: int = 1,
         limit: int = 10
     ) -> Dict[str, Any]:
-        """Форматирование дайджеста для канала с пагинацией"""
+        """Форматирование страницы дайджеста канала или региона"""
+        
+        all_messages = session.rows
+        digest_id = session.digest_id
         
         # Вычисляем границы для текущей страницы
         start_idx = (page - 1) * limit
@@ -455,25 +925,19 @@ class DigestGenerator:
         # Заголовок с информацией о странице
         total_messages = len(all_messages)
         if page == 1:
-            header = f"📰 Топ-{len(messages_on_page)} самых обсуждаемых новостей из канала @{channel_username} за неделю\n"
+            header = f"📰 Топ-{len(messages_on_page)} самых обсуждаемых новостей из {session.title} за неделю\n"
         else:
             news_range = f"{start_idx + 1}-{min(end_idx, total_messages)}"
-            header = f"📰 Новости {news_range} из топ-{total_messages} канала @{channel_username} за неделю\n"
+            header = f"📰 Новости {news_range} из топ-{total_messages} {session.title} за неделю\n"
         
-        header += f"📅 Период: {start_date} - {end_date}\n\n"
+        header += f"📅 Период: {session.start_date} - {session.end_date}\n\n"
         
         # Форматируем новости на текущей странице
         digest_lines = []
         for i, msg in enumerate(messages_on_page, start_idx + 1):
-            # Очищаем текст от форматирования и лишних эмодзи
-            clean_text = self._clean_message_text(msg['text'])
-            
-            # Умная обрезка по словам (максимум 80 символов)
-            text_preview = self._smart_truncate(clean_text, 80)
-            
             # Детальная статистика активности
-            reactions = msg['reactions_count']
-            replies = msg['replies']
+            reactions = msg.reactions_count
+            replies = msg.replies
             
             # Формируем строку активности
             activity_parts = []
@@ -484,7 +948,7 @@ class DigestGenerator:
             
             activity_str = " ".join(activity_parts) if activity_parts else "0 активности"
             
-            line = f"{i}. {text_preview}\n   🔗 {msg['url']} [{activity_str}]"
+            line = f"{i}. {msg.preview}\n   🔗 {msg.url} [{activity_str}]"
             digest_lines.append(line)
         
         # Создаем кнопки пагинации
@@ -494,12 +958,12 @@ class DigestGenerator:
         if page == 1 and total_messages > 10:
             pagination_buttons.append([
                 {"text": f"📄 Показать еще (11-{min(20, total_messages)})", 
-                 "callback_data": f"digest_page_{channel_username}_{page + 1}"}
+                 "callback_data": f"digest_page_{digest_id}_{page + 1}"}
             ])
         elif page == 2 and total_messages > 20:
             pagination_buttons.append([
                 {"text": f"📄 Показать еще (21-{min(30, total_messages)})", 
-                 "callback_data": f"digest_page_{channel_username}_{page + 1}"}
+                 "callback_data": f"digest_page_{digest_id}_{page + 1}"}
             ])
         
         # Кнопка "Назад" если не первая страница
@@ -507,12 +971,12 @@ class DigestGenerator:
             if page == 2:
                 pagination_buttons.append([
                     {"text": "🔙 Вернуться к топ-10", 
-                     "callback_data": f"digest_page_{channel_username}_1"}
+                     "callback_data": f"digest_page_{digest_id}_1"}
                 ])
             else:
                 pagination_buttons.append([
                     {"text": f"🔙 Назад (11-20)", 
-                     "callback_data": f"digest_page_{channel_username}_{page - 1}"}
+                     "callback_data": f"digest_page_{digest_id}_{page - 1}"}
                 ])
         
         # Основные кнопки
@@ -524,16 +988,22 @@ class DigestGenerator:
         footer = "\n\nЭти новости собрали больше всего реакций и комментариев от читателей. А вам что больше всего запомнилось?"
         
         text = header + "\n\n".join(digest_lines) + footer
+        if page == 1 and session.notes:
+            text += f"\n\n{session.notes}"
+        if session.generated_at:
+            minutes = max(0, int((time.time() - session.generated_at) // 60))
+            text += f"\n\n🕐 Рассчитан {minutes} мин назад" + (" (есть новые данные)" if session.stale else "")
+            if session.refresh_data:
+                main_buttons.insert(0, [{"text": "🔄 Обновить", "callback_data": session.refresh_data}])
         keyboard = pagination_buttons + main_buttons
         
         # Возвращаем и текст и клавиатуру
         return {
             'text': text,
             'keyboard': keyboard,
-            'all_messages': all_messages,  # Сохраняем для других страниц
-            'channel_username': channel_username,
-            'start_date': start_date,
-            'end_date': end_date
+            'digest_id': digest_id,
+            'start_date': session.start_date,
+            'end_date': session.end_date
         }
 
     def _generate_empty_digest_for_channel(
@@ -553,76 +1023,12 @@ class DigestGenerator:
              f"• Убедиться, что канал публичный"
          )
 
-    def _get_regional_keywords(self, channel_username: str) -> List[str]:
-        """Получить ключевые слова для региональной фильтрации по каналу"""
-        channel_lower = channel_username.lower()
-        
-        # Камчатка
-        if "kamchat" in channel_lower or "камчат" in channel_lower:
-            return [
-                "камчатк", "петропавловск", "елизово", "мильково", "усть-большерецк", 
-                "усть-камчатск", "вилючинск", "ключи", "эссо", "палана",
-                "командорск", "никольское", "тигиль", "оссора", "пенжино"
-            ]
-        
-        # Владивосток
-        elif "vladivostok" in channel_lower or "владивосток" in channel_lower:
-            return [
-                "владивосток", "приморск", "находка", "уссурийск", "артем", 
-                "партизанск", "спасск", "дальнегорск", "лесозаводск", "арсеньев"
-            ]
-        
-        # Хабаровск
-        elif "khabarovsk" in channel_lower or "хабаровск" in channel_lower:
-            return [
-                "хабаровск", "комсомольск", "амурск", "николаевск", "советская гавань",
-                "бикин", "вяземский", "охотск", "аян"
-            ]
-        
-        # Благовещенск
-        elif "blagoveshchensk" in channel_lower or "благовещенск" in channel_lower:
-            return [
-                "благовещенск", "белогорск", "свободный", "зея", "тында", 
-                "шимановск", "завитинск", "райчихинск"
-            ]
-        
-        # Сахалин
-        elif "sakhalin" in channel_lower or "сахалин" in channel_lower:
-            return [
-                "сахалин", "южно-сахалинск", "холмск", "корсаков", "невельск",
-                "александровск", "поронайск", "макаров", "курилы", "оха"
-            ]
-        
-        # Якутск
-        elif "yakutsk" in channel_lower or "якутск" in channel_lower:
-            return [
-                "якутск", "якути", "саха", "мирный", "нерюнгри", "алдан", 
-                "ленск", "олекминск", "верхоянск", "магадан"
-            ]
-        
-        # Иркутск
-        elif "irkutsk" in channel_lower or "иркутск" in channel_lower:
-            return [
-                "иркутск", "ангарск", "братск", "усть-илимск", "черемхово",
-                "саянск", "шелехов", "тулун", "байкал"
-            ]
-        
-        # Улан-Удэ
-        elif "ulan" in channel_lower or "улан" in channel_lower or "buryat" in channel_lower:
-            return [
-                "улан-удэ", "бурят", "северобайкальск", "гусиноозерск", 
-                "закаменск", "кяхта", "баргузин", "турунтаево"
-            ]
-        
-        # Чита
-        elif "chita" in channel_lower or "чита" in channel_lower:
-            return [
-                "чита", "краснокаменск", "борзя", "петровск", "нерчинск",
-                "шилка", "сретенск", "балей"
-            ]
-        
-        # Если канал не определен, не фильтруем по региону
-        return []
+    def _channel_region(self, channel_username: str) -> Optional[str]:
+        """Регион канала: из channels_config.yaml, если уже читался, иначе по ключевым словам username"""
+        username = channel_username.lstrip('@')
+        if username not in self._channel_regions:
+            self._channel_regions[username] = self.regions.detect_channel(username)
+        return self._channel_regions[username]
 
     def _is_chat_message(self, text_lower: str) -> bool:
         """Проверка, является ли сообщение обычным общением (не новостью)"""
@@ -692,34 +1098,18 @@ class DigestGenerator:
         
         return result + "..." if result != text else text
 
-    async def get_digest_page(self, channel_username: str, page: int) -> Dict[str, Any]:
-        """Получить конкретную страницу дайджеста"""
+    async def get_digest_page(self, chat_id: Optional[int], digest_id: str, page: int) -> Dict[str, Any]:
+        """Получить конкретную страницу дайджеста (из памяти, без повторного чтения каналов)"""
         try:
-            # Проверяем, есть ли сохраненные данные
-            if not hasattr(self, '_last_digest_data') or not self._last_digest_data:
+            session = self.sessions.get(chat_id, digest_id)
+            if not session:
                 return {
-                    'text': "❌ Данные дайджеста не найдены. Сгенерируйте новый дайджест.",
-                    'keyboard': [[{"text": "📰 Новый дайджест", "callback_data": "digest"}]]
-                }
-            
-            data = self._last_digest_data
-            
-            # Проверяем, тот ли канал
-            if data['channel_username'] != channel_username:
-                return {
-                    'text': "❌ Данные дайджеста устарели. Сгенерируйте новый дайджест.",
+                    'text': "❌ Дайджест устарел или не найден. Сгенерируйте новый дайджест.",
                     'keyboard': [[{"text": "📰 Новый дайджест", "callback_data": "digest"}]]
                 }
             
             # Форматируем нужную страницу
-            return self._format_live_digest_with_pagination(
-                data['messages'],
-                data['start_date'],
-                data['end_date'],
-                data['channel_username'],
-                page=page,
-                limit=10
-            )
+            return self._format_live_digest_with_pagination(session, page=page, limit=10)
             
         except Exception as e:
             logger.error(f"❌ Ошибка получения страницы дайджеста: {e}")
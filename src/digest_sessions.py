@@ -0,0 +1,107 @@
+"""
+🗂️ Digest Sessions Module
+Хранилище готовых дайджестов для пагинации: по чату и id дайджеста,
+с временем жизни и вытеснением самых давно открытых
+"""
+
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+
+class DigestRow(NamedTuple):
+    """Строка рейтинга - только то, что нужно для вывода страницы"""
+    preview: str
+    url: str
+    reactions_count: int
+    replies: int
+
+
+class DigestSession:
+
+    __slots__ = ("digest_id", "chat_id", "title", "start_date", "end_date", "rows",
+                 "notes", "created_at", "last_access", "generated_at", "stale", "refresh_data")
+
+    def __init__(self, digest_id: str, chat_id: Optional[int], title: str,
+                 start_date: str, end_date: str, rows: List[DigestRow], notes: str = ""):
+        self.digest_id = digest_id
+        self.chat_id = chat_id
+        self.title = title              # «канала @x» / «региона Чита»
+        self.start_date = start_date
+        self.end_date = end_date
+        self.rows = rows
+        self.notes = notes              # Приписка к первой странице (например, пропущенные каналы)
+        self.created_at = time.monotonic()
+        self.last_access = self.created_at
+        # Для дайджестов из кэша: когда рассчитан (unix time) и callback для пересчета
+        self.generated_at: Optional[float] = None
+        self.stale = False
+        self.refresh_data: Optional[str] = None
+
+
+class DigestSessionStore:
+    """Дайджесты по ключу (чат, id дайджеста)
+
+    Страницы всегда отдаются из памяти: повторное чтение каналов не нужно,
+    сколько бы дайджестов ни строилось параллельно. Сессия живет ttl секунд
+    с последнего обращения; сверх max_sessions вытесняется самая давно
+    открытая.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, max_sessions: int = 50):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[Tuple[Optional[int], str], DigestSession]" = OrderedDict()
+
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def create(self, chat_id: Optional[int], title: str, start_date: str, end_date: str,
+               rows: List[DigestRow], notes: str = "") -> DigestSession:
+        self._expire()
+        digest_id = secrets.token_hex(4)
+        while (chat_id, digest_id) in self._sessions:
+            digest_id = secrets.token_hex(4)
+
+        session = DigestSession(digest_id, chat_id, title, start_date, end_date, rows, notes)
+        self._sessions[(chat_id, digest_id)] = session
+        self.created += 1
+
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+        return session
+
+    def get(self, chat_id: Optional[int], digest_id: str) -> Optional[DigestSession]:
+        self._expire()
+        key = (chat_id, digest_id)
+        session = self._sessions.get(key)
+        if session is None:
+            return None
+        session.last_access = time.monotonic()
+        self._sessions.move_to_end(key)
+        return session
+
+    def _expire(self):
+        # Порядок словаря - по последнему обращению, просроченные всегда в начале
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if session.last_access >= cutoff:
+                break
+            del self._sessions[key]
+            self.expired += 1
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'sessions': len(self._sessions),
+            'rows': sum(len(session.rows) for session in self._sessions.values()),
+            'created': self.created,
+            'expired': self.expired,
+            'evicted': self.evicted,
+        }
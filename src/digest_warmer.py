@@ -0,0 +1,173 @@
+"""
+🔥 Digest Warmer Module
+Заранее рассчитывает дайджесты стандартных периодов по регионам и каналам,
+чтобы /digest отвечал из кэша мгновенно
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from loguru import logger
+import yaml
+
+
+class DigestWarmer:
+    """Фоновый прогрев кэша дайджестов (таблица digest_cache)
+
+    В тихие часы (по Владивостоку) раз в сутки пересчитываются все регионы:
+    каждый канал читается один раз за самый длинный период, а топы 7/14/30
+    дней собираются за тот же проход. Из топов каналов сливаются дайджесты
+    регионов. Вне тихих часов раз в check_interval пересчитываются только
+    устаревшие дайджесты: с обновленной статистикой или набравшие
+    rewarm_after_posts новых постов - иначе каждый новый пост запускал бы
+    полное чтение региона через ту же сессию, что ведет мониторинг.
+    """
+
+    def __init__(self, digest_generator, database, settings: Optional[Dict[str, Any]] = None):
+        self.digest_generator = digest_generator
+        self.database = database
+
+        settings = settings or {}
+        self.periods: List[int] = sorted(int(days) for days in settings.get('periods', [7, 14, 30]))
+        self.quiet_hours_start = int(settings.get('quiet_hours_start', 3))
+        self.quiet_hours_end = int(settings.get('quiet_hours_end', 6))
+        self.check_interval = float(settings.get('check_interval', 900))
+        self.rewarm_per_check = int(settings.get('rewarm_per_check', 2))
+        # Устаревший дайджест пересчитывается не раньше, чем через столько минут после прошлого расчета
+        self.min_rewarm_age = float(settings.get('min_rewarm_age_minutes', 60)) * 60
+        self.rewarm_after_posts = max(1, int(settings.get('rewarm_after_posts', 20)))
+
+        self._task: Optional[asyncio.Task] = None
+        self._last_full_warm: Optional[str] = None
+
+        self.warmed = 0
+        self.last_warm_seconds: Optional[float] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(
+                f"🔥 Прогрев дайджестов запущен: периоды {self.periods} дн., "
+                f"тихие часы {self.quiet_hours_start}-{self.quiet_hours_end}"
+            )
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _is_quiet_time(self, now: datetime) -> bool:
+        return self.quiet_hours_start <= now.hour < self.quiet_hours_end
+
+    async def _run(self):
+        while True:
+            try:
+                now = datetime.now(self.digest_generator.vladivostok_tz)
+                today = now.date().isoformat()
+                if self._is_quiet_time(now) and self._last_full_warm != today:
+                    await self.warm_all()
+                    self._last_full_warm = today
+                else:
+                    await self.rewarm_stale()
+            except Exception as e:
+                logger.error(f"❌ Ошибка прогрева дайджестов: {e}")
+            await asyncio.sleep(self.check_interval)
+
+    def _load_regions(self) -> List[str]:
+        try:
+            with open(self.digest_generator.channels_config_path, 'r', encoding='utf-8') as f:
+                channels_data = yaml.safe_load(f) or {}
+        except (FileNotFoundError, yaml.YAMLError) as e:
+            logger.warning(f"⚠️ Проблема с файлом каналов: {e}")
+            return []
+        return list((channels_data.get('regions') or {}).keys())
+
+    async def warm_all(self) -> int:
+        """Пересчитать дайджесты всех регионов и их каналов"""
+        started = time.monotonic()
+        warmed = 0
+        for region_key in self._load_regions():
+            warmed += await self.warm_region(region_key)
+        self.last_warm_seconds = time.monotonic() - started
+        logger.info(f"🔥 Дайджесты прогреты: {warmed} за {self.last_warm_seconds:.0f} с")
+        return warmed
+
+    async def rewarm_stale(self) -> int:
+        """Пересчитать несколько устаревших дайджестов (самые давние первыми)"""
+        targets = await self.database.get_stale_digest_targets(
+            self.rewarm_per_check, generated_before=time.time() - self.min_rewarm_age,
+            min_new_posts=self.rewarm_after_posts
+        )
+        warmed = 0
+        for target in targets:
+            if target['scope'] == 'region':
+                warmed += await self.warm_region(target['target'])
+            else:
+                warmed += await self.warm_channels([target['target']])
+        return warmed
+
+    async def warm_region(self, region_key: str) -> int:
+        region_name, channels = self.digest_generator.load_region_channels(region_key)
+        if not channels:
+            return 0
+
+        tops, failed, start_dates, end_date = await self._collect(channels)
+        if not tops:
+            return 0
+
+        warmed = await self._save_channels(tops, start_dates, end_date)
+        notes = f"⚠️ Не удалось прочитать: {', '.join('@' + name for name in failed)}" if failed else ""
+        for days in self.periods:
+            merged = self.digest_generator.merge_tops(
+                [windows[days] for windows in tops.values()], self.digest_generator.top_k
+            )
+            await self.digest_generator.save_cached_digest(
+                'region', region_key, days, list(tops), f"региона {region_name}",
+                start_dates[days], end_date, merged, notes
+            )
+            warmed += 1
+        self.warmed += warmed
+        return warmed
+
+    async def warm_channels(self, channels: List[str]) -> int:
+        tops, _, start_dates, end_date = await self._collect(channels)
+        warmed = await self._save_channels(tops, start_dates, end_date)
+        self.warmed += warmed
+        return warmed
+
+    async def _collect(self, channels: List[str]):
+        end_date = datetime.now(self.digest_generator.vladivostok_tz).replace(
+            hour=23, minute=59, second=59, microsecond=0
+        )
+        start_dates = {
+            days: (end_date - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+            for days in self.periods
+        }
+        tops, failed = await self.digest_generator.collect_channel_tops(channels, end_date, start_dates)
+        return tops, failed, start_dates, end_date
+
+    async def _save_channels(self, tops: Dict[str, Dict[int, List[Dict[str, Any]]]],
+                             start_dates: Dict[int, datetime], end_date: datetime) -> int:
+        saved = 0
+        for username, windows in tops.items():
+            for days, messages in windows.items():
+                if not messages:
+                    continue
+                await self.digest_generator.save_cached_digest(
+                    'channel', username, days, [username], f"канала @{username}",
+                    start_dates[days], end_date, messages
+                )
+                saved += 1
+        return saved
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'warmed': self.warmed,
+            'last_full_warm': self._last_full_warm,
+            'last_warm_seconds': round(self.last_warm_seconds) if self.last_warm_seconds is not None else None,
+        }
@@ -0,0 +1,185 @@
+"""
+📈 Engagement Refresher Module
+Фоновое обновление просмотров, репостов, комментариев и реакций
+у уже сохраненных постов - чтобы дайджесты из базы были точными
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+import pytz
+
+from telethon.errors import FloodWaitError
+
+from src.monitoring.poll_scheduler import TokenBucket
+
+
+class EngagementRefresher:
+    """Периодическое обновление статистики постов в базе
+
+    В момент сохранения у поста почти нет просмотров и реакций, поэтому
+    get_top_news_for_period сортировал по случайным близким к нулю числам.
+    Раз в interval секунд берется пачка постов (сначала моложе fresh_hours,
+    затем давно не обновлявшиеся), по каждому каналу запрашиваются
+    get_messages(ids=[...]) по batch_size штук и все изменения пишутся
+    одним executemany. Каналы с ошибками откладываются с растущей паузой.
+    Кэшированные дайджесты с обновленными каналами помечаются устаревшими.
+    """
+
+    def __init__(self, telegram_monitor, database, settings: Optional[Dict[str, Any]] = None):
+        self.telegram_monitor = telegram_monitor
+        self.database = database
+        self.vladivostok_tz = pytz.timezone("Asia/Vladivostok")
+
+        settings = settings or {}
+        self.interval = float(settings.get('interval', 600))
+        self.fresh_hours = float(settings.get('fresh_hours', 48))
+        self.fresh_refresh_minutes = int(settings.get('fresh_refresh_minutes', 30))
+        self.max_age_days = float(settings.get('max_age_days', 14))
+        self.stale_refresh_minutes = int(settings.get('stale_refresh_minutes', 360))
+        self.batch_size = min(100, int(settings.get('batch_size', 100)))
+        self.max_messages = int(settings.get('max_messages_per_pass', 2000))
+        self.max_backoff = float(settings.get('max_backoff', 3600))
+        self.bucket = TokenBucket(float(settings.get('calls_per_minute', 30)))
+
+        self._task: Optional[asyncio.Task] = None
+        # username -> (число ошибок подряд, когда можно повторить)
+        self._backoff: Dict[str, Tuple[int, float]] = {}
+
+        self.passes = 0
+        self.refreshed = 0
+        self.requests = 0
+        self.last_pass_seconds: Optional[float] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"📈 Обновление статистики постов запущено (раз в {self.interval:.0f} с)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh_once()
+            except Exception as e:
+                logger.error(f"❌ Ошибка обновления статистики постов: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def refresh_once(self) -> int:
+        """Один проход обновления. Возвращает число обновленных постов"""
+        client = getattr(self.telegram_monitor, 'client', None)
+        if not client or not client.is_connected():
+            return 0
+
+        now = datetime.now(self.vladivostok_tz).replace(microsecond=0)
+        rows = await self.database.get_messages_for_engagement_refresh(
+            oldest=(now - timedelta(days=self.max_age_days)).isoformat(sep=' '),
+            fresh_since=(now - timedelta(hours=self.fresh_hours)).isoformat(sep=' '),
+            fresh_minutes=self.fresh_refresh_minutes,
+            stale_minutes=self.stale_refresh_minutes,
+            limit=self.max_messages
+        )
+        if not rows:
+            return 0
+
+        started = time.monotonic()
+        by_channel: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for row in rows:
+            by_channel[row['channel_username'].lstrip('@')].append(row)
+
+        updates: List[tuple] = []
+        refreshed_channels = set()
+        for username, channel_rows in by_channel.items():
+            if not self._may_retry(username):
+                continue
+            try:
+                updates.extend(await self._refresh_channel(username, channel_rows))
+                refreshed_channels.add(username)
+                self._backoff.pop(username, None)
+            except FloodWaitError as e:
+                # Общий лимит аккаунта - дальше в этом проходе не идем
+                logger.warning(f"⏳ FloodWait {e.seconds} с при обновлении статистики, прерываем проход")
+                self._defer(username, e.seconds)
+                break
+            except Exception as e:
+                self._defer(username)
+                logger.warning(f"⚠️ Статистика @{username} не обновлена: {e}")
+
+        written = await self.database.update_engagement_batch(updates)
+        if written:
+            # Рейтинг каналов мог измениться - кэшированные дайджесты с ними пересчитаются
+            await self.database.invalidate_digest_cache(list(refreshed_channels))
+        self.passes += 1
+        self.refreshed += written
+        self.last_pass_seconds = time.monotonic() - started
+        logger.info(
+            f"📈 Статистика обновлена: {written} постов из {len(by_channel)} каналов "
+            f"за {self.last_pass_seconds:.1f} с"
+        )
+        return written
+
+    async def _refresh_channel(self, username: str, rows: List[Dict[str, Any]]) -> List[tuple]:
+        entity = await self.telegram_monitor.get_channel_entity(username)
+        if not entity:
+            raise ValueError("канал недоступен")
+
+        updates = []
+        for start in range(0, len(rows), self.batch_size):
+            chunk = rows[start:start + self.batch_size]
+            await self.bucket.acquire()
+            self.requests += 1
+            # Один запрос channels.getMessages на пачку id
+            messages = await self.telegram_monitor.client.get_messages(
+                entity, ids=[row['message_id'] for row in chunk]
+            )
+            for row, message in zip(chunk, messages):
+                updates.append(self._engagement_row(row['id'], message))
+        return updates
+
+    @staticmethod
+    def _engagement_row(row_id: str, message) -> tuple:
+        if message is None:
+            # Пост удален - статистику не трогаем, но отмечаем проверку
+            return (None, None, None, None, row_id)
+
+        replies = message.replies.replies if getattr(message, 'replies', None) else 0
+        reactions_count = 0
+        if getattr(message, 'reactions', None):
+            reactions_count = sum(reaction.count for reaction in message.reactions.results)
+        return (
+            getattr(message, 'views', 0) or 0,
+            getattr(message, 'forwards', 0) or 0,
+            replies or 0,
+            reactions_count,
+            row_id,
+        )
+
+    def _may_retry(self, username: str) -> bool:
+        state = self._backoff.get(username)
+        return state is None or time.monotonic() >= state[1]
+
+    def _defer(self, username: str, seconds: Optional[float] = None):
+        failures = self._backoff.get(username, (0, 0.0))[0] + 1
+        if seconds is None:
+            seconds = min(self.max_backoff, self.interval * 2 ** (failures - 1))
+        self._backoff[username] = (failures, time.monotonic() + seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'passes': self.passes,
+            'refreshed': self.refreshed,
+            'requests': self.requests,
+            'deferred_channels': len(self._backoff),
+            'last_pass_seconds': round(self.last_pass_seconds, 1) if self.last_pass_seconds is not None else None,
+        }
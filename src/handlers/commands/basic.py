@@ -68,6 +68,7 @@ class BasicCommands:
             "• ➕ Добавить канал - помощь по добавлению\n"
             "• 📡 Принудительная подписка - подключить каналы\n"
             "• 📰 Дайджест - топ новостей за период\n"
+            "• /trends [регион] - слова, которые резко чаще обычного\n"
             "<b>💡 Примеры добавления каналов:</b>\n"
             "• <code>/add_channel https://t.me/news_channel</code>\n"
             "• <code>https://t.me/news_channel</code> (просто ссылка)\n"
@@ -295,9 +296,12 @@ class BasicCommands:
                     from src.digest_generator import DigestGenerator
                     # Передаем как database, так и telegram_monitor
                     telegram_monitor = getattr(self.bot.monitor_bot, 'telegram_monitor', None)
+                    config_loader = getattr(self.bot.monitor_bot, 'config_loader', None)
+                    digest_settings = config_loader.get_digest_settings() if config_loader else None
                     self.digest_generator = DigestGenerator(
                         self.bot.monitor_bot.database, 
-                        telegram_monitor
+                        telegram_monitor,
+                        digest_settings
                     )
                     logger.info("✅ Генератор дайджестов инициализирован успешно с telegram_monitor")
                 else:
@@ -381,7 +385,8 @@ class BasicCommands:
             logger.error(f"❌ Ошибка команды digest: {e}")
             await self.bot.send_message(f"❌ Ошибка генерации дайджеста: {e}")
 
-    async def generate_digest_for_channel(self, channel: Optional[str], days: int = 7) -> str:
+    async def generate_digest_for_channel(self, channel: Optional[str], days: int = 7, chat_id: Optional[int] = None,
+                                          use_cache: bool = True) -> str:
         """Генерация дайджеста для конкретного канала"""
         try:
             if not self.digest_generator:
@@ -396,7 +401,10 @@ class BasicCommands:
                 digest_result = await self.digest_generator.generate_channel_digest_live(
                     channel_username=channel,
                     days=days,
-                    limit=10
+                    limit=10,
+                    chat_id=chat_id,
+                    use_cache=use_cache,
+                    progress=self._digest_progress(chat_id)
                 )
             else:
                 # Если канал не указан, используем старый метод с базой данных
@@ -412,6 +420,40 @@ class BasicCommands:
             logger.error(f"❌ Ошибка генерации дайджеста для канала {channel}: {e}")
             return f"❌ Не удалось сгенерировать дайджест: {e}"
 
+    async def generate_digest_for_region(self, region_key: str, days: int = 7, chat_id: Optional[int] = None,
+                                         use_cache: bool = True):
+        """Live-дайджест всех каналов региона (параллельное чтение с прогрессом)"""
+        try:
+            if not self.digest_generator:
+                self._init_digest_generator()
+            
+            if not self.digest_generator:
+                return "❌ Генератор дайджестов недоступен"
+            
+            logger.info(f"📰 Генерируем live дайджест для региона {region_key}")
+            return await self.digest_generator.generate_region_digest_live(
+                region_key=region_key,
+                days=days,
+                limit=10,
+                progress=self._digest_progress(chat_id),
+                chat_id=chat_id,
+                use_cache=use_cache
+            )
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка генерации дайджеста для региона {region_key}: {e}")
+            return f"❌ Не удалось сгенерировать дайджест: {e}"
+
+    def _digest_progress(self, chat_id: Optional[int]):
+        """Ход чтения каналов -> сообщение фоновой задачи чата (правки не чаще раза в несколько секунд)"""
+        if not chat_id:
+            return None
+        
+        async def progress(text: str):
+            await self.bot.background_tasks.report_progress(chat_id, text)
+        
+        return progress
+
     async def handle_channel_link_for_digest(self, message: Dict[str, Any]) -> bool:
         """Обработка ссылки на канал для дайджеста"""
         try:
@@ -431,12 +473,13 @@ class BasicCommands:
             
             # Используем сохраненный период из команды digest
             days = getattr(self.bot, 'digest_days', 7)
-            digest_result = await self.generate_digest_for_channel(channel_username, days)
+            chat_id = message.get("chat", {}).get("id")
+            digest_result = await self.generate_digest_for_channel(channel_username, days, chat_id)
             
             # Обрабатываем результат с пагинацией
             if isinstance(digest_result, dict):
-                # Новый формат с пагинацией - используем inline кнопки
-                await self.bot.send_message_with_keyboard(digest_result['text'], digest_result['keyboard'], use_reply_keyboard=False)
+                # Новый формат с пагинацией - используем inline кнопки (страницы листаются в этом же чате)
+                await self.bot.send_message_with_keyboard(digest_result['text'], digest_result['keyboard'], use_reply_keyboard=False, to_user=chat_id)
             else:
                 # Старый формат (строка) - добавляем базовые кнопки как inline
                 keyboard = [
@@ -478,6 +521,28 @@ class BasicCommands:
             logger.error(f"❌ Ошибка парсинга ссылки: {e}")
             return None
 
+    async def trends(self, message: Optional[Dict[str, Any]]) -> None:
+        """Всплески слов по регионам за последнее окно"""
+        chat_id = (message or {}).get("chat", {}).get("id")
+        detector = getattr(self.bot.monitor_bot, 'trends', None) if self.bot.monitor_bot else None
+        if not detector:
+            await self.bot.send_message("📈 Поиск трендов выключен (trends.enabled в config.yaml)", to_user=chat_id)
+            return
+
+        from src.monitoring.trends import format_trends
+        command_text = message.get("text", "") if message else ""
+        params = command_text.split()[1:]
+        region = params[0].lower() if params else None
+
+        regions_config = self.bot.monitor_bot.config_loader.get_regions_config() or {}
+        region_names = {key: data.get('name', key) for key, data in regions_config.items() if isinstance(data, dict)}
+        text = format_trends(
+            detector.top(region), region_names, int(detector.window_seconds // 60)
+        )
+        if region and detector.is_warming_up(region):
+            text += "\n\n⏳ Базовая линия еще набирается - всплески могут быть неточными"
+        await self.bot.send_message(text, to_user=chat_id)
+
     async def topic_id(self, message: Optional[Dict[str, Any]]) -> None:
         chat = message.get("chat", {}) if message else {}
         chat_type = chat.get("type")
@@ -58,8 +58,6 @@ class ChannelCommands:
             failed_count = 0
             rate_limited_count = 0
 
-            from telethon.tl.functions.channels import JoinChannelRequest
-
             for i, channel_config in enumerate(all_channels, 1):
                 try:
                     username = channel_config.get("username", "")
@@ -77,7 +75,7 @@ class ChannelCommands:
                         self.bot.main_instance.add_channel_to_cache(username)
                     else:
                         try:
-                            await self.bot.main_instance.telegram_monitor.client(JoinChannelRequest(entity))
+                            await self.bot.main_instance.telegram_monitor.join_channel(entity)
                             success_count += 1
                             self.bot.main_instance.add_channel_to_cache(username)
                             await asyncio.sleep(3)
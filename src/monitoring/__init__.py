@@ -1,9 +1,21 @@
 from .subscription_cache import SubscriptionCacheManager
+from .membership import MembershipTracker
 from .channel_monitor import ChannelMonitor
 from .message_processor import MessageProcessor
+from .dedup import NearDuplicateDetector
+from .connection_supervisor import ConnectionSupervisor
+from .poll_scheduler import PollScheduler
+from .trends import TrendDetector
+from .incidents import IncidentClusterer
 
 __all__ = [
     "SubscriptionCacheManager",
+    "MembershipTracker",
     "ChannelMonitor", 
     "MessageProcessor",
+    "NearDuplicateDetector",
+    "ConnectionSupervisor",
+    "PollScheduler",
+    "TrendDetector",
+    "IncidentClusterer",
 ]
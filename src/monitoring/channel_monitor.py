@@ -19,6 +19,9 @@ class ChannelMonitor:
         self.subscription_cache = subscription_cache
         self.message_processor = message_processor
         self.channels_config_path = "config/channels_config.yaml"
+        self.monitored_channels: List = []
+        # Каналы без обработчика реального времени - их опрашивает PollScheduler
+        self.polled_channels: List[Dict[str, Any]] = []
         
         # ⏱️ НАСТРОЙКИ ТАЙМАУТОВ (загружаются из конфигурации или используются по умолчанию)
         if config_loader:
@@ -79,12 +82,21 @@ class ChannelMonitor:
         monitored_channels = await self._subscribe_to_channels(all_channels)
         
         if monitored_channels:
+            self.monitored_channels = monitored_channels
             self.telegram_monitor.client.add_event_handler(
                 self.message_processor.handle_new_message,
                 events.NewMessage(chats=monitored_channels)
             )
             logger.info(f"⚡ Настроен мониторинг {len(monitored_channels)} каналов в реальном времени!")
         
+        monitored = {username.lower() for username in self.monitored_usernames()}
+        self.polled_channels = [
+            channel for channel in all_channels
+            if channel.get('poll') or channel['username'].lstrip('@').lower() not in monitored
+        ]
+        if self.polled_channels:
+            logger.info(f"📡 Каналов без push-обновлений (будут опрашиваться): {len(self.polled_channels)}")
+        
         await self._test_telethon_client()
         
         rate_limited_channels = getattr(self, '_rate_limited_channels', [])
@@ -198,8 +210,6 @@ class ChannelMonitor:
 
     async def _slow_process_new_channels(self, new_channels: List[Dict[str, Any]]) -> Tuple[List, List[Dict[str, Any]]]:
         """🐌 МЕДЛЕННАЯ обработка новых каналов с безопасными задержками"""
-        from telethon.tl.functions.channels import JoinChannelRequest
-        
         if not new_channels:
             logger.info("✅ Новых каналов нет - пропускаем медленную обработку")
             return [], []
@@ -245,7 +255,7 @@ class ChannelMonitor:
 
                     try:
                         logger.info(f"🚀 Попытка подписки на канал: @{username}")
-                        await self.telegram_monitor.client(JoinChannelRequest(entity))
+                        await self.telegram_monitor.join_channel(entity)
                         
                         verification_attempts = 3
                         for attempt in range(verification_attempts):
@@ -358,8 +368,6 @@ class ChannelMonitor:
         logger.info(f"🔄 Повторная попытка подписки на {len(rate_limited_channels)} каналов с rate limit через {self.delay_retry_wait//60} минут...")
         await asyncio.sleep(self.delay_retry_wait)
         
-        from telethon.tl.functions.channels import JoinChannelRequest
-        
         success_retry = 0
         failed_retry = 0
         
@@ -371,7 +379,7 @@ class ChannelMonitor:
                     continue
                 
                 logger.info(f"🔄 Повторная попытка подписки на @{username}")
-                await self.telegram_monitor.client(JoinChannelRequest(entity))
+                await self.telegram_monitor.join_channel(entity)
                 
                 await asyncio.sleep(self.delay_retry_subscribe)
                 
@@ -421,6 +429,23 @@ class ChannelMonitor:
             logger.error(f"❌ Ошибка добавления канала: {e}")
             return False
 
+    async def poll_channel(self, username: str) -> int:
+        """Опросить канал и пропустить новые посты через обычный конвейер.
+        Возвращает число постов новее водяного знака"""
+        entity = await self.telegram_monitor.get_channel_entity(username)
+        if not entity:
+            return 0
+        
+        messages = await self.telegram_monitor.fetch_new_messages(entity, username, limit=50)
+        # fetch_new_messages отдает от старых к новым; водяной знак двигает обработка поста
+        for message in messages:
+            await self.message_processor.process_message(message, username.lstrip('@'), catch_up=True)
+        return len(messages)
+
+    def monitored_usernames(self) -> List[str]:
+        """Username каналов, на которые подписан обработчик реального времени"""
+        return [entity.username for entity in self.monitored_channels if getattr(entity, 'username', None)]
+
     def get_monitoring_stats(self) -> Dict[str, Any]:
         return {
             'subscription_cache': self.subscription_cache.get_cache_stats(),
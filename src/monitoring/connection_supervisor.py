@@ -0,0 +1,172 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+from loguru import logger
+
+if TYPE_CHECKING:
+    from ..telegram_client import TelegramMonitor
+    from .channel_monitor import ChannelMonitor
+    from .message_processor import MessageProcessor
+
+
+class ConnectionSupervisor:
+    """Переподключение Telethon-клиента и догрузка пропущенных постов
+
+    Клиент создается с auto_reconnect=False, поэтому client.disconnected
+    завершается при любом разрыве. Супервизор переподключается с экспоненциальной
+    задержкой и затем по каждому каналу забирает посты новее последнего
+    обработанного id (channel_checks.last_message_id): самые свежие, не старше
+    catch_up_max_age. Догруженные посты идут через обычный конвейер
+    MessageProcessor в порядке публикации.
+    """
+
+    def __init__(self, telegram_monitor: "TelegramMonitor", channel_monitor: "ChannelMonitor",
+                 message_processor: "MessageProcessor", settings: Dict[str, Any]):
+        self.telegram_monitor = telegram_monitor
+        self.channel_monitor = channel_monitor
+        self.message_processor = message_processor
+
+        self.initial_delay = float(settings.get('initial_delay', 1))
+        self.max_delay = float(settings.get('max_delay', 300))
+        self.catch_up_enabled = settings.get('catch_up', True)
+        self.catch_up_limit = int(settings.get('catch_up_limit', 50))
+        self.catch_up_max_age = timedelta(minutes=float(settings.get('catch_up_max_age_minutes', 180)))
+        self.catch_up_concurrency = int(settings.get('catch_up_concurrency', 3))
+
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self.reconnects = 0
+        self.caught_up = 0
+        self.last_outage: Optional[float] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._task = asyncio.create_task(self._supervise())
+            logger.info("🔌 Наблюдение за подключением Telethon запущено")
+
+    async def stop(self):
+        """Остановить наблюдение (до отключения клиента при завершении)"""
+        self._stopping = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _supervise(self):
+        while not self._stopping:
+            client = self.telegram_monitor.client
+            if client.is_connected():
+                # Future завершается в момент разрыва - без периодического опроса
+                try:
+                    await client.disconnected
+                except Exception as e:
+                    logger.debug(f"🔌 Соединение завершилось с ошибкой: {e}")
+                if self._stopping:
+                    return
+
+            started = time.monotonic()
+            logger.warning("🔌 Разрыв соединения Telethon-клиента, переподключаемся...")
+            await self._reconnect()
+            self.reconnects += 1
+            self.last_outage = time.monotonic() - started
+            logger.success(f"🔌 Соединение восстановлено через {self.last_outage:.0f} с")
+
+            if self.catch_up_enabled:
+                try:
+                    await self.catch_up()
+                except Exception as e:
+                    logger.error(f"❌ Ошибка догрузки пропущенных постов: {e}")
+
+    async def _reconnect(self):
+        delay = self.initial_delay
+        attempt = 0
+        while not self._stopping:
+            attempt += 1
+            try:
+                await self.telegram_monitor.client.connect()
+                if self.telegram_monitor.client.is_connected():
+                    return
+            except Exception as e:
+                logger.error(f"❌ Попытка переподключения {attempt} не удалась: {e}")
+
+            # Разброс ±20%, чтобы не долбить сервер синхронно с другими клиентами
+            wait = delay * random.uniform(0.8, 1.2)
+            logger.info(f"⏳ Следующая попытка через {wait:.0f} с")
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, self.max_delay)
+
+    async def catch_up(self) -> int:
+        """Догрузить посты, вышедшие за время разрыва. Возвращает их число"""
+        channels = self.channel_monitor.monitored_usernames()
+        if not channels:
+            return 0
+
+        watermarks = dict(await self.telegram_monitor.get_watermarks())
+        semaphore = asyncio.Semaphore(self.catch_up_concurrency)
+        cutoff = datetime.now(timezone.utc) - self.catch_up_max_age
+
+        async def catch_up_channel(username: str) -> int:
+            last_id = watermarks.get(self.telegram_monitor.watermark_key(username))
+            if not last_id:
+                # Канал еще ничего не присылал - точки отсчета нет
+                return 0
+            async with semaphore:
+                return await self._catch_up_channel(username, last_id, cutoff)
+
+        results = await asyncio.gather(
+            *(catch_up_channel(username) for username in channels), return_exceptions=True
+        )
+        total = 0
+        for username, result in zip(channels, results):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Догрузка @{username} не удалась: {result}")
+            else:
+                total += result
+
+        self.caught_up += total
+        logger.info(f"📥 Догрузка после разрыва: {total} постов из {len(channels)} каналов")
+        return total
+
+    async def _catch_up_channel(self, username: str, last_id: int, cutoff: datetime) -> int:
+        entity = await self.telegram_monitor.get_channel_entity(username)
+        if not entity:
+            return 0
+
+        messages: List[Any] = []
+        # От новых к старым до водяного знака: при долгом разрыве важнее свежие посты
+        async for message in self.telegram_monitor.client.iter_messages(
+            entity, min_id=last_id, limit=self.catch_up_limit
+        ):
+            if message.date and message.date < cutoff:
+                break
+            messages.append(message)
+
+        if len(messages) >= self.catch_up_limit:
+            logger.warning(
+                f"⚠️ @{username}: пропущено больше {self.catch_up_limit} постов, "
+                f"догружаем последние, более старые отброшены"
+            )
+
+        processed = 0
+        # Обрабатываем в порядке публикации
+        for message in reversed(messages):
+            if await self.message_processor.process_message(message, username, catch_up=True):
+                processed += 1
+        if processed:
+            logger.info(f"📥 @{username}: догружено {processed} постов после id {last_id}")
+        return processed
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'connected': bool(self.telegram_monitor.client and self.telegram_monitor.client.is_connected()),
+            'reconnects': self.reconnects,
+            'caught_up': self.caught_up,
+            'last_outage': round(self.last_outage, 1) if self.last_outage is not None else None,
+        }
@@ -0,0 +1,282 @@
+import hashlib
+import re
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, TYPE_CHECKING
+from loguru import logger
+
+if TYPE_CHECKING:
+    from ..database import DatabaseManager
+
+
+_LINK_RE = re.compile(r'https?://\S+|t\.me/\S+|@\w+')
+_WORD_RE = re.compile(r'\w+')
+
+FINGERPRINT_BITS = 64
+
+# Счетчики единиц по 64 битам считаются одним длинным целым: каждый бит
+# хэша «раздвигается» в свою 16-битную ячейку, и хэши просто складываются.
+# Таблицы - на каждый байт хэша, уже со сдвигом на его позицию.
+_LANE_BITS = 16
+
+
+def _spread_byte(value: int) -> int:
+    spread = 0
+    for bit in range(8):
+        if value >> bit & 1:
+            spread |= 1 << (bit * _LANE_BITS)
+    return spread
+
+
+_SPREAD_TABLES = [
+    [_spread_byte(value) << (position * 8 * _LANE_BITS) for value in range(256)]
+    for position in range(8)
+]
+
+
+def normalize_tokens(text: str) -> List[str]:
+    """Слова текста без ссылок, упоминаний, пунктуации и регистра"""
+    if not text:
+        return []
+    text = _LINK_RE.sub(' ', text.lower().replace('ё', 'е'))
+    return [token for token in _WORD_RE.findall(text) if len(token) > 1 or token.isdigit()]
+
+
+def simhash(tokens: List[str], shingle_size: int = 2) -> int:
+    """SimHash по шинглам из shingle_size слов"""
+    if len(tokens) >= shingle_size:
+        shingles = {' '.join(tokens[i:i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)}
+    else:
+        shingles = set(tokens)
+    if not shingles:
+        return 0
+
+    t0, t1, t2, t3, t4, t5, t6, t7 = _SPREAD_TABLES
+    total = 0
+    for shingle in shingles:
+        d = hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest()
+        total += t0[d[0]] + t1[d[1]] + t2[d[2]] + t3[d[3]] + t4[d[4]] + t5[d[5]] + t6[d[6]] + t7[d[7]]
+
+    # Пост ограничен 4096 символами - 16-битные ячейки не переполняются
+    counts = memoryview(total.to_bytes(FINGERPRINT_BITS * _LANE_BITS // 8, 'little')).cast('H')
+    half = len(shingles) / 2
+    fingerprint = 0
+    for bit, count in enumerate(counts):
+        if count > half:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming(a: int, b: int) -> int:
+    # int.bit_count появился только в Python 3.10
+    return bin(a ^ b).count("1")
+
+
+def to_signed64(value: int) -> int:
+    """SQLite INTEGER знаковый - храним отпечаток в дополнительном коде"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def from_signed64(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+class DuplicateCluster:
+    """Первая копия поста и каналы, где вышел тот же текст"""
+
+    __slots__ = ("fingerprint", "channel_username", "message_id", "url", "created_at",
+                 "also_in", "sent_refs", "row_id")
+
+    def __init__(self, fingerprint: int, channel_username: str, message_id: int, url: str,
+                 created_at: float, also_in: Optional[List[str]] = None,
+                 sent_refs: Optional[List[Dict[str, Any]]] = None, row_id: Optional[int] = None):
+        self.fingerprint = fingerprint
+        self.channel_username = channel_username
+        self.message_id = message_id
+        self.url = url
+        self.created_at = created_at
+        self.also_in = also_in or []
+        self.sent_refs = sent_refs or []
+        self.row_id = row_id
+
+
+class NearDuplicateIndex:
+    """Индекс SimHash-отпечатков с поиском по полосам (LSH) в окне времени
+
+    64 бита делятся на max_distance + 1 полос: при расстоянии Хэмминга
+    не больше max_distance хотя бы одна полоса совпадает точно.
+    """
+
+    def __init__(self, max_distance: int = 8, window_seconds: float = 6 * 3600):
+        self.max_distance = max_distance
+        self.window_seconds = window_seconds
+        bands = max_distance + 1
+        width = FINGERPRINT_BITS // bands
+        self._bands = [(i * width, width if i < bands - 1 else FINGERPRINT_BITS - i * width) for i in range(bands)]
+        self._buckets: List[Dict[int, List[DuplicateCluster]]] = [{} for _ in self._bands]
+        self._order: Deque[DuplicateCluster] = deque()
+
+    def _band_keys(self, fingerprint: int):
+        for shift, width in self._bands:
+            yield (fingerprint >> shift) & ((1 << width) - 1)
+
+    def find(self, fingerprint: int) -> Optional[DuplicateCluster]:
+        best = None
+        best_distance = self.max_distance + 1
+        for buckets, key in zip(self._buckets, self._band_keys(fingerprint)):
+            for cluster in buckets.get(key, ()):
+                distance = hamming(cluster.fingerprint, fingerprint)
+                if distance < best_distance:
+                    best, best_distance = cluster, distance
+        return best
+
+    def add(self, cluster: DuplicateCluster):
+        for buckets, key in zip(self._buckets, self._band_keys(cluster.fingerprint)):
+            buckets.setdefault(key, []).append(cluster)
+        self._order.append(cluster)
+
+    def remove(self, cluster: DuplicateCluster):
+        try:
+            self._order.remove(cluster)
+        except ValueError:
+            return
+        self._unlink(cluster)
+
+    def prune(self, now: Optional[float] = None):
+        cutoff = (now or time.time()) - self.window_seconds
+        while self._order and self._order[0].created_at < cutoff:
+            self._unlink(self._order.popleft())
+
+    def _unlink(self, cluster: DuplicateCluster):
+        for buckets, key in zip(self._buckets, self._band_keys(cluster.fingerprint)):
+            bucket = buckets.get(key)
+            if bucket:
+                try:
+                    bucket.remove(cluster)
+                except ValueError:
+                    pass
+                if not bucket:
+                    del buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+
+# Вызывается, когда у уже доставленного поста появились новые копии
+ClusterUpdate = Callable[[DuplicateCluster], Awaitable[None]]
+
+
+class NearDuplicateDetector:
+    """Склейка перепостов одного текста из разных каналов
+
+    Первая копия доставляется, остальные не отправляются - вместо этого
+    к первой дописывается «Также в @x, @y». Индекс держится в памяти и
+    дублируется в SQLite, чтобы пережить перезапуск. Пока первая копия
+    отправляется, ее кластер есть только в памяти: в базу он попадает
+    после доставки, а при неудаче удаляется - и следующая копия уходит.
+    """
+
+    def __init__(self, database: Optional["DatabaseManager"], settings: Dict[str, Any],
+                 on_cluster_update: Optional[ClusterUpdate] = None):
+        self.database = database
+        self.min_tokens = int(settings.get('min_tokens', 12))
+        self.shingle_size = int(settings.get('shingle_size', 2))
+        self.index = NearDuplicateIndex(
+            max_distance=int(settings.get('max_distance', 8)),
+            window_seconds=float(settings.get('window_hours', 6)) * 3600
+        )
+        self.on_cluster_update = on_cluster_update
+
+        self.checked = 0
+        self.duplicates = 0
+
+    async def load(self):
+        """Восстановить окно отпечатков из базы"""
+        if not self.database:
+            return
+        since = time.time() - self.index.window_seconds
+        rows = await self.database.get_recent_near_duplicates(since)
+        for row in rows:
+            self.index.add(DuplicateCluster(
+                from_signed64(row['simhash']), row['channel_username'], row['message_id'], row['url'],
+                row['created_at'], row['also_in'], row['sent_refs'], row['id']
+            ))
+        if rows:
+            logger.info(f"🧬 Загружено {len(rows)} отпечатков для поиска дублей")
+
+    def fingerprint(self, text: str) -> Optional[int]:
+        tokens = normalize_tokens(text)
+        # Короткие посты («Фото», «Подробности позже») слишком легко совпадают
+        if len(tokens) < self.min_tokens:
+            return None
+        return simhash(tokens, self.shingle_size)
+
+    async def check(self, message_data: Dict[str, Any], text: str) -> Optional[DuplicateCluster]:
+        """Вернуть кластер первой копии, если это перепост; иначе запомнить пост"""
+        fingerprint = self.fingerprint(text)
+        if fingerprint is None:
+            return None
+
+        self.checked += 1
+        now = time.time()
+        self.index.prune(now)
+
+        cluster = self.index.find(fingerprint)
+        if cluster:
+            self.duplicates += 1
+            channel = message_data['channel_username']
+            if channel != cluster.channel_username and channel not in cluster.also_in:
+                cluster.also_in.append(channel)
+                if cluster.row_id is not None:
+                    await self._persist(cluster)
+                if cluster.sent_refs and self.on_cluster_update:
+                    await self.on_cluster_update(cluster)
+            logger.info(f"🧬 @{channel}/{message_data.get('message_id')} - копия поста {cluster.url}, не отправляем")
+            return cluster
+
+        cluster = DuplicateCluster(
+            fingerprint, message_data['channel_username'], message_data.get('message_id'),
+            message_data.get('url', ''), now
+        )
+        # В базу - только после доставки (mark_delivered)
+        self.index.add(cluster)
+        message_data['dup_cluster'] = cluster
+        return None
+
+    async def mark_delivered(self, message_data: Dict[str, Any]):
+        """Первая копия доставлена: сохранить кластер и отправленные сообщения (для последующих правок)"""
+        cluster = message_data.get('dup_cluster')
+        if not cluster:
+            return
+        refs = message_data.get('sent_refs')
+        if refs:
+            cluster.sent_refs = refs
+        await self._persist(cluster)
+        # Копии могли прийти, пока первая еще отправлялась
+        if refs and cluster.also_in and self.on_cluster_update:
+            await self.on_cluster_update(cluster)
+
+    def discard(self, message_data: Dict[str, Any]):
+        """Первая копия не доставлена: убрать кластер, чтобы следующую копию отправили"""
+        cluster = message_data.pop('dup_cluster', None)
+        if cluster:
+            self.index.remove(cluster)
+
+    async def _persist(self, cluster: DuplicateCluster):
+        if not self.database:
+            return
+        if cluster.row_id is None:
+            cluster.row_id = await self.database.save_near_duplicate(
+                to_signed64(cluster.fingerprint), cluster.channel_username, cluster.message_id,
+                cluster.url, cluster.created_at
+            )
+            if cluster.row_id is None or not (cluster.also_in or cluster.sent_refs):
+                return
+        await self.database.update_near_duplicate(cluster.row_id, cluster.also_in, cluster.sent_refs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'indexed': len(self.index),
+            'checked': self.checked,
+            'duplicates': self.duplicates,
+        }
@@ -0,0 +1,200 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+from loguru import logger
+
+from .trends import extract_terms, stem
+
+
+class Incident:
+    """Первый алерт о происшествии и каналы, которые сообщили о нем следом"""
+
+    __slots__ = ("region", "category", "channel_username", "message_id", "url", "created_at",
+                 "last_seen", "terms", "sources", "sent_refs", "edit_task")
+
+    def __init__(self, region: str, category: str, channel_username: str, message_id: int,
+                 url: str, terms: Set[str], now: float):
+        self.region = region
+        self.category = category
+        self.channel_username = channel_username
+        self.message_id = message_id
+        self.url = url
+        self.created_at = now
+        self.last_seen = now
+        # Основы слов каждого поста: сравниваем с каждым, а не с объединением,
+        # чтобы длинное происшествие не «притягивало» все подряд
+        self.terms: List[Set[str]] = [terms]
+        self.sources: List[str] = []
+        self.sent_refs: List[Dict[str, Any]] = []
+        self.edit_task: Optional[asyncio.Task] = None
+
+
+# Вызывается, когда к отправленному алерту нужно дописать новые источники
+IncidentUpdate = Callable[[Incident], Awaitable[None]]
+
+
+class IncidentClusterer:
+    """Склейка алертов об одном происшествии из разных каналов
+
+    Пожар или ДТП за несколько минут публикуют пять-шесть каналов региона,
+    и каждый пост раньше уходил отдельным «АЛЕРТ». Теперь алерты группируются
+    по (регион, категория) и пересечению основ слов в окне window_minutes от
+    последнего поста: первый отправляется, остальные не отправляются -
+    к первому дописывается список источников. Правки откладываются на
+    edit_delay_seconds, чтобы всплеск из N постов стоил одной правки, а не N.
+    Если первый алерт не доставлен, происшествие закрывается, и алерт
+    следующего канала уходит как первый.
+    Окно короткое, поэтому происшествия держатся только в памяти.
+    """
+
+    def __init__(self, settings: Dict[str, Any], region_of: Callable[[str], str],
+                 on_update: Optional[IncidentUpdate] = None):
+        self.window_seconds = float(settings.get('window_minutes', 30)) * 60
+        self.max_age_seconds = float(settings.get('max_age_hours', 3)) * 3600
+        self.min_shared_terms = int(settings.get('min_shared_terms', 3))
+        self.min_similarity = float(settings.get('min_similarity', 0.2))
+        self.max_terms = int(settings.get('max_terms_per_post', 60))
+        self.edit_delay = float(settings.get('edit_delay_seconds', 5))
+        self.region_of = region_of
+        self.on_update = on_update
+
+        self._active: Dict[Tuple[str, str], List[Incident]] = {}
+        self._order: Deque[Incident] = deque()
+
+        self.checked = 0
+        self.merged = 0
+        self.edits = 0
+
+    def similarity(self, terms: Set[str], incident: Incident) -> float:
+        """Доля основ нового поста, совпавших с самым похожим постом происшествия"""
+        best = 0.0
+        for member in incident.terms:
+            shared = len(terms & member)
+            if shared >= self.min_shared_terms:
+                best = max(best, shared / min(len(terms), len(member)))
+        return best
+
+    async def check(self, message_data: Dict[str, Any], text: str) -> Optional[Incident]:
+        """Вернуть происшествие, если о нем уже был алерт из другого канала; иначе открыть новое"""
+        category = message_data.get('alert_category')
+        if not category:
+            return None
+
+        terms = set(extract_terms(text, self.max_terms))
+        # Ключевые слова категории есть в каждом ее алерте - сходства они не показывают
+        terms.difference_update(stem(word) for word in message_data.get('alert_words') or ())
+        if len(terms) < self.min_shared_terms:
+            return None
+
+        self.checked += 1
+        now = time.time()
+        self._prune(now)
+
+        channel = message_data['channel_username']
+        key = (self.region_of(channel), category)
+
+        best, best_similarity = None, self.min_similarity
+        for incident in self._active.get(key, ()):
+            # Продолжение от того же канала - его собственное обновление, отправляем
+            if incident.channel_username == channel or not self._is_open(incident, now):
+                continue
+            similarity = self.similarity(terms, incident)
+            if similarity >= best_similarity:
+                best, best_similarity = incident, similarity
+
+        if best:
+            self.merged += 1
+            best.last_seen = now
+            best.terms.append(terms)
+            if channel not in best.sources:
+                best.sources.append(channel)
+                self._schedule_update(best)
+            logger.info(
+                f"🚨 @{channel}/{message_data.get('message_id')} - то же происшествие, что {best.url} "
+                f"(сходство {best_similarity:.2f}), не отправляем"
+            )
+            return best
+
+        incident = Incident(
+            key[0], category, channel, message_data.get('message_id'),
+            message_data.get('url', ''), terms, now
+        )
+        self._active.setdefault(key, []).append(incident)
+        self._order.append(incident)
+        message_data['incident'] = incident
+        return None
+
+    async def mark_delivered(self, message_data: Dict[str, Any]):
+        """Запомнить отправленные сообщения первого алерта (для последующих правок)"""
+        incident = message_data.get('incident')
+        refs = message_data.get('sent_refs')
+        if not incident or not refs:
+            return
+        incident.sent_refs = refs
+        # Источники могли прийти, пока первый алерт еще отправлялся
+        if incident.sources:
+            self._schedule_update(incident)
+
+    def discard(self, message_data: Dict[str, Any]):
+        """Первый алерт не доставлен: закрыть происшествие, чтобы следующий алерт отправили"""
+        incident = message_data.pop('incident', None)
+        if not incident:
+            return
+        bucket = self._active.get((incident.region, incident.category))
+        if bucket and incident in bucket:
+            bucket.remove(incident)
+            if not bucket:
+                del self._active[(incident.region, incident.category)]
+        try:
+            self._order.remove(incident)
+        except ValueError:
+            pass
+
+    def _schedule_update(self, incident: Incident):
+        if not self.on_update or not incident.sent_refs:
+            return
+        if incident.edit_task and not incident.edit_task.done():
+            # Правка уже запланирована - она возьмет и этот источник
+            return
+        incident.edit_task = asyncio.create_task(self._apply_update(incident))
+
+    async def _apply_update(self, incident: Incident):
+        rendered = 0
+        # Источники, пришедшие во время правки, не планируют новую (задача еще не завершена) -
+        # после правки проверяем, вырос ли список, и правим еще раз
+        while len(incident.sources) > rendered:
+            await asyncio.sleep(self.edit_delay)
+            rendered = len(incident.sources)
+            try:
+                self.edits += 1
+                await self.on_update(incident)
+            except Exception as e:
+                logger.error(f"❌ Ошибка обновления источников происшествия {incident.url}: {e}")
+                return
+
+    def _is_open(self, incident: Incident, now: float) -> bool:
+        return now - incident.created_at < self.max_age_seconds and now - incident.last_seen < self.window_seconds
+
+    def _prune(self, now: float):
+        # Очередь по времени открытия: старше max_age закрываются в любом случае,
+        # затихшие дольше окна - когда до них дойдет очередь (до тех пор check их пропускает)
+        while self._order:
+            incident = self._order[0]
+            if self._is_open(incident, now):
+                break
+            self._order.popleft()
+            key = (incident.region, incident.category)
+            bucket = self._active.get(key)
+            if bucket:
+                bucket.remove(incident)
+                if not bucket:
+                    del self._active[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'active': len(self._order),
+            'checked': self.checked,
+            'merged': self.merged,
+            'edits': self.edits,
+        }
@@ -0,0 +1,109 @@
+import os
+import json
+from datetime import datetime
+from typing import Any, Iterable, Optional, Set
+from loguru import logger
+
+
+class MembershipTracker:
+    """Каналы, в которых состоит аккаунт, без периодического обхода диалогов
+
+    Набор id засевается один раз из списка диалогов при первом входе
+    и хранится в JSON; следующие запуски его только загружают, а меняется
+    он по результатам вступления/выхода и по событиям UpdateChannel.
+    Проверка - поиск в множестве.
+    """
+
+    def __init__(self, cache_file: str = "config/membership_cache.json"):
+        self.cache_file = cache_file
+        self.channel_ids: Set[int] = set()
+        self.seeded_at: Optional[str] = None
+
+    @property
+    def is_seeded(self) -> bool:
+        return self.seeded_at is not None
+
+    def load(self):
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.channel_ids = set(data.get('channel_ids', []))
+                self.seeded_at = data.get('seeded_at')
+                logger.info(f"👥 Загружено членство в {len(self.channel_ids)} каналах")
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки членства в каналах: {e}")
+            self.channel_ids = set()
+            self.seeded_at = None
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            data = {
+                'channel_ids': sorted(self.channel_ids),
+                'seeded_at': self.seeded_at,
+                'last_updated': datetime.now().isoformat()
+            }
+            tmp_path = f"{self.cache_file}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.cache_file)
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения членства в каналах: {e}")
+
+    def seed(self, entities: Iterable[Any]):
+        """Засеять из уже полученных диалогов (без отдельного запроса)"""
+        self.channel_ids = {
+            entity.id for entity in entities
+            if getattr(entity, 'broadcast', False) or getattr(entity, 'megagroup', False)
+        }
+        self.seeded_at = datetime.now().isoformat()
+        self.save()
+        logger.info(f"👥 Членство засеяно из диалогов: {len(self.channel_ids)} каналов")
+
+    def is_member(self, entity: Any) -> bool:
+        if entity.id in self.channel_ids:
+            return True
+        if not self.is_seeded:
+            # Без засева опираемся на флаг самой сущности
+            return getattr(entity, 'left', True) is False
+        return False
+
+    def mark_joined(self, channel_id: int):
+        if channel_id not in self.channel_ids:
+            self.channel_ids.add(channel_id)
+            self.save()
+
+    def mark_left(self, channel_id: int):
+        if channel_id in self.channel_ids:
+            self.channel_ids.discard(channel_id)
+            self.save()
+
+    def apply_channel(self, channel: Any):
+        """Учесть актуальное состояние канала (из ответа API или события)"""
+        left = getattr(channel, 'left', None)
+        if left is True:
+            self.mark_left(channel.id)
+        elif left is False:
+            self.mark_joined(channel.id)
+
+    async def on_channel_update(self, event):
+        """Обработчик events.Raw(UpdateChannel): вступление/выход с любого устройства"""
+        update = event
+        channel_id = getattr(update, 'channel_id', None)
+        if channel_id is None:
+            return
+
+        # Telethon кладет сущности из контейнера обновлений в _entities
+        entities = getattr(update, '_entities', None) or {}
+        for entity in entities.values():
+            if getattr(entity, 'id', None) == channel_id:
+                self.apply_channel(entity)
+                return
+
+    def get_stats(self) -> dict:
+        return {
+            'channels': len(self.channel_ids),
+            'seeded_at': self.seeded_at,
+            'cache_file': self.cache_file,
+        }
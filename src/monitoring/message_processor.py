@@ -1,8 +1,9 @@
 import asyncio
 import hashlib
 import pytz
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, Any, Set, TYPE_CHECKING
+from typing import Dict, Any, Set, Tuple, TYPE_CHECKING
 from loguru import logger
 
 if TYPE_CHECKING:
@@ -10,10 +11,13 @@ if TYPE_CHECKING:
 
 
 class MessageProcessor:
+    RECENT_IDS_LIMIT = 5000
+
     def __init__(self, database: "DatabaseManager", app_instance):
         self.database = database
         self.app_instance = app_instance
         self.processed_media_groups: Set[int] = set()
+        self._recent_ids: "OrderedDict[Tuple[str, int], None]" = OrderedDict()
 
     async def handle_new_message(self, event):
         try:
@@ -22,7 +26,6 @@ class MessageProcessor:
                 return
             
             logger.info("🔥 СРАБОТАЛ ОБРАБОТЧИК НОВОГО СООБЩЕНИЯ!")
-            message = event.message
             
             chat = await event.get_chat()
             channel_username = getattr(chat, 'username', None)
@@ -30,6 +33,29 @@ class MessageProcessor:
                 logger.warning(f"⚠️ Сообщение без username канала, пропускаем")
                 return
             
+            await self.process_message(event.message, channel_username)
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка обработки нового сообщения: {e}")
+            logger.exception("Детали ошибки:")
+
+    async def process_message(self, message, channel_username: str, catch_up: bool = False) -> bool:
+        """Обработать пост канала: из обработчика реального времени или догрузки
+        (после разрыва соединения, опрос каналов без push-обновлений).
+        Возвращает True, если пост ушел в отправку"""
+        try:
+            if not self.app_instance.monitoring_active:
+                return False
+            
+            # Догрузка и обработчик могут получить один и тот же пост
+            key = (channel_username, message.id)
+            if key in self._recent_ids:
+                logger.debug(f"⏭️ @{channel_username}/{message.id} уже обработан")
+                return False
+            self._recent_ids[key] = None
+            if len(self._recent_ids) > self.RECENT_IDS_LIMIT:
+                self._recent_ids.popitem(last=False)
+            
             logger.info(f"📥 Получено сообщение от @{channel_username}: {message.text[:100] if message.text else 'без текста'}")
             
             has_text = bool(getattr(message, "text", None))
@@ -42,12 +68,12 @@ class MessageProcessor:
                 if not is_media_group:
                     if has_text and self.app_instance.telegram_monitor.is_spam(message.text):
                         logger.info(f"🚫 Сообщение от @{channel_username} определено как реклама/спам, пропускаем")
-                        return
+                        return False
                 else:
                     grouped_id = message.grouped_id
                     if grouped_id in self.processed_media_groups:
                         logger.info(f"✅ Медиа группа {grouped_id} уже обработана, пропускаем")
-                        return
+                        return False
                     
                     try:
                         entity = await self.app_instance.telegram_monitor.get_channel_entity(channel_username)
@@ -58,31 +84,56 @@ class MessageProcessor:
                             if g_msg.text and self.app_instance.telegram_monitor.is_spam(g_msg.text):
                                 logger.info(f"🚫 Медиа группа {grouped_id} от @{channel_username} определена как реклама/спам, пропускаем")
                                 self.processed_media_groups.add(grouped_id)
-                                return
+                                return False
                     except Exception as e:
                         logger.error(f"❌ Ошибка проверки медиагруппы на спам: {e}")
             
             if not await self._process_media_group(message, has_media):
-                return
+                return False
             
-            if not await self._validate_message_time(message):
-                return
+            # Догрузка берет только посты новее водяного знака - они заведомо позже запуска
+            if not catch_up and not await self._validate_message_time(message):
+                return False
                 
             message_data = self._create_message_data(message, channel_username)
             
+            # Копии тоже считаются: тема, которую подхватили несколько каналов, и есть всплеск
+            trends = getattr(self.app_instance, 'trends', None)
+            if trends and message.text:
+                await trends.add(channel_username, message.text)
+            
+            # Тот же текст уже ушел из другого канала - дописываем источник к первой копии
+            dedup = getattr(self.app_instance, 'dedup', None)
+            if dedup and await dedup.check(message_data, message.text or ''):
+                await self._save_to_database(message_data)
+                await self._update_last_check_time(channel_username, message.id)
+                return False
+            
             message_data = await self._check_alerts(message_data, message.text)
             
-            logger.info(f"⚡ Новое сообщение из @{channel_username} - мгновенная отправка!")
+            # Об этом происшествии уже ушел алерт из другого канала - дописываем источник к нему
+            incidents = getattr(self.app_instance, 'incidents', None)
+            if incidents and message_data['is_alert'] and await incidents.check(message_data, message.text or ''):
+                await self._save_to_database(message_data)
+                await self._update_last_check_time(channel_username, message.id)
+                return False
+            
+            if catch_up:
+                logger.info(f"📥 Сообщение из @{channel_username} получено догрузкой - отправляем")
+            else:
+                logger.info(f"⚡ Новое сообщение из @{channel_username} - мгновенная отправка!")
             
             await self._save_to_database(message_data)
             
             await self._send_message(message_data, has_text, has_media)
             
-            await self._update_last_check_time(channel_username)
+            await self._update_last_check_time(channel_username, message.id)
+            return True
             
         except Exception as e:
-            logger.error(f"❌ Ошибка обработки нового сообщения: {e}")
+            logger.error(f"❌ Ошибка обработки сообщения @{channel_username}/{getattr(message, 'id', '?')}: {e}")
             logger.exception("Детали ошибки:")
+            return False
 
     async def _process_media_group(self, message, has_media: bool) -> bool:
         if has_media and hasattr(message, 'grouped_id') and message.grouped_id:
@@ -165,6 +216,7 @@ class MessageProcessor:
             message_data['text'] = alert_text
             message_data['is_alert'] = True
             message_data['alert_category'] = alert_category
+            message_data['alert_words'] = matched_words
             message_data['alert_priority'] = is_priority
         else:
             message_data['is_alert'] = False
@@ -179,24 +231,80 @@ class MessageProcessor:
             logger.error(f"❌ Ошибка сохранения в БД: {e}")
 
     async def _send_message(self, message_data: Dict[str, Any], has_text: bool, has_media: bool):
+        lanes = getattr(self.app_instance, 'delivery_lanes', None)
+        if not lanes:
+            await self._deliver(message_data, has_text, has_media)
+            return
+        
+        if message_data.get('is_alert') and message_data.get('alert_priority'):
+            lane = "alert"
+        elif has_media:
+            lane = "media"
+        else:
+            lane = "text"
+        
+        label = f"@{message_data['channel_username']}/{message_data.get('message_id')}"
+        # Ключ канала: текст не обгонит более ранний альбом того же канала
+        if not lanes.submit(lane, lambda: self._deliver(message_data, has_text, has_media), label,
+                            key=message_data['channel_username']):
+            await self._report_delivery(message_data, False)
+
+    async def _deliver(self, message_data: Dict[str, Any], has_text: bool, has_media: bool) -> bool:
+        """Отправить пост; True - доставлен. Итог (в том числе отмену по таймауту полосы)
+        узнают склейка дублей и происшествий"""
+        delivered = False
+        try:
+            delivered = await self._send_post(message_data, has_text, has_media)
+        finally:
+            await self._report_delivery(message_data, delivered)
+        return delivered
+
+    async def _send_post(self, message_data: Dict[str, Any], has_text: bool, has_media: bool) -> bool:
         if has_media:
             logger.info(f"📎 Сообщение содержит файлы от @{message_data['channel_username']}")
             media_sent = await self.app_instance.download_and_send_media(message_data)
+            if not media_sent:
+                # Повтор дешевый: уже скачанные файлы берутся из кэша медиа
+                logger.info("🔁 Повторная попытка отправки медиа")
+                await asyncio.sleep(2)
+                media_sent = await self.app_instance.download_and_send_media(message_data)
             if not media_sent:
                 logger.warning("⚠️ Не удалось отправить файлы, отправляем текстовое уведомление")
-                await self.app_instance.send_message_to_target(message_data, is_media=True)
+                return await self.app_instance.send_message_to_target(message_data, is_media=True)
+            return True
         elif not has_text:
             logger.info(f"📄 Сообщение без текста от @{message_data['channel_username']}")
             forwarded = await self.app_instance.forward_original_message(message_data)
             if not forwarded:
-                await self.app_instance.send_message_to_target(message_data, is_media=True)
+                return await self.app_instance.send_message_to_target(message_data, is_media=True)
+            return True
         else:
-            await self.app_instance.send_message_to_target(message_data, is_media=False)
+            return await self.app_instance.send_message_to_target(message_data, is_media=False)
+
+    async def _report_delivery(self, message_data: Dict[str, Any], delivered: bool):
+        dedup = getattr(self.app_instance, 'dedup', None)
+        incidents = getattr(self.app_instance, 'incidents', None)
+        
+        if not delivered:
+            # Пост не ушел - копии и алерты других каналов о том же не должны теряться
+            logger.warning(f"⚠️ @{message_data['channel_username']}/{message_data.get('message_id')} не доставлен")
+            if dedup:
+                dedup.discard(message_data)
+            if incidents:
+                incidents.discard(message_data)
+            return
+        
+        if dedup:
+            await dedup.mark_delivered(message_data)
+        if incidents:
+            await incidents.mark_delivered(message_data)
 
-    async def _update_last_check_time(self, channel_username: str):
+    async def _update_last_check_time(self, channel_username: str, message_id: int = None):
         vladivostok_tz = pytz.timezone('Asia/Vladivostok')
         current_time_vlk = datetime.now(vladivostok_tz)
-        await self.database.update_last_check_time(channel_username, current_time_vlk)
+        if message_id and self.app_instance.telegram_monitor:
+            self.app_instance.telegram_monitor.advance_watermark(channel_username, message_id)
+        await self.database.update_last_check_time(channel_username, current_time_vlk, message_id)
 
     def clear_media_groups_cache(self):
         self.processed_media_groups.clear()
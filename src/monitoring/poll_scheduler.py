@@ -0,0 +1,171 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+
+# username -> число новых постов за опрос
+PollFunc = Callable[[str], Awaitable[int]]
+
+
+class TokenBucket:
+    """Ограничение числа запросов к API в минуту (с запасом на всплеск)"""
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60
+        self.capacity = burst if burst is not None else max(1.0, per_minute / 4)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> float:
+        """Дождаться токена; возвращает время ожидания"""
+        waited = 0.0
+        self._refill()
+        while self.tokens < 1:
+            delay = (1 - self.tokens) / self.rate
+            await asyncio.sleep(delay)
+            waited += delay
+            self._refill()
+        self.tokens -= 1
+        return waited
+
+
+class _ChannelState:
+
+    __slots__ = ("username", "rate", "interval", "last_poll", "polls", "posts")
+
+    def __init__(self, username: str, rate: float, interval: float):
+        self.username = username
+        self.rate = rate                # постов в секунду (сглаженная оценка)
+        self.interval = interval
+        self.last_poll: Optional[float] = None
+        self.polls = 0
+        self.posts = 0
+
+
+class PollScheduler:
+    """Опрос каналов без push-обновлений с частотой по их активности
+
+    Интервал канала - время, за которое в нем в среднем выходит
+    target_posts_per_poll постов, в пределах [min_interval, max_interval].
+    Оценка частоты берется из истории базы и уточняется после каждого
+    опроса. Очередь - куча по времени следующего опроса; все опросы
+    проходят через общий лимит calls_per_minute.
+    """
+
+    def __init__(self, poll: PollFunc, settings: Dict[str, Any]):
+        self.poll = poll
+        self.min_interval = float(settings.get('min_interval', 60))
+        self.max_interval = float(settings.get('max_interval', 1800))
+        self.target_posts = float(settings.get('target_posts_per_poll', 1))
+        self.smoothing = float(settings.get('smoothing', 0.3))
+        self.bucket = TokenBucket(float(settings.get('calls_per_minute', 20)))
+
+        self._channels: Dict[str, _ChannelState] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._counter = itertools.count()
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.budget_wait = 0.0
+
+    def _interval_for(self, rate: float) -> float:
+        if rate <= 0:
+            return self.max_interval
+        return min(self.max_interval, max(self.min_interval, self.target_posts / rate))
+
+    def add_channel(self, username: str, posts_per_hour: float = 0.0):
+        """Включить канал в опрос; первый опрос - с разбросом, чтобы не стартовать все разом"""
+        if username in self._channels:
+            return
+        rate = posts_per_hour / 3600
+        state = _ChannelState(username, rate, self._interval_for(rate))
+        self._channels[username] = state
+        sequence = next(self._counter)
+        first_due = time.monotonic() + (sequence % 10) * self.min_interval / 10
+        heapq.heappush(self._heap, (first_due, sequence, username))
+        self._changed.set()
+
+    def remove_channel(self, username: str):
+        # Запись в куче остается и пропускается при извлечении
+        self._channels.pop(username, None)
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"📡 Опрос каналов без push-обновлений: {len(self._channels)} каналов")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            if not self._heap:
+                self._changed.clear()
+                await self._changed.wait()
+                continue
+
+            due, _, username = self._heap[0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                # Новый канал может оказаться раньше текущей головы кучи
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            state = self._channels.get(username)
+            if state is None:
+                continue
+
+            self.budget_wait += await self.bucket.acquire()
+            new_posts = await self._poll_channel(state)
+            self._update_rate(state, new_posts)
+            heapq.heappush(self._heap, (time.monotonic() + state.interval, next(self._counter), username))
+
+    async def _poll_channel(self, state: _ChannelState) -> int:
+        try:
+            return await self.poll(state.username) or 0
+        except Exception as e:
+            logger.error(f"❌ Ошибка опроса @{state.username}: {e}")
+            return 0
+
+    def _update_rate(self, state: _ChannelState, new_posts: int):
+        now = time.monotonic()
+        if state.last_poll is not None:
+            observed = new_posts / max(1.0, now - state.last_poll)
+            state.rate = self.smoothing * observed + (1 - self.smoothing) * state.rate
+        state.last_poll = now
+        state.polls += 1
+        state.posts += new_posts
+        state.interval = self._interval_for(state.rate)
+
+    def get_stats(self) -> Dict[str, Any]:
+        intervals = [state.interval for state in self._channels.values()]
+        return {
+            'channels': len(self._channels),
+            'polls': sum(state.polls for state in self._channels.values()),
+            'posts': sum(state.posts for state in self._channels.values()),
+            'min_interval': round(min(intervals)) if intervals else 0,
+            'max_interval': round(max(intervals)) if intervals else 0,
+            'budget_wait': round(self.budget_wait, 1),
+        }
@@ -0,0 +1,360 @@
+import math
+import time
+from array import array
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, NamedTuple, Optional, Set, Tuple
+from loguru import logger
+
+from .dedup import normalize_tokens
+
+
+# Служебные слова и подписи каналов - всплесков по ним не ищем
+STOPWORDS = frozenset("""
+без более больше будет будут было быть вам вас ваш ваша ваши весь вот все всего всех всё
+где даже для его ему если есть еще ещё или имени как какие когда кого которая которые
+который которых кто либо между меня мне может можно над надо него нее неё нет них ничего
+однако она они оно очень под после потом почему при про раз свои своих себя сейчас так
+также там тебя тем теперь того тоже только том тут уже хотя чем через что чтобы чуть эта
+эти это этого этой этом этот такой такого такая такие таких такое
+подписаться подписывайтесь подпишись подписка канал канала каналу каналов новости новостей
+новость фото видео читать подробнее источник ссылка реклама сегодня вчера завтра года году
+http https www com
+""".split())
+
+# Окончания для грубого стемминга: «пожара», «пожаре» -> «пожар» (сначала длинные)
+_ENDINGS = (
+    frozenset("иями".split()),
+    frozenset("ями ами ого его ому ему ыми ими иях".split()),
+    frozenset("ях ах ов ев ей ой ий ый ая яя ое ее ые ие ам ям ом ем ую юю ия ии".split()),
+    frozenset("у ю а я о е ы и ь".split()),
+)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def stem(token: str) -> str:
+    # Срез и поиск в множестве на каждую длину окончания - без регулярных выражений
+    for length, endings in zip((4, 3, 2, 1), _ENDINGS):
+        if len(token) - length >= 3 and token[-length:] in endings:
+            return token[:-length]
+    return token
+
+
+def extract_terms(text: str, max_terms: int = 40) -> Dict[str, str]:
+    """Основы слов поста -> словоформа (каждая основа один раз на пост)"""
+    terms: Dict[str, str] = {}
+    for token in normalize_tokens(text):
+        if len(token) < 4 or token.isdigit() or token in STOPWORDS:
+            continue
+        key = stem(token)
+        if key not in terms:
+            terms[key] = token
+            if len(terms) >= max_terms:
+                break
+    return terms
+
+
+class Trend(NamedTuple):
+    term: str           # Словоформа из последнего поста
+    posts: int          # Постов с этим словом в текущем окне
+    expected: float     # Сколько ожидалось по базовой линии
+    score: float        # Сила всплеска (отклонение в стандартных отклонениях Пуассона)
+    channels: int       # В скольких каналах встретилось
+
+
+class CountMinSketch:
+    """Частоты слов в фиксированной памяти (depth x width) с экспоненциальным затуханием
+
+    Счетчики хранятся «раздутыми» на 2^((t - t0) / half_life): добавление
+    и оценка - depth операций без обхода таблицы; раз в долгое время
+    таблица пересчитывается к новому t0, чтобы не переполнить float.
+    """
+
+    def __init__(self, width: int = 4096, depth: int = 4, half_life_seconds: float = 86400,
+                 now: Optional[float] = None):
+        self.width = width
+        self.depth = depth
+        self.half_life = half_life_seconds
+        self.rows = [array('d', bytes(8 * width)) for _ in range(depth)]
+        # Свои коэффициенты хэша на строку: (a*h + b) mod p mod width
+        self.coefficients = [(2 * row + 3, 7 * row + 11) for row in range(depth)]
+        self.t0 = time.time() if now is None else now
+
+    def _indexes(self, term: str):
+        h = hash(term) & 0xFFFFFFFFFFFFFFFF
+        for a, b in self.coefficients:
+            yield (a * h + b) % _MERSENNE_PRIME % self.width
+
+    def add(self, term: str, count: float, now: float):
+        exponent = (now - self.t0) / self.half_life
+        if exponent > 40:
+            self._rebase(now)
+            exponent = 0.0
+        weight = count * 2.0 ** exponent
+        for row, index in zip(self.rows, self._indexes(term)):
+            row[index] += weight
+
+    def estimate(self, term: str, now: float) -> float:
+        value = min(row[index] for row, index in zip(self.rows, self._indexes(term)))
+        return value / 2.0 ** ((now - self.t0) / self.half_life)
+
+    def _rebase(self, now: float):
+        scale = 2.0 ** (-(now - self.t0) / self.half_life)
+        for row in self.rows:
+            for index in range(self.width):
+                row[index] *= scale
+        self.t0 = now
+
+
+class _Bucket:
+    """Сводка одного шага окна: самые частые слова по Misra-Gries (не больше capacity)"""
+
+    __slots__ = ("started", "posts", "counts")
+
+    def __init__(self, started: float):
+        self.started = started
+        self.posts = 0
+        # основа -> [постов, словоформа, каналы]
+        self.counts: Dict[str, List[Any]] = {}
+
+    def add(self, key: str, surface: str, channel: str, capacity: int, max_channels: int):
+        entry = self.counts.get(key)
+        if entry is not None:
+            entry[0] += 1
+            entry[1] = surface
+            if len(entry[2]) < max_channels:
+                entry[2].add(channel)
+            return
+        if len(self.counts) < capacity:
+            self.counts[key] = [1, surface, {channel}]
+            return
+        # Места нет: уменьшаем все счетчики на 1 и выкидываем нулевые.
+        # Уменьшений не больше, чем было добавлений, - в среднем O(1) на слово
+        for other in list(self.counts):
+            other_entry = self.counts[other]
+            other_entry[0] -= 1
+            if other_entry[0] <= 0:
+                del self.counts[other]
+
+
+class _RegionWindow:
+
+    __slots__ = ("buckets", "baseline", "first_seen", "posts", "estimates")
+
+    def __init__(self, now: float, baseline: CountMinSketch):
+        self.buckets: Deque[_Bucket] = deque()
+        self.baseline = baseline
+        self.first_seen = now
+        self.posts = 0
+        # Оценки базовой линии до следующего шага (она меняется только при сдвиге окна)
+        self.estimates: Dict[str, float] = {}
+
+
+# region, всплески -> сводное оповещение оператору
+TrendAlert = Callable[[str, List[Trend]], Awaitable[None]]
+
+
+class TrendDetector:
+    """Всплески слов по регионам в скользящем окне
+
+    Каждый пост разбивается на основы слов (без служебных слов и подписей
+    каналов), и каждая основа учитывается один раз на пост. Окно состоит
+    из шагов по bucket_minutes; в шаге хранится сводка Misra-Gries на
+    capacity слов. Выпавший из окна шаг переносится в count-min sketch
+    базовой линии с затуханием baseline_hours. Всплеск - слово, которое в
+    окне встречается в min_posts постах из min_channels каналов и в
+    min_ratio раз чаще, чем ожидается по базовой линии. Учет поста -
+    O(1) на слово, память ограничена числом регионов.
+    """
+
+    def __init__(self, settings: Dict[str, Any], region_of: Callable[[str], str],
+                 on_alert: Optional[TrendAlert] = None):
+        self.region_of = region_of
+        self.on_alert = on_alert
+        self.bucket_seconds = float(settings.get('bucket_minutes', 10)) * 60
+        self.window_buckets = max(1, round(float(settings.get('window_minutes', 60)) * 60 / self.bucket_seconds))
+        self.baseline_half_life = float(settings.get('baseline_hours', 24)) * 3600
+        self.capacity = int(settings.get('capacity', 300))
+        self.sketch_width = int(settings.get('sketch_width', 4096))
+        self.max_terms = int(settings.get('max_terms_per_post', 40))
+        self.min_posts = int(settings.get('min_posts', 3))
+        self.min_channels = int(settings.get('min_channels', 2))
+        self.min_ratio = float(settings.get('min_ratio', 3))
+        self.top_n = int(settings.get('top_n', 5))
+        self.alert_min_score = float(settings.get('alert_min_score', 4))
+        self.alert_cooldown = float(settings.get('alert_cooldown_minutes', 120)) * 60
+        # Пока базовая линия короче стольких окон, всплески не объявляются
+        self.warmup_windows = float(settings.get('warmup_windows', 3))
+
+        self._regions: Dict[str, _RegionWindow] = {}
+        self._channel_regions: Dict[str, str] = {}
+        self._channel_regions_reset = 0.0
+        self._alerted: Dict[Tuple[str, str], float] = {}
+
+        self.posts = 0
+        self.alerts = 0
+
+    @property
+    def window_seconds(self) -> float:
+        return self.window_buckets * self.bucket_seconds
+
+    def _region(self, channel_username: str, now: float) -> str:
+        # Регион канала читается из конфигурации - кэшируем на один шаг окна
+        if now - self._channel_regions_reset >= self.bucket_seconds:
+            self._channel_regions.clear()
+            self._channel_regions_reset = now
+        region = self._channel_regions.get(channel_username)
+        if region is None:
+            region = self.region_of(channel_username) or 'general'
+            self._channel_regions[channel_username] = region
+        return region
+
+    def _window(self, region: str, now: float) -> _RegionWindow:
+        window = self._regions.get(region)
+        if window is None:
+            window = _RegionWindow(now, CountMinSketch(self.sketch_width, 4, self.baseline_half_life, now))
+            self._regions[region] = window
+        self._advance(window, now)
+        return window
+
+    def _advance(self, window: _RegionWindow, now: float):
+        """Открыть шаг для текущего времени; выпавшие из окна шаги - в базовую линию"""
+        started = now - now % self.bucket_seconds
+        if not window.buckets or window.buckets[-1].started < started:
+            window.buckets.append(_Bucket(started))
+            window.estimates.clear()
+        horizon = started - self.window_seconds
+        while window.buckets and window.buckets[0].started <= horizon:
+            expired = window.buckets.popleft()
+            for key, entry in expired.counts.items():
+                window.baseline.add(key, entry[0], expired.started)
+
+    async def add(self, channel_username: str, text: str, now: Optional[float] = None) -> List[Trend]:
+        """Учесть пост; вернуть всплески, о которых только что оповестили"""
+        terms = extract_terms(text, self.max_terms)
+        if not terms:
+            return []
+        now = time.time() if now is None else now
+        region = self._region(channel_username, now)
+        window = self._window(region, now)
+        bucket = window.buckets[-1]
+        bucket.posts += 1
+        window.posts += 1
+        self.posts += 1
+        for key, surface in terms.items():
+            bucket.add(key, surface, channel_username, self.capacity, self.min_channels * 4)
+
+        if not self.on_alert or self._warming_up(window, now):
+            return []
+
+        # Проверяются только слова этого поста - тоже O(1) на слово
+        bursts = []
+        for key in terms:
+            trend = self._trend(window, key, now)
+            if trend is None or trend.score < self.alert_min_score:
+                continue
+            alerted_at = self._alerted.get((region, key))
+            if alerted_at is not None and now - alerted_at < self.alert_cooldown:
+                continue
+            self._alerted[(region, key)] = now
+            bursts.append(trend)
+
+        if bursts:
+            self.alerts += 1
+            self._prune_alerted(now)
+            bursts.sort(key=lambda trend: trend.score, reverse=True)
+            try:
+                await self.on_alert(region, bursts)
+            except Exception as e:
+                logger.error(f"❌ Ошибка оповещения о трендах: {e}")
+        return bursts
+
+    def _warming_up(self, window: _RegionWindow, now: float) -> bool:
+        return now - window.first_seen < self.warmup_windows * self.window_seconds
+
+    def _expected(self, window: _RegionWindow, key: str, now: float) -> float:
+        """Ожидаемое число постов со словом за окно по базовой линии"""
+        window_start = window.buckets[0].started
+        covered = window_start - window.first_seen
+        if covered <= 0:
+            return 0.0
+        # Сколько «эффективных» секунд наблюдений накопила затухающая базовая линия
+        rate = window.estimates.get(key)
+        if rate is None:
+            tau = self.baseline_half_life / math.log(2)
+            effective = tau * (1 - math.exp(-covered / tau))
+            rate = window.baseline.estimate(key, window_start) / effective
+            window.estimates[key] = rate
+        return rate * max(self.bucket_seconds, now - window_start)
+
+    def _trend(self, window: _RegionWindow, key: str, now: float) -> Optional[Trend]:
+        entries = [bucket.counts[key] for bucket in window.buckets if key in bucket.counts]
+        posts = sum(entry[0] for entry in entries)
+        if posts < self.min_posts:
+            return None
+        channels: Set[str] = set()
+        for entry in entries:
+            channels.update(entry[2])
+        if len(channels) < self.min_channels:
+            return None
+        surface = entries[-1][1]
+        expected = self._expected(window, key, now)
+        if posts < self.min_ratio * max(expected, 1.0):
+            return None
+        score = (posts - expected) / math.sqrt(expected + 1)
+        return Trend(surface, posts, round(expected, 1), round(score, 1), len(channels))
+
+    def top(self, region: Optional[str] = None, limit: Optional[int] = None,
+            now: Optional[float] = None) -> Dict[str, List[Trend]]:
+        """Текущие всплески по регионам (или одного региона), сильнейшие первыми"""
+        now = time.time() if now is None else now
+        limit = limit or self.top_n
+        result: Dict[str, List[Trend]] = {}
+        for region_key, window in self._regions.items():
+            if region and region_key != region:
+                continue
+            self._advance(window, now)
+            keys = set()
+            for bucket in window.buckets:
+                keys.update(bucket.counts)
+            trends = [trend for trend in (self._trend(window, key, now) for key in keys) if trend]
+            if trends:
+                trends.sort(key=lambda trend: trend.score, reverse=True)
+                result[region_key] = trends[:limit]
+        return result
+
+    def is_warming_up(self, region: str, now: Optional[float] = None) -> bool:
+        window = self._regions.get(region)
+        now = time.time() if now is None else now
+        return window is None or self._warming_up(window, now)
+
+    def _prune_alerted(self, now: float):
+        expired = [key for key, alerted_at in self._alerted.items() if now - alerted_at >= self.alert_cooldown]
+        for key in expired:
+            del self._alerted[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'regions': len(self._regions),
+            'posts': self.posts,
+            'terms': sum(len(bucket.counts) for window in self._regions.values() for bucket in window.buckets),
+            'alerts': self.alerts,
+        }
+
+
+def format_trends(trends: Dict[str, List[Trend]], region_names: Optional[Dict[str, str]] = None,
+                  window_minutes: int = 60) -> str:
+    """Текст сводки трендов для бота"""
+    region_names = region_names or {}
+    if not trends:
+        return f"📈 <b>Тренды за {window_minutes} мин</b>\n\n🤷‍♂️ Всплесков не найдено"
+
+    lines = [f"📈 <b>Тренды за {window_minutes} мин</b>"]
+    for region, region_trends in trends.items():
+        lines.append(f"\n<b>{region_names.get(region, region)}</b>")
+        for trend in region_trends:
+            lines.append(
+                f"• <b>{trend.term}</b> - {trend.posts} постов в {trend.channels} каналах "
+                f"(обычно ~{trend.expected:g}, ×{trend.posts / max(trend.expected, 1.0):.1f})"
+            )
+    return "\n".join(lines)
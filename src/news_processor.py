@@ -5,6 +5,7 @@
 """
 
 import asyncio
+import time
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Any
 from loguru import logger
@@ -30,6 +31,9 @@ class NewsProcessor:
         self.selected_news = 0
         self.errors_count = 0
         
+        # Слоты одновременной обработки каналов (создаются при первом пакете)
+        self._channel_slots: Optional[asyncio.Semaphore] = None
+        
         logger.info("📰 NewsProcessor инициализирован")
     
     async def process_channel(self, channel: Dict, is_vip: bool = False) -> Dict:
@@ -63,10 +67,12 @@ class NewsProcessor:
             
             if not filtered_messages:
                 logger.debug(f"🔍 Все сообщения отфильтрованы в {channel_username}")
+                await self._advance_watermark(channel_username, messages)
                 return {'success': True, 'messages': len(messages), 'selected': 0}
             
             # 3. Сохраняем в базу (до ИИ анализа)
             saved_count = await self.database.save_messages_batch(filtered_messages)
+            await self._advance_watermark(channel_username, messages)
             
             # 4. ИИ анализ только ДЛЯ ОДНОЙ САМЫЙ СВЕЖЕЙ новости
             # Выбираем самое новое сообщение по дате
@@ -109,30 +115,94 @@ class NewsProcessor:
             logger.error(f"❌ Ошибка обработки канала {channel_username}: {e}")
             return {'success': False, 'error': str(e)}
     
-    async def process_vip_channels_batch(self, vip_channels: List[Dict]) -> Dict:
-        """Пакетная обработка VIP каналов"""
+    async def _advance_watermark(self, channel_username: str, messages: List[Dict]):
+        """Сдвинуть водяной знак канала после обработки пачки (fetch_new_messages его не двигает)"""
+        newest_id = max(msg['message_id'] for msg in messages)
+        self.telegram.advance_watermark(channel_username, newest_id)
+        await self.database.update_last_check_time(channel_username.lstrip('@'), datetime.now(), newest_id)
+    
+    async def _concurrency_limit(self) -> int:
+        """Размер пула: настройка, урезанная по свободной памяти"""
+        limit = max(1, int(self.config.get('max_concurrent_channels', 25)))
+        per_channel_mb = self.config.get('memory_per_channel_mb', 20)
+        memory_limit_mb = self.config.get('memory_limit_mb')
         
-        logger.info(f"🔥 Обработка {len(vip_channels)} VIP каналов")
+        try:
+            import psutil
+            
+            def read_memory():
+                return psutil.virtual_memory(), psutil.Process().memory_info().rss
+            
+            # psutil читает /proc синхронно - не в цикле событий
+            memory, rss = await asyncio.get_event_loop().run_in_executor(None, read_memory)
+            headroom_mb = memory.available / 1024 / 1024
+            if memory_limit_mb:
+                headroom_mb = min(headroom_mb, memory_limit_mb - rss / 1024 / 1024)
+            
+            if memory.percent > 80:
+                logger.warning(f"⚠️ Высокое использование памяти: {memory.percent}%")
+            limit = max(1, min(limit, int(headroom_mb // per_channel_mb)))
+        except ImportError:
+            pass
         
-        results = []
-        for channel in vip_channels:
-            try:
-                result = await self.process_channel(channel, is_vip=True)
-                results.append(result)
-                
-                # Небольшая пауза между каналами для экономии ресурсов
-                await asyncio.sleep(2)
-                
-            except Exception as e:
-                logger.error(f"❌ Ошибка обработки VIP канала {channel.get('username')}: {e}")
-                results.append({'success': False, 'error': str(e)})
+        return limit
+    
+    async def _process_channel_with_timeout(self, channel: Dict, is_vip: bool) -> Dict:
+        timeout = self.config.get('channel_timeout', 60)
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self.process_channel(channel, is_vip=is_vip), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.errors_count += 1
+            logger.error(f"⏱️ Канал {channel.get('username')} не ответил за {timeout} с - слот освобожден")
+            result = {'success': False, 'error': f'timeout {timeout}s'}
+        except Exception as e:
+            logger.error(f"❌ Ошибка обработки канала {channel.get('username')}: {e}")
+            result = {'success': False, 'error': str(e)}
+        result['elapsed'] = time.monotonic() - started
+        return result
+    
+    async def _run_channels(self, channels: List[Dict], is_vip: bool) -> List[Dict]:
+        """Обработка каналов пулом: следующий канал берется, как только освободился слот"""
+        if not channels:
+            return []
+        
+        if self._channel_slots is None:
+            # Общий на все пакеты лимит из настройки: VIP и обычные каналы делят одни слоты.
+            # Семафор не пересоздается - иначе пакет на старом семафоре не учитывался бы в новом
+            self._channel_slots = asyncio.Semaphore(max(1, int(self.config.get('max_concurrent_channels', 25))))
+        # Урезание по памяти - числом обработчиков этого пакета
+        limit = await self._concurrency_limit()
+        
+        queue: asyncio.Queue = asyncio.Queue()
+        for index, channel in enumerate(channels):
+            queue.put_nowait((index, channel))
+        results: List[Optional[Dict]] = [None] * len(channels)
         
-        # Статистика
+        async def worker():
+            while True:
+                try:
+                    index, channel = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                async with self._channel_slots:
+                    results[index] = await self._process_channel_with_timeout(channel, is_vip)
+        
+        started = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(min(limit, len(channels)))))
+        
+        elapsed = time.monotonic() - started
+        slowest = max(results, key=lambda r: r.get('elapsed', 0))
+        logger.info(
+            f"⏱️ {len(channels)} каналов за {elapsed:.1f} с (слотов {limit}), "
+            f"самый долгий канал {slowest.get('elapsed', 0):.1f} с"
+        )
+        return results
+    
+    def _summarize(self, channels: List[Dict], results: List[Dict]) -> Dict:
         successful = sum(1 for r in results if r.get('success'))
         total_selected = sum(r.get('selected', 0) for r in results if r.get('success'))
         
-        logger.info(f"✅ VIP каналы: {successful}/{len(vip_channels)} успешно, {total_selected} новостей отобрано")
-        
         # Собираем все отобранные новости
         all_selected_news = []
         for result in results:
@@ -140,75 +210,34 @@ class NewsProcessor:
                 all_selected_news.extend(result['selected_news'])
         
         return {
-            'processed': len(vip_channels),
+            'processed': len(channels),
             'successful': successful,
             'total_selected': total_selected,
             'selected_news': all_selected_news,
             'results': results
         }
     
-    async def process_regular_channels_batch(self, regular_channels: List[Dict]) -> Dict:
-        """Пакетная обработка обычных каналов"""
-        
-        logger.info(f"📰 Обработка {len(regular_channels)} обычных каналов")
+    async def process_vip_channels_batch(self, vip_channels: List[Dict]) -> Dict:
+        """Пакетная обработка VIP каналов"""
         
-        # Обрабатываем пакетами для экономии RAM
-        batch_size = self.config.get('max_concurrent_channels', 25)  # По умолчанию 25
-        total_results = []
+        logger.info(f"🔥 Обработка {len(vip_channels)} VIP каналов")
         
-        for i in range(0, len(regular_channels), batch_size):
-            batch = regular_channels[i:i+batch_size]
-            
-            logger.info(f"📦 Обработка пакета {i//batch_size + 1}: {len(batch)} каналов")
-            
-            # Параллельная обработка пакета
-            tasks = []
-            for channel in batch:
-                task = self.process_channel(channel, is_vip=False)
-                tasks.append(task)
-            
-            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Обрабатываем результаты
-            for result in batch_results:
-                if isinstance(result, Exception):
-                    logger.error(f"❌ Ошибка в пакете: {result}")
-                    total_results.append({'success': False, 'error': str(result)})
-                else:
-                    total_results.append(result)
-            
-            # Пауза между пакетами
-            await asyncio.sleep(5)
-            
-            # Проверка памяти (если доступно)
-            try:
-                import psutil
-                memory_percent = psutil.virtual_memory().percent
-                if memory_percent > 80:
-                    logger.warning(f"⚠️ Высокое использование памяти: {memory_percent}%")
-                    await asyncio.sleep(10)  # Дополнительная пауза
-            except ImportError:
-                pass
+        results = await self._run_channels(vip_channels, is_vip=True)
+        summary = self._summarize(vip_channels, results)
         
-        # Итоговая статистика
-        successful = sum(1 for r in total_results if r.get('success'))
-        total_selected = sum(r.get('selected', 0) for r in total_results if r.get('success'))
+        logger.info(f"✅ VIP каналы: {summary['successful']}/{len(vip_channels)} успешно, {summary['total_selected']} новостей отобрано")
+        return summary
+    
+    async def process_regular_channels_batch(self, regular_channels: List[Dict]) -> Dict:
+        """Пакетная обработка обычных каналов"""
         
-        logger.info(f"✅ Обычные каналы: {successful}/{len(regular_channels)} успешно, {total_selected} новостей отобрано")
+        logger.info(f"📰 Обработка {len(regular_channels)} обычных каналов")
         
-        # Собираем все отобранные новости
-        all_selected_news = []
-        for result in total_results:
-            if result.get('success') and result.get('selected_news'):
-                all_selected_news.extend(result['selected_news'])
+        results = await self._run_channels(regular_channels, is_vip=False)
+        summary = self._summarize(regular_channels, results)
         
-        return {
-            'processed': len(regular_channels),
-            'successful': successful,
-            'total_selected': total_selected,
-            'selected_news': all_selected_news,
-            'results': total_results
-        }
+        logger.info(f"✅ Обычные каналы: {summary['successful']}/{len(regular_channels)} успешно, {summary['total_selected']} новостей отобрано")
+        return summary
     
     async def generate_daily_digest(self) -> Optional[str]:
         """Генерация дневного дайджеста лучших новостей"""
@@ -0,0 +1,110 @@
+"""
+📊 Ranking Module
+Единая формула популярности постов для дайджестов из базы и live-дайджестов:
+векторный расчет по столбцам NumPy и выбор топ-K через argpartition
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+DEFAULT_WEIGHTS = {
+    'replies': 10.0,      # Комментарии - самое важное
+    'reactions': 8.0,     # Реакции - очень важно
+    'forwards': 3.0,      # Репосты - важно
+    'views': 0.1,         # Просмотры - минимальный вес
+}
+
+
+class RankingEngine:
+    """Счет популярности для набора кандидатов
+
+    Кандидаты передаются столбцами: просмотры, репосты, комментарии,
+    реакции, возраст в часах и флаги тега канала / региональности.
+    Счет - взвешенная сумма, умноженная на бонусы, с необязательным
+    затуханием по возрасту (half_life_hours: за столько часов счет
+    падает вдвое, 0 - без затухания). Топ-K выбирается argpartition
+    за O(n), полностью сортируются только K лучших.
+    """
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        settings = settings or {}
+        weights = settings.get('weights') or {}
+        self.weights = {name: float(weights.get(name, default)) for name, default in DEFAULT_WEIGHTS.items()}
+        self.channel_tag_bonus = float(settings.get('channel_tag_bonus', 1.5))
+        self.regional_bonus = float(settings.get('regional_bonus', 1.3))
+        self.half_life_hours = float(settings.get('half_life_hours', 0))
+
+    @property
+    def uses_decay(self) -> bool:
+        return self.half_life_hours > 0
+
+    @property
+    def max_bonus(self) -> float:
+        """Наибольший множитель, который могут дать бонусы"""
+        return max(1.0, self.channel_tag_bonus) * max(1.0, self.regional_bonus)
+
+    def score(
+        self,
+        views: Sequence[float],
+        forwards: Sequence[float],
+        replies: Sequence[float],
+        reactions: Sequence[float],
+        age_hours: Optional[Sequence[float]] = None,
+        channel_tag: Optional[Sequence[bool]] = None,
+        regional: Optional[Sequence[bool]] = None
+    ) -> np.ndarray:
+        """Счет популярности по столбцам (float64, по одному на кандидата)"""
+        scores = np.asarray(replies, dtype=np.float64) * self.weights['replies']
+        scores += np.asarray(reactions, dtype=np.float64) * self.weights['reactions']
+        scores += np.asarray(forwards, dtype=np.float64) * self.weights['forwards']
+        scores += np.asarray(views, dtype=np.float64) * self.weights['views']
+
+        if channel_tag is not None:
+            scores *= np.where(np.asarray(channel_tag, dtype=bool), self.channel_tag_bonus, 1.0)
+        if regional is not None:
+            scores *= np.where(np.asarray(regional, dtype=bool), self.regional_bonus, 1.0)
+        if self.uses_decay and age_hours is not None:
+            age = np.maximum(np.asarray(age_hours, dtype=np.float64), 0.0)
+            scores *= np.exp2(-age / self.half_life_hours)
+        return scores
+
+    def score_rows(self, rows: List[Dict[str, Any]], now: Optional[datetime] = None) -> np.ndarray:
+        """Счет для словарей постов (views, forwards, replies, reactions_count, date и флаги)"""
+        age_hours = None
+        if self.uses_decay and now is not None:
+            age_hours = [(now - row['date']).total_seconds() / 3600 for row in rows]
+        return self.score(
+            [row.get('views', 0) for row in rows],
+            [row.get('forwards', 0) for row in rows],
+            [row.get('replies', 0) for row in rows],
+            [row.get('reactions_count', 0) for row in rows],
+            age_hours=age_hours,
+            channel_tag=[row.get('channel_tag', False) for row in rows],
+            regional=[row.get('regional', False) for row in rows]
+        )
+
+    @staticmethod
+    def top_k(scores: np.ndarray, k: int, tiebreak: Optional[np.ndarray] = None) -> np.ndarray:
+        """Индексы K лучших по убыванию счета (при равенстве - по убыванию tiebreak)"""
+        count = len(scores)
+        if k <= 0 or count == 0:
+            return np.empty(0, dtype=np.intp)
+        if k < count:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(count)
+        if tiebreak is None:
+            order = np.argsort(-scores[candidates], kind='stable')
+        else:
+            order = np.lexsort((-tiebreak[candidates], -scores[candidates]))
+        return candidates[order]
+
+    @staticmethod
+    def threshold(scores: np.ndarray, k: int) -> float:
+        """Счет K-го лучшего кандидата (0, если кандидатов меньше K)"""
+        if k <= 0 or len(scores) < k:
+            return 0.0
+        return float(np.partition(scores, len(scores) - k)[len(scores) - k])
@@ -0,0 +1,143 @@
+"""
+📍 Region Index Module
+Индекс региональной привязки из ключевых слов регионов в config.yaml:
+основы слов, названия городов и коды регионов ('75') для оценки постов,
+дайджестов и автоопределения региона канала
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.monitoring.dedup import normalize_tokens
+from src.monitoring.trends import stem
+
+
+# Основы короче - только точное совпадение («чит» не должна ловить «читатель»)
+MIN_PREFIX_LENGTH = 5
+# У основ длиннее последняя буква отбрасывается: «камчатк» -> «камчат» ловит и «камчатский»
+TRIM_PREFIX_LENGTH = 7
+# Код региона в тексте считается только рядом с этим словом: «75 регион», «регион 75»
+REGION_CODE_MARKER = "регион"
+
+
+class RegionIndex:
+    """Скомпилированные ключевые слова всех регионов
+
+    Каждое ключевое слово разбирается на слова и приводится к основе.
+    Длинные основы ищутся как префикс слова поста («камчатка» ловит
+    «Камчатском» и «камчатский»), короткие - только целиком, словосочетания
+    («советская гавань») - подряд идущими словами. Пост разбирается
+    на слова один раз, и за этот проход считаются совпадения со всеми
+    регионами сразу.
+
+    Для username канала основы не помогают («chita75news»), поэтому
+    ключевые слова ищутся одним регулярным выражением как подстроки,
+    а коды регионов - только не внутри более длинного числа.
+    """
+
+    def __init__(self, regions: Optional[Dict[str, Any]] = None):
+        # основа первого слова -> [(регион, основы остальных слов словосочетания)]
+        self._exact: Dict[str, List[Tuple[str, Tuple[str, ...]]]] = {}
+        self._prefix: Dict[str, List[Tuple[str, Tuple[str, ...]]]] = {}
+        self._codes: Dict[str, List[str]] = {}
+        self._order: Dict[str, int] = {}
+        username_patterns: Dict[str, str] = {}
+
+        for position, (region_key, region_data) in enumerate((regions or {}).items()):
+            self._order[region_key] = position
+            keywords = region_data.get('keywords') if isinstance(region_data, dict) else None
+            for keyword in keywords or []:
+                keyword = str(keyword).lower().replace('ё', 'е').strip()
+                tokens = normalize_tokens(keyword)
+                if not tokens:
+                    continue
+
+                if keyword.isdigit():
+                    self._codes.setdefault(keyword, []).append(region_key)
+                    username_patterns.setdefault(rf'(?<!\d){keyword}(?!\d)', region_key)
+                    continue
+
+                username_patterns.setdefault(re.escape(''.join(tokens)), region_key)
+
+                stems = tuple(self._key(token) for token in tokens)
+                first = stems[0]
+                if len(first) < MIN_PREFIX_LENGTH or not first.isalpha():
+                    self._exact.setdefault(first, []).append((region_key, stems[1:]))
+                    continue
+                if len(first) >= TRIM_PREFIX_LENGTH:
+                    first = first[:-1]
+                self._prefix.setdefault(first, []).append((region_key, stems[1:]))
+
+        self._prefix_lengths = sorted({len(key) for key in self._prefix}, reverse=True)
+        self._username_regions: List[str] = []
+        username_regex = None
+        if username_patterns:
+            # Длинные первыми, чтобы «южносахалинск» не перехватило «южно»
+            patterns = sorted(username_patterns, key=len, reverse=True)
+            self._username_regions = [username_patterns[pattern] for pattern in patterns]
+            username_regex = re.compile('|'.join(f'({pattern})' for pattern in patterns))
+        self._username_regex = username_regex
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return token if token.isdigit() else stem(token)
+
+    def _candidates(self, token: str, key: str):
+        yield from self._exact.get(key, ())
+        if not token.isalpha():
+            return
+        for length in self._prefix_lengths:
+            if length <= len(token):
+                yield from self._prefix.get(token[:length], ())
+
+    def relevance(self, text: str) -> Dict[str, int]:
+        """Регион -> число разных слов текста, совпавших с ключевыми словами региона (один проход)"""
+        tokens = normalize_tokens(text)
+        if not tokens:
+            return {}
+
+        matched: Dict[str, set] = {}
+        keys = [self._key(token) for token in tokens]
+        for position, (token, key) in enumerate(zip(tokens, keys)):
+            if token.isdigit():
+                regions = self._codes.get(token)
+                if regions and self._near_marker(tokens, position):
+                    for region_key in regions:
+                        matched.setdefault(region_key, set()).add(key)
+                continue
+
+            for region_key, rest in self._candidates(token, key):
+                if rest and tuple(keys[position + 1:position + 1 + len(rest)]) != rest:
+                    continue
+                matched.setdefault(region_key, set()).add(key)
+
+        return {region_key: len(words) for region_key, words in matched.items()}
+
+    def is_relevant(self, text: str, region_key: Optional[str]) -> bool:
+        if not region_key:
+            return False
+        return self.relevance(text).get(region_key, 0) > 0
+
+    @staticmethod
+    def _near_marker(tokens: List[str], position: int) -> bool:
+        for neighbour in tokens[max(0, position - 1):position + 2]:
+            if neighbour.startswith(REGION_CODE_MARKER):
+                return True
+        return False
+
+    def match_channel(self, username: str, title: str = '') -> List[str]:
+        """Регионы канала по username и названию - сначала с наибольшим числом совпадений"""
+        scores: Dict[str, int] = dict(self.relevance(title)) if title else {}
+        if self._username_regex and username:
+            for match in self._username_regex.finditer(username.lower().lstrip('@')):
+                region_key = self._username_regions[match.lastindex - 1]
+                scores[region_key] = scores.get(region_key, 0) + 1
+        return sorted(scores, key=lambda region_key: (-scores[region_key], self._order[region_key]))
+
+    def detect_channel(self, username: str, title: str = '') -> Optional[str]:
+        regions = self.match_channel(username, title)
+        return regions[0] if regions else None
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._exact.values()) + \
+            sum(len(entries) for entries in self._prefix.values()) + len(self._codes)
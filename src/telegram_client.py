@@ -5,14 +5,18 @@
 """
 
 import asyncio
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import List, Dict, Optional, Any
 from telethon import TelegramClient, events
-from telethon.tl.types import Message, Channel
+from telethon.tl.functions.channels import JoinChannelRequest
+from telethon.tl.types import Message, Channel, UpdateChannel
 from loguru import logger
 import hashlib
 
+from .monitoring.membership import MembershipTracker
+
 
 class TelegramMonitor:
     """Клиент для мониторинга Telegram каналов"""
@@ -32,38 +36,16 @@ class TelegramMonitor:
         self.messages_cache = {}
         self.cache_max_size = 1000  # Ограничение для VPS 1GB
         
-        # Кэш подписанных диалогов для быстрой проверки
-        self.dialogs_cache = {}
-        self.dialogs_cache_time = None
+        # Членство в каналах (засевается при первом входе, дальше - по событиям)
+        self.membership = MembershipTracker()
+        self._membership_retry_at = 0.0
+        
+        # id последнего обработанного поста по каналам (водяные знаки channel_checks)
+        self.last_message_ids: Dict[str, int] = {}
+        self._watermarks_loaded = False
         
         logger.info("📱 TelegramMonitor инициализирован")
     
-    async def is_already_joined(self, entity) -> bool:
-        try:
-            from telethon.tl.functions.channels import GetParticipantRequest
-            from telethon.errors import UserNotParticipantError, ChatAdminRequiredError
-            
-            try:
-                await self.client(GetParticipantRequest(
-                    channel=entity,
-                    participant=await self.client.get_me()
-                ))
-                return True
-            except (UserNotParticipantError, ChatAdminRequiredError):
-                return False
-            except Exception:
-                dialogs = await self.client.get_dialogs(limit=None)
-                
-                for dialog in dialogs:
-                    if dialog.entity.id == entity.id:
-                        return True
-                
-                return False
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка проверки подписки: {e}")
-            return False
-    
     async def initialize(self):
         """Инициализация Telegram клиента"""
         try:
@@ -85,13 +67,22 @@ class TelegramMonitor:
                 lang_code="ru",
                 system_lang_code="ru-RU",
                 # Оптимизация для VPS
-                connection_retries=None,  # Бесконечное переподключение при сбоях сети
+                connection_retries=None,  # Бесконечные попытки при подключении
+                # Разрывы обрабатывает ConnectionSupervisor: без своего авто-переподключения
+                # client.disconnected завершается при любом разрыве, и после него идет догрузка
+                auto_reconnect=False,
                 request_retries=5,
                 timeout=30
             )
             
             await self.client.start()
             
+            self.membership.load()
+            self.client.add_event_handler(
+                self.membership.on_channel_update,
+                events.Raw(types=UpdateChannel)
+            )
+            
             # Проверка авторизации - нужен пользователь, не бот
             me = await self.client.get_me()
             
@@ -99,18 +90,15 @@ class TelegramMonitor:
                 logger.info(f"✅ Telegram клиент подключен как пользователь: {me.first_name} ({me.phone})")
                 self.is_connected = True
                 
-                # Предварительно заполняем кэш из диалогов (один запрос к API вместо десятков)
+                # Полный обход диалогов - только пока членство не засеяно;
+                # каналы дальше разрешаются по мере надобности (get_channel_entity)
+                if not self.membership.is_seeded:
+                    await self._seed_membership()
+                
                 try:
-                    logger.info("📡 Загружаем диалоги для предварительного заполнения кэша...")
-                    dialogs = await self.client.get_dialogs(limit=None)
-                    for dialog in dialogs:
-                        entity = dialog.entity
-                        if hasattr(entity, 'username') and entity.username:
-                            self.channels_cache[entity.username.lower()] = entity
-                            self.channels_cache[entity.username] = entity
-                    logger.info(f"✅ Кэш предзаполнен: {len(self.channels_cache)} каналов загружено из диалогов")
-                except Exception as cache_err:
-                    logger.warning(f"⚠️ Не удалось предзаполнить кэш из диалогов: {cache_err}")
+                    await self.preload_watermarks()
+                except Exception as watermark_err:
+                    logger.warning(f"⚠️ Не удалось загрузить водяные знаки каналов: {watermark_err}")
             else:
                 logger.warning(f"⚠️ Подключен как бот: {me.first_name}")
                 logger.warning("💡 Боты не могут читать каналы - нужна авторизация по номеру телефона")
@@ -126,6 +114,26 @@ class TelegramMonitor:
             # Не выбрасываем исключение, чтобы система продолжила работу без мониторинга
             return False
     
+    async def _seed_membership(self) -> bool:
+        """Засеять членство из списка диалогов (тяжелый запрос - один раз за жизнь сессии)"""
+        try:
+            logger.info("📡 Загружаем диалоги для засева членства в каналах...")
+            dialogs = await self.client.get_dialogs(limit=None)
+        except Exception as e:
+            # Повтор - при следующей проверке членства, но не чаще раза в 10 минут
+            self._membership_retry_at = time.monotonic() + 600
+            logger.warning(f"⚠️ Не удалось загрузить диалоги для членства: {e}")
+            return False
+        
+        # Раз диалоги уже получены - заодно заполняем кэш каналов
+        for dialog in dialogs:
+            entity = dialog.entity
+            if getattr(entity, 'username', None) and len(self.channels_cache) < self.cache_max_size:
+                self.channels_cache[entity.username] = entity
+                self.channels_cache[entity.username.lower()] = entity
+        self.membership.seed(dialog.entity for dialog in dialogs)
+        return True
+    
     async def get_channel_entity(self, username: str) -> Optional[Channel]:
         """Получение объекта канала с кэшированием (поддержка с/без @)"""
         
@@ -154,6 +162,57 @@ class TelegramMonitor:
             logger.error(f"❌ Ошибка получения канала {normalized}: {e}")
             return None
     
+    @staticmethod
+    def watermark_key(username: str) -> str:
+        return username.lstrip('@').lower()
+    
+    async def preload_watermarks(self):
+        """Загрузить водяные знаки всех каналов одним запросом"""
+        ids = await self.database.get_last_message_ids()
+        for username, message_id in ids.items():
+            key = self.watermark_key(username)
+            self.last_message_ids[key] = max(self.last_message_ids.get(key, 0), message_id)
+        self._watermarks_loaded = True
+        logger.info(f"🔖 Загружены водяные знаки {len(ids)} каналов")
+    
+    async def get_watermarks(self) -> Dict[str, int]:
+        if not self._watermarks_loaded:
+            await self.preload_watermarks()
+        return self.last_message_ids
+    
+    def advance_watermark(self, username: str, message_id: int):
+        """Сдвинуть водяной знак канала вперед (назад не двигается)"""
+        key = self.watermark_key(username)
+        if message_id and message_id > self.last_message_ids.get(key, 0):
+            self.last_message_ids[key] = message_id
+    
+    async def fetch_new_messages(self, entity, username: str, limit: int) -> List[Message]:
+        """Посты канала новее водяного знака, от старых к новым.
+        
+        iter_messages(min_id=..., reverse=True) листает от водяного знака вперед
+        до самого нового поста, поэтому при большом перерыве ранние посты
+        не теряются (limit ограничивает только первый опрос канала).
+        Водяной знак здесь не сдвигается: его двигает обработка каждого поста,
+        чтобы сбой посреди пачки не терял необработанные.
+        """
+        watermarks = await self.get_watermarks()
+        last_id = watermarks.get(self.watermark_key(username), 0)
+        
+        messages = []
+        if last_id:
+            async for message in self.client.iter_messages(entity, min_id=last_id, reverse=True):
+                messages.append(message)
+        else:
+            # Первый запуск для канала - только посты после запуска бота
+            async for message in self.client.iter_messages(entity, limit=limit):
+                if message.date < self.start_time:
+                    break
+                messages.append(message)
+            messages.reverse()
+        
+        await self.database.update_last_check_time(username.lstrip('@'), datetime.now())
+        return messages
+    
     async def get_recent_messages(self, channel_config: Dict, limit: int = 50) -> List[Dict]:
         """Получение последних сообщений из канала"""
         
@@ -172,20 +231,9 @@ class TelegramMonitor:
             if not entity:
                 return []
             
-            # Получаем последние сообщения
+            # Только посты новее водяного знака - старые не передаются вовсе
             messages = []
-            
-            # Определяем время последней проверки
-            last_check = await self.database.get_last_check_time(username)
-            if not last_check:
-                # Если первый запуск - берем сообщения только ПОСЛЕ запуска бота
-                last_check = self.start_time.replace(tzinfo=None)  # Убираем timezone для совместимости с базой
-            
-            async for message in self.client.iter_messages(
-                entity, 
-                limit=limit,
-                offset_date=last_check
-            ):
+            for message in await self.fetch_new_messages(entity, username, limit):
                 if not message.text:
                     continue
                 
@@ -197,9 +245,6 @@ class TelegramMonitor:
                 message_data = await self.message_to_dict(message, channel_config)
                 messages.append(message_data)
             
-            # Обновляем время последней проверки
-            await self.database.update_last_check_time(username, datetime.now())
-            
             logger.info(f"📥 Получено {len(messages)} новых сообщений из {username}")
             return messages
             
@@ -336,48 +381,21 @@ class TelegramMonitor:
         """Очистка кэша для освобождения памяти"""
         self.channels_cache.clear()
         self.messages_cache.clear()
-        self.dialogs_cache.clear()
-        self.dialogs_cache_time = None
         logger.info("🧹 Кэш Telegram клиента очищен")
 
-    async def _update_dialogs_cache(self):
-        """Обновление кэша диалогов (раз в 10 минут)"""
-        from datetime import timedelta
-        
-        now = datetime.now()
-        
-        # Обновляем кэш если он пустой или старше 10 минут
-        if (not self.dialogs_cache_time or 
-            now - self.dialogs_cache_time > timedelta(minutes=10)):
-            
-            logger.info("🔄 Обновляем кэш диалогов...")
-            self.dialogs_cache = {}
-            
-            try:
-                # Получаем все диалоги ОДИН раз
-                async for dialog in self.client.iter_dialogs():
-                    self.dialogs_cache[dialog.entity.id] = True
-                
-                self.dialogs_cache_time = now
-                logger.info(f"✅ Кэш диалогов обновлен: {len(self.dialogs_cache)} каналов")
-                
-            except Exception as e:
-                logger.error(f"❌ Ошибка обновления кэша диалогов: {e}")
-
     async def is_already_joined(self, entity) -> bool:
-        """Проверка, состоит ли текущий пользователь в канале/чате"""
-        try:
-            # Обновляем кэш если нужно
-            await self._update_dialogs_cache()
-            
-            # Быстрая проверка по кэшу
-            target_id = entity.id
-            return target_id in self.dialogs_cache
-            
-        except Exception as e:
-            logger.debug(f"Ошибка проверки подписки: {e}")
-            # При любых ошибках считаем что не подписаны (безопасная сторона)
-            return False
+        """Проверка, состоит ли текущий пользователь в канале/чате (без запросов к API после засева)"""
+        if not self.membership.is_seeded and time.monotonic() >= self._membership_retry_at:
+            await self._seed_membership()
+        return self.membership.is_member(entity)
+    
+    async def join_channel(self, entity):
+        """Вступить в канал и сразу учесть это в членстве"""
+        result = await self.client(JoinChannelRequest(entity))
+        for chat in getattr(result, 'chats', None) or []:
+            self.membership.apply_channel(chat)
+        self.membership.mark_joined(entity.id)
+        return result
     
     async def get_new_messages_simple(self, channel_config: dict) -> List[Dict]:
         """Простое получение новых сообщений без анализа - только для пересылки"""
@@ -390,22 +408,9 @@ class TelegramMonitor:
             if not entity:
                 return []
             
-            # Определяем время последней проверки
-            last_check = await self.database.get_last_check_time(username)
-            if not last_check:
-                # Если первый запуск - берем сообщения только ПОСЛЕ запуска бота
-                last_check = self.start_time.replace(tzinfo=None)  # Убираем timezone для совместимости с базой
-            
-            # Получаем новые сообщения
+            # Получаем новые сообщения (новее водяного знака, максимум 50 за раз)
             new_messages = []
-            async for message in self.client.iter_messages(
-                entity, 
-                limit=50,  # Максимум 50 новых сообщений за раз
-                offset_date=last_check
-            ):
-                if message.date <= last_check:
-                    break
-                    
+            for message in await self.fetch_new_messages(entity, username, limit=50):
                 # Простая проверка - только текстовые сообщения
                 if not message.text:
                     continue
@@ -420,12 +425,10 @@ class TelegramMonitor:
                 
                 new_messages.append(message_data)
             
-            # Обновляем время последней проверки
             if new_messages:
-                await self.database.update_last_check_time(username)
                 logger.info(f"📥 Получено {len(new_messages)} новых сообщений из {username}")
             
-            return new_messages[::-1]  # Возвращаем в хронологическом порядке
+            return new_messages  # Уже в хронологическом порядке
             
         except Exception as e:
             logger.error(f"❌ Ошибка получения сообщений из {username}: {e}")
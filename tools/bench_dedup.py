@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+🧬 Проверка поиска перепостов (SimHash)
+Сравнивает точное совпадение хэша текста с SimHash-индексом на постах из базы:
+сколько копий найдено, сколько из них ложных и сколько стоит один пост
+"""
+
+import hashlib
+import random
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+# Добавляем родительскую директорию в путь для импорта
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.monitoring.dedup import DuplicateCluster, NearDuplicateIndex, normalize_tokens, simhash, hamming
+
+
+MIN_TOKENS = 12
+
+
+def load_posts(db_path: str = "news_monitor.db") -> list:
+    """(канал, текст) реальных постов из базы"""
+    try:
+        with sqlite3.connect(db_path) as conn:
+            rows = conn.execute(
+                "SELECT channel_username, text FROM messages WHERE text != '' ORDER BY date"
+            ).fetchall()
+        return [(row[0], row[1]) for row in rows if row[1]]
+    except sqlite3.Error as e:
+        print(f"❌ Не удалось прочитать базу: {e}")
+        return []
+
+
+def repost_variant(text: str, rng: random.Random) -> str:
+    """Типичная перепечатка: своя подпись, другая ссылка, пара правок в словах"""
+    words = text.split()
+    for _ in range(max(1, len(words) // 40)):
+        index = rng.randrange(len(words))
+        words[index] = words[index].upper() if rng.random() < 0.5 else words[index] + ","
+    return "⚡️ " + " ".join(words) + "\n\nПодписывайтесь: @other_channel https://t.me/other_channel"
+
+
+def main():
+    posts = load_posts()
+    posts = [(channel, text) for channel, text in posts if len(normalize_tokens(text)) >= MIN_TOKENS]
+    if not posts:
+        print("⚠️ Нет постов для проверки")
+        return
+    print(f"📊 Постов длиннее {MIN_TOKENS} слов: {len(posts)}")
+
+    # Точное совпадение - то, что ловила processed_hashes
+    exact = {}
+    for channel, text in posts:
+        exact.setdefault(hashlib.sha256(text.encode()).hexdigest(), []).append(channel)
+    exact_dupes = sum(len(channels) - 1 for channels in exact.values())
+    print(f"🔒 Точных копий текста: {exact_dupes}")
+
+    # SimHash по реальным постам в порядке поступления
+    index = NearDuplicateIndex(window_seconds=10 ** 9)
+    started = time.perf_counter()
+    found = []
+    for number, (channel, text) in enumerate(posts):
+        fingerprint = simhash(normalize_tokens(text))
+        cluster = index.find(fingerprint)
+        if cluster:
+            found.append((cluster, channel, text, hamming(cluster.fingerprint, fingerprint)))
+        else:
+            index.add(DuplicateCluster(fingerprint, channel, number, text, 0.0))
+    elapsed = time.perf_counter() - started
+    print(f"🧬 SimHash-копий: {len(found)}, {elapsed / len(posts) * 1e6:.0f} мкс на пост")
+
+    false_matches = [item for item in found if normalize_tokens(item[0].url) != normalize_tokens(item[2])]
+    print(f"   из них текст отличается (перепечатки с правками или ложные): {len(false_matches)}")
+    for cluster, channel, text, distance in false_matches[:5]:
+        print(f"   • d={distance} @{cluster.channel_username} ↔ @{channel}: {text[:80]!r}")
+
+    # Полнота на синтетических перепечатках
+    rng = random.Random(42)
+    originals = NearDuplicateIndex(window_seconds=10 ** 9)
+    for number, (channel, text) in enumerate(posts):
+        originals.add(DuplicateCluster(simhash(normalize_tokens(text)), channel, number, text, 0.0))
+    hits = 0
+    for number, (_, text) in enumerate(posts):
+        cluster = originals.find(simhash(normalize_tokens(repost_variant(text, rng))))
+        if cluster and cluster.message_id == number:
+            hits += 1
+    print(f"🎯 Найдено перепечаток с правками: {hits}/{len(posts)} ({hits / len(posts) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+⏱️ Микробенчмарк рендеринга сообщений
+Сравнивает старую очистку текста (шесть re.sub) и сборку строк
+с однопроходным MessageRenderer, а также старый split_message с split_text
+"""
+
+import re
+import sqlite3
+import sys
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+# Добавляем родительскую директорию в путь для импорта
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.delivery.renderer import MessageRenderer, strip_markdown, split_text
+
+
+def old_clean_text_formatting(text: str) -> str:
+    if not text:
+        return ""
+    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
+    text = re.sub(r'\*(.*?)\*', r'\1', text)
+    text = re.sub(r'__(.*?)__', r'\1', text)
+    text = re.sub(r'~~(.*?)~~', r'\1', text)
+    text = re.sub(r'`(.*?)`', r'\1', text)
+    text = re.sub(r'```(.*?)```', r'\1', text, flags=re.DOTALL)
+    return text
+
+
+def old_render(news: dict) -> str:
+    text = old_clean_text_formatting(news['text'])
+    date = news['date']
+    date_str = f"\n📅 {date.strftime('%d.%m.%Y %H:%M')} (Владивосток)"
+    message = f"@{news['channel_username']}"
+    if text:
+        message += f"\n\n{text}"
+    if date_str:
+        message += f"\n{date_str}"
+    if news['url']:
+        message += f"\n\n{news['url']}"
+    return message
+
+
+def old_split_message(message: str, max_length: int = 4000) -> list:
+    if len(message) <= max_length:
+        return [message]
+    parts = []
+    current_part = ""
+    for line in message.split('\n'):
+        if len(current_part) + len(line) + 1 > max_length:
+            if current_part:
+                parts.append(current_part.strip())
+                current_part = line
+            else:
+                while len(line) > max_length:
+                    parts.append(line[:max_length])
+                    line = line[max_length:]
+                current_part = line
+        else:
+            current_part = current_part + '\n' + line if current_part else line
+    if current_part:
+        parts.append(current_part.strip())
+    return parts
+
+
+def load_texts(db_path: str = "news_monitor.db") -> list:
+    """Тексты реальных постов из базы (или синтетика, если базы нет)"""
+    try:
+        with sqlite3.connect(db_path) as conn:
+            rows = conn.execute("SELECT text FROM messages WHERE text != '' LIMIT 500").fetchall()
+        texts = [row[0] for row in rows if row[0]]
+        if texts:
+            return texts
+    except sqlite3.Error:
+        pass
+    return ["**Срочно**: на *трассе* __Чита - Хабаровск__ ДТП, `подробности` ~~позже~~. " * 8] * 200
+
+
+def main():
+    texts = load_texts()
+    news_items = [
+        {'text': text, 'channel_username': 'news_channel', 'url': 'https://t.me/news_channel/1',
+         'date': datetime(2025, 1, 1, 12, 0)}
+        for text in texts
+    ]
+    renderer = MessageRenderer()
+    print(f"📊 Постов для замера: {len(news_items)}, средняя длина {sum(map(len, texts)) // len(texts)} символов")
+
+    runs = 20
+    old_clean = timeit.timeit(lambda: [old_clean_text_formatting(t) for t in texts], number=runs)
+    new_clean = timeit.timeit(lambda: [strip_markdown(t) for t in texts], number=runs)
+    print(f"🧹 Очистка markdown:  было {old_clean / runs * 1000:.2f} мс, стало {new_clean / runs * 1000:.2f} мс")
+
+    old_msg = timeit.timeit(lambda: [old_render(n) for n in news_items], number=runs)
+    new_msg = timeit.timeit(lambda: [renderer.render(n, 'text') for n in news_items], number=runs)
+    print(f"📝 Сборка сообщений:  было {old_msg / runs * 1000:.2f} мс, стало {new_msg / runs * 1000:.2f} мс "
+          f"(новая версия еще и соблюдает лимит 4096)")
+
+    long_text = '\n'.join(texts) * 20
+    split_runs = 5
+    old_split = timeit.timeit(lambda: old_split_message(long_text), number=split_runs)
+    new_split = timeit.timeit(lambda: split_text(long_text), number=split_runs)
+    print(f"✂️ Разбиение {len(long_text) // 1024} KB: было {old_split / split_runs * 1000:.2f} мс, "
+          f"стало {new_split / split_runs * 1000:.2f} мс")
+    assert old_split_message(long_text) == split_text(long_text), "Результаты разбиения различаются"
+
+
+if __name__ == "__main__":
+    main()
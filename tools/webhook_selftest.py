@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+🌐 Самопроверка webhook-приемника бота
+Поднимает локальный WebhookServer (без регистрации в Telegram) и шлет
+в него синтетические обновления: корректные, с неверным секретом и битые
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import aiohttp
+
+# Добавляем родительскую директорию в путь для импорта
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.bot.core.webhook_server import WebhookServer, SECRET_HEADER
+
+
+class RecordingDispatcher:
+    """Вместо UpdateProcessor - запоминает, что дошло до диспетчера"""
+
+    def __init__(self):
+        self.updates = []
+
+    def dispatch_update(self, update):
+        self.updates.append(update)
+
+
+class LocalBot:
+    """Минимальный бот: Telegram API не вызывается (register=False)"""
+
+    def __init__(self):
+        self.update_offset = 0
+        self.update_processor = RecordingDispatcher()
+
+    async def call_api(self, method, payload, timeout=None):
+        return None
+
+
+async def main() -> int:
+    bot = LocalBot()
+    server = WebhookServer(bot, {
+        'listen_host': '127.0.0.1',
+        'listen_port': 18443,
+        'secret_token': 'selftest-secret',
+        'register': False,
+    })
+    await server.start()
+    url = f"http://127.0.0.1:18443{server.path}"
+
+    checks = []
+    message_update = {
+        "update_id": 1001,
+        "message": {"message_id": 1, "chat": {"id": 1}, "from": {"id": 1}, "date": 0, "text": "/status"}
+    }
+    callback_update = {
+        "update_id": 1002,
+        "callback_query": {"id": "1", "from": {"id": 1}, "data": "start", "message": {"chat": {"id": 1}}}
+    }
+
+    async with aiohttp.ClientSession() as session:
+        for update in (message_update, callback_update):
+            async with session.post(url, json=update, headers={SECRET_HEADER: "selftest-secret"}) as response:
+                checks.append((f"обновление {update['update_id']} принято", response.status == 200))
+
+        async with session.post(url, json=message_update, headers={SECRET_HEADER: "wrong"}) as response:
+            checks.append(("неверный секрет отклонен (403)", response.status == 403))
+
+        async with session.post(url, json=message_update) as response:
+            checks.append(("запрос без секрета отклонен (403)", response.status == 403))
+
+        async with session.post(url, data="not json", headers={SECRET_HEADER: "selftest-secret"}) as response:
+            checks.append(("битое тело отклонено (400)", response.status == 400))
+
+    await server.stop()
+
+    dispatched = [update["update_id"] for update in bot.update_processor.updates]
+    checks.append(("в диспетчер попали только корректные обновления", dispatched == [1001, 1002]))
+    checks.append(("offset сдвинут после последнего обновления", bot.update_offset == 1003))
+
+    for title, ok in checks:
+        print(f"{'✅' if ok else '❌'} {title}")
+
+    return 0 if all(ok for _, ok in checks) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))